@@ -0,0 +1,279 @@
+import json
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from errors import PreprocessingError
+from preprocessing.collation import Collator
+from preprocessing.preprocessor import Preprocessor
+from ragged import RaggedArray
+from sequence_store import PackedSequences, iter_batches
+
+MANIFEST_FILENAME = "manifest.json"
+BUCKET_STATS_FILENAME = "bucket_stats.json"
+SHARD_DTYPE = np.int32
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def _shard_paths(directory: str, epoch: int) -> Tuple[str, str, str]:
+    """Return the paths of an epoch's token-ID, offset and parent arrays."""
+    stem = os.path.join(directory, f"epoch_{epoch:04d}")
+    return stem + ".ids.npy", stem + ".offsets.npy", stem + ".parents.npy"
+
+
+def _process_chunk(
+    preprocessor: Preprocessor,
+    start: int,
+    sequences: List[str] | List[np.ndarray],
+    epochs: int,
+    sequence_ids: Optional[Sequence[Union[int, str]]] = None,
+) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Process a chunk of sequences for every epoch.
+
+    Args:
+        preprocessor (Preprocessor): Seeded preprocessor.
+        start (int): Index of the chunk's first sequence.
+        sequences (List[str] | List[np.ndarray]): Raw sequences, as `str` or ASCII arrays.
+        epochs (int): Number of epochs.
+        sequence_ids (Optional[Sequence[Union[int, str]]]): ID of each sequence of the
+            chunk; the sequences' indices otherwise.
+
+    Returns:
+        List[Tuple[np.ndarray, np.ndarray, np.ndarray]]: Concatenated token IDs, lengths
+        and parent sequence index of the chunk's examples, one triple per epoch.
+    """
+    if sequence_ids is None:
+        sequence_ids = range(start, start + len(sequences))
+    results = []
+    for epoch in range(epochs):
+        batch = preprocessor.process_batch(sequences, sequence_ids=sequence_ids, epoch=epoch)
+        examples = preprocessor.to_ragged(batch)
+        results.append((examples.values, examples.lengths, batch.parents + start))
+    return results
+
+
+def materialize_epochs(
+    preprocessor: Preprocessor,
+    sequences: Iterable[str] | PackedSequences,
+    epochs: int,
+    output_dir: str,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    sequence_ids: Optional[Sequence[Union[int, str]]] = None,
+) -> "EpochShards":
+    """
+    Preprocess the sequences for several epochs in one pass and save one shard per epoch.
+
+    Each chunk of sequences is read once and processed for every epoch on a process
+    pool. The randomness of a sequence in epoch e comes from its own generator keyed
+    by (seed, sequence ID, e), so every epoch is a different augmentation of the data
+    and the shards are the same for any number of workers or chunk size; with record
+    IDs as `sequence_ids`, a sequence is also augmented the same way in any split.
+
+    A shard holds the concatenated int32 token IDs of all examples in
+    `epoch_<e>.ids.npy`, the int64 start of each example, plus the end, in
+    `epoch_<e>.offsets.npy`, and the index of the sequence each example comes from in
+    `epoch_<e>.parents.npy`; a sequence gives several examples with a multi-window
+    truncation strategy. The manifest is written last, so an interrupted run never
+    leaves shards that `EpochShards` opens.
+
+    Args:
+        preprocessor (Preprocessor): Preprocessor with a `seed`.
+        sequences (Iterable[str] | PackedSequences): Raw sequences, e.g. the training
+            split; a packed store is unpacked chunk by chunk into ASCII arrays.
+        epochs (int): Number of epochs to materialize.
+        output_dir (str): Directory to write the shards to.
+        workers (Optional[int]): Worker processes; defaults to the CPU count, 1 processes in-process.
+        chunk_size (int): Sequences per task.
+        sequence_ids (Optional[Sequence[Union[int, str]]]): Stable ID of each sequence,
+            e.g. its record ID; defaults to the sequence's index.
+
+    Returns:
+        EpochShards: The written shards.
+
+    Raises:
+        PreprocessingError: If the preprocessor has no seed or `epochs` is not positive.
+    """
+    if preprocessor.seed is None:
+        raise PreprocessingError("Materializing epochs requires a seeded preprocessor.")
+    if epochs < 1:
+        raise PreprocessingError(f"Number of epochs must be positive, got {epochs}.")
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    # Token IDs are streamed to raw part files, since their total length is only known at the end
+    part_files = [open(_shard_paths(output_dir, epoch)[0] + ".part", "wb") for epoch in range(epochs)]
+    lengths = [[] for _ in range(epochs)]
+    parents = [[] for _ in range(epochs)]
+
+    def write(results: List[Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> None:
+        for epoch, (values, chunk_lengths, chunk_parents) in enumerate(results):
+            part_files[epoch].write(values.tobytes())
+            lengths[epoch].append(chunk_lengths)
+            parents[epoch].append(chunk_parents)
+
+    def chunk_ids(start: int, length: int) -> Optional[List[Union[int, str]]]:
+        return None if sequence_ids is None else list(sequence_ids[start:start + length])
+
+    chunks = iter_batches(sequences, chunk_size)
+    workers = workers or os.cpu_count() or 1
+    try:
+        start = 0
+        if workers == 1:
+            for chunk in chunks:
+                write(_process_chunk(preprocessor, start, chunk, epochs, chunk_ids(start, len(chunk))))
+                start += len(chunk)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # Keep a bounded number of chunks in flight, written back in order
+                in_flight = deque()
+                for chunk in chunks:
+                    in_flight.append(
+                        executor.submit(_process_chunk, preprocessor, start, chunk, epochs, chunk_ids(start, len(chunk)))
+                    )
+                    start += len(chunk)
+                    if len(in_flight) >= 2 * workers:
+                        write(in_flight.popleft().result())
+                while in_flight:
+                    write(in_flight.popleft().result())
+    finally:
+        for part_file in part_files:
+            part_file.close()
+
+    for epoch in range(epochs):
+        ids_path, offsets_path, parents_path = _shard_paths(output_dir, epoch)
+        epoch_lengths = np.concatenate(lengths[epoch]) if lengths[epoch] else np.empty(0, dtype=np.int64)
+        offsets = np.zeros(len(epoch_lengths) + 1, dtype=np.int64)
+        np.cumsum(epoch_lengths, out=offsets[1:])
+        np.save(offsets_path, offsets)
+        np.save(parents_path, np.concatenate(parents[epoch]) if parents[epoch] else np.empty(0, dtype=np.int64))
+
+        # Prepend the .npy header to the raw IDs, so the shard can be memory-mapped by np.load
+        with open(ids_path, "wb") as f, open(ids_path + ".part", "rb") as part:
+            np.lib.format.write_array_header_1_0(f, {
+                "descr": np.lib.format.dtype_to_descr(np.dtype(SHARD_DTYPE)),
+                "fortran_order": False,
+                "shape": (int(offsets[-1]),),
+            })
+            shutil.copyfileobj(part, f)
+        os.remove(ids_path + ".part")
+
+    manifest = {"epochs": epochs, "sequences": start, "seed": preprocessor.seed, "dtype": np.dtype(SHARD_DTYPE).name}
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=4)
+    return EpochShards(output_dir)
+
+
+class EpochShards:
+    """
+    Pre-tokenized sequences of several augmented epochs, as written by `materialize_epochs`.
+
+    The shards are memory-mapped, so the training loop streams token IDs from disk
+    without preprocessing or holding an epoch in memory.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Open materialized epochs.
+
+        Args:
+            directory (str): Directory holding the shards and their manifest.
+
+        Raises:
+            FileNotFoundError: If the directory holds no complete set of shards.
+        """
+        manifest_path = os.path.join(directory, MANIFEST_FILENAME)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"No materialized epochs in {directory}")
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        self.directory = directory
+        self.epochs: int = manifest["epochs"]
+        self.sequences: int = manifest["sequences"]
+        self.seed = manifest["seed"]
+
+    def __len__(self) -> int:
+        return self.epochs
+
+    def arrays(self, epoch: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the memory-mapped token IDs and offsets of an epoch.
+
+        Args:
+            epoch (int): Epoch index; epochs beyond the materialized ones wrap around.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: int32 IDs of all examples and the int64 offsets
+            delimiting them, example i being `ids[offsets[i]:offsets[i + 1]]`.
+        """
+        ids_path, offsets_path, _ = _shard_paths(self.directory, epoch % self.epochs)
+        return np.load(ids_path, mmap_mode="r"), np.load(offsets_path)
+
+    def ragged(self, epoch: int) -> RaggedArray:
+        """
+        Return the examples of an epoch as a RaggedArray over the memory-mapped IDs.
+
+        Args:
+            epoch (int): Epoch index; epochs beyond the materialized ones wrap around.
+
+        Returns:
+            RaggedArray: int32 token IDs, one row per example.
+        """
+        return RaggedArray(*self.arrays(epoch))
+
+    def parents(self, epoch: int) -> np.ndarray:
+        """
+        Return the index of the sequence each example of an epoch comes from, to aggregate
+        predictions over the windows of a sequence.
+
+        Args:
+            epoch (int): Epoch index; epochs beyond the materialized ones wrap around.
+
+        Returns:
+            np.ndarray: int64 sequence index of each example.
+        """
+        return np.load(_shard_paths(self.directory, epoch % self.epochs)[2])
+
+    def iter_epoch(self, epoch: int) -> Iterator[np.ndarray]:
+        """
+        Iterate over the token IDs of each example in an epoch, in sequence order.
+
+        Args:
+            epoch (int): Epoch index; epochs beyond the materialized ones wrap around.
+
+        Yields:
+            np.ndarray: int32 token IDs of one example.
+        """
+        ids, offsets = self.arrays(epoch)
+        for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist()):
+            yield ids[start:end]
+
+    def write_bucket_stats(self, collator: Collator) -> str:
+        """
+        Write the length-bucket statistics of every epoch next to the shards.
+
+        Loaders group the sequences of an epoch with `collator.bucket_of` on the offset
+        differences and pad each batch to its bucket's width.
+
+        Args:
+            collator (Collator): Collator with length buckets.
+
+        Returns:
+            str: Path to the statistics file.
+        """
+        stats = {
+            "bounds": collator.buckets.tolist(),
+            "epochs": [collator.bucket_stats(np.diff(self.arrays(epoch)[1])) for epoch in range(self.epochs)],
+        }
+        stats_path = os.path.join(self.directory, BUCKET_STATS_FILENAME)
+        with open(stats_path, "w") as f:
+            json.dump(stats, f, indent=4)
+        return stats_path
@@ -1,13 +1,16 @@
 import importlib
 import os
 from inspect import signature
-from typing import Any, Protocol
+from typing import Any, Iterable, Optional, Protocol
 
 from preprocessing.augmentation import SequenceModifier
+from preprocessing.collation import Collator
 from preprocessing.preprocessor import Preprocessor
 from errors import ConstructionError, StrategyError
 from utils.logging_utils import with_logging
-from vocab import Vocabulary, KmerVocabConstructor
+from vocab import (
+    BpeVocabConstructor, BpeVocabulary, FrequencyKmerVocabConstructor, KmerVocabConstructor, KmerVocabulary, Vocabulary
+)
 
 
 class Modifier(Protocol):
@@ -85,8 +88,13 @@ def create_preprocessor(config: dict[str, Any], vocab: Vocabulary) -> Preprocess
         augmentation_strategy = get_strategy(
             "augmentation", modifier=modifier, **aug_config
         )
-        tokenization_strategy = get_strategy("tokenization", **tok_config)
-        padding_strategy = get_strategy("padding", **pad_config)
+        # Tokenizers that emit IDs compute them from the vocabulary and its alphabet
+        tokenization_strategy = get_strategy("tokenization", **{"alphabet": alphabet, "vocab": vocab, **tok_config})
+        if pad_config.get("buckets") is not None:
+            # Length-bucketed padding is left to the Collator, which pads each bucket to its own width
+            padding_strategy = get_strategy("padding", strategy="identity")
+        else:
+            padding_strategy = get_strategy("padding", **pad_config)
         truncation_strategy = get_strategy("truncation", **trun_config)
 
     except KeyError as e:
@@ -100,14 +108,44 @@ def create_preprocessor(config: dict[str, Any], vocab: Vocabulary) -> Preprocess
         padding_strategy=padding_strategy,
         truncation_strategy=truncation_strategy,
         vocab=vocab,
+        seed=preprocessor_options.get("seed", config.get("random_seed")),
     )
 
 
 @with_logging(level=10)
-def create_vocabulary(config: dict[str, Any]) -> Vocabulary:
-    """Create a vocabulary based on the tokenization strategy."""
+def create_collator(config: dict[str, Any]) -> Collator:
+    """
+    Create a Collator from the padding and truncation strategies in the configuration,
+    with the length buckets of `padding_strategy.buckets` if set.
+    """
+    try:
+        preprocessor_options = config["preprocessor_options"]
+        pad_config = preprocessor_options["padding_strategy"]
+        padding_strategy = get_strategy("padding", **pad_config)
+        truncation_strategy = get_strategy("truncation", **preprocessor_options["truncation_strategy"])
+        return Collator(padding_strategy, truncation_strategy, buckets=pad_config.get("buckets"))
+    except KeyError as e:
+        raise ConstructionError(f"Strategy configuration error: {e}")
+    except (StrategyError, ValueError) as e:
+        raise ConstructionError(f"Error in collator setup: {e}")
+
+
+@with_logging(level=10)
+def create_vocabulary(config: dict[str, Any], data: Optional[Iterable[str]] = None) -> Vocabulary:
+    """
+    Create a vocabulary based on the tokenization strategy.
+
+    K-mer vocabularies are implicit unless `vocab_options.implicit` is false, which is the
+    default when `min_frequency` or `max_tokens` is set; then, given training sequences as
+    `data`, the k-mers are counted and filtered by `vocab_options.min_frequency` and
+    `max_tokens`, and without data every k-mer is kept. An implicit vocabulary holds
+    every k-mer, so `implicit: true` together with those options is rejected.
+    BPE vocabularies learn merges from `data` up to `vocab_options.max_tokens` tokens;
+    without data they hold only the alphabet, e.g. before loading a saved vocabulary.
+    """
     strategy_map = {
         "kmer": KmerVocabConstructor,
+        "bpe": BpeVocabConstructor,
         # Future tokenization strategies can be added here
     }
 
@@ -123,17 +161,50 @@ def create_vocabulary(config: dict[str, Any]) -> Vocabulary:
             f"Available strategies: {list(strategy_map.keys())}"
         )
 
+    vocab_options = config.get("vocab_options", {})
+    alphabet = config.get("preprocessor_options", {}).get("augmentation_strategy", {}).get("alphabet", ["A", "C", "G", "T"])
+    vocab = Vocabulary()
     try:
         if strategy == "kmer":
             k = tokenization_config["k"]
-            alphabet = config.get("preprocessor_options", {}).get("augmentation_strategy", {}).get("alphabet", ["A", "C", "G", "T"])
-            constructor = constructor_class(k=k, alphabet=alphabet)
+            frequency_options = [
+                option for option in ("min_frequency", "max_tokens") if vocab_options.get(option) is not None
+            ]
+            implicit = vocab_options.get("implicit", not frequency_options)
+            if implicit and frequency_options:
+                raise ConstructionError(
+                    f"vocab_options {frequency_options} filter k-mers and cannot be used with an implicit "
+                    "vocabulary; set 'implicit' to false or remove them."
+                )
+            if implicit:
+                # All k-mers are in the vocabulary, so IDs are computed instead of stored
+                try:
+                    return KmerVocabulary(k=k, alphabet=alphabet)
+                except ValueError as e:
+                    raise ConstructionError(f"Failed to build vocabulary using strategy '{strategy}': {e}")
+            if data is not None:
+                constructor = FrequencyKmerVocabConstructor(
+                    k=k,
+                    alphabet=alphabet,
+                    min_frequency=vocab_options.get("min_frequency", 1),
+                    max_tokens=vocab_options.get("max_tokens"),
+                    stride=tokenization_config.get("stride"),
+                    workers=vocab_options.get("workers"),
+                )
+            else:
+                constructor = constructor_class(k=k, alphabet=alphabet)
+        elif strategy == "bpe":
+            constructor = constructor_class(
+                alphabet=alphabet,
+                max_tokens=vocab_options.get("max_tokens", 4096),
+                min_frequency=vocab_options.get("min_frequency", 2),
+            )
+            vocab = BpeVocabulary()
     except KeyError as e:
         raise ConstructionError(f"Missing required parameter '{e.args[0]}' for tokenization strategy '{strategy}'.")
 
-    vocab = Vocabulary()
     try:
-        vocab.build_from_constructor(constructor, data=[])
+        vocab.build_from_constructor(constructor, data=[] if data is None else data)
     except Exception as e:
         raise ConstructionError(f"Failed to build vocabulary using strategy '{strategy}': {e}")
 
@@ -1,8 +1,74 @@
+import hashlib
 import os
+from typing import Iterator, Optional
+
+import numpy as np
 import pandas as pd
-from Bio import SeqIO
+from pandas.api.types import union_categoricals
 from sklearn.model_selection import train_test_split
 
+from sequence_store import PackedSequenceBuilder
+from utils.fasta_index import FastaIndex
+from utils.parse_fasta import (
+    count_fasta_records, detect_compression, iter_fasta_batches, iter_fasta_id_batches, parse_fasta_custom
+)
+from utils.prepared_io import get_prepared_writer
+
+RANK_PREFIXES = {
+    "Kingdom": "k__",
+    "Phylum": "p__",
+    "Class": "c__",
+    "Order": "o__",
+    "Family": "f__",
+    "Genus": "g__",
+    "Species": "s__",
+}
+TAXONOMIC_RANKS = list(RANK_PREFIXES)
+PREPARED_COLUMNS = ["ID", "Sequence", *TAXONOMIC_RANKS]
+SPLIT_MODES = ["random", "hash", "stratified"]
+RARE_CLASS_POLICIES = ["train", "test", "random"]
+
+
+def concat_prepared(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate prepared DataFrames, keeping taxonomy columns categorical.
+
+    `pd.concat` falls back to object dtype when categories differ between frames,
+    so the categories of each rank are unioned first.
+
+    Args:
+        frames (list[pd.DataFrame]): Prepared DataFrames, e.g. batches of one file.
+
+    Returns:
+        pd.DataFrame: The concatenated DataFrame.
+    """
+    if not frames:
+        return pd.DataFrame(columns=PREPARED_COLUMNS)
+    df = pd.concat(frames, ignore_index=True)
+    for rank in TAXONOMIC_RANKS:
+        if rank in df.columns and all(isinstance(frame[rank].dtype, pd.CategoricalDtype) for frame in frames):
+            df[rank] = union_categoricals([frame[rank] for frame in frames])
+    return df
+
+
+def taxonomy_codes(df: pd.DataFrame) -> tuple[pd.DataFrame, dict[str, pd.Index]]:
+    """
+    Split the taxonomy columns of a prepared DataFrame into integer codes and lookup tables.
+
+    Args:
+        df (pd.DataFrame): Prepared DataFrame with categorical taxonomy columns.
+
+    Returns:
+        tuple[pd.DataFrame, dict[str, pd.Index]]: Int32 codes per rank (-1 for missing),
+            and for each rank the labels indexed by code.
+    """
+    codes, lookup = {}, {}
+    for rank in TAXONOMIC_RANKS:
+        column = df[rank].astype("category")
+        codes[rank] = column.cat.codes.astype(np.int32)
+        lookup[rank] = column.cat.categories
+    return pd.DataFrame(codes, index=df.index), lookup
+
 
 class SequenceDataPreparer:
     """
@@ -10,46 +76,145 @@ class SequenceDataPreparer:
     from raw FASTA files for downstream tasks.
     """
 
-    def __init__(self, fasta_path: str, output_dir: str):
+    def __init__(
+        self,
+        fasta_path: str,
+        output_dir: str,
+        batch_size: int = 10000,
+        workers: Optional[int] = None,
+        output_format: str = "csv",
+        deduplicate: bool = False,
+        pack_sequences: bool = False,
+    ):
         """
         Initialize the SequenceDataPreparer.
 
         Args:
-            fasta_path (str): Path to the raw FASTA file.
+            fasta_path (str): Path to the raw FASTA file, optionally gzip or BGZF compressed.
             output_dir (str): Directory to store prepared outputs.
+            batch_size (int): Number of records held in memory at a time while preparing.
+            workers (Optional[int]): Number of threads used to decompress BGZF input.
+            output_format (str): Format of the prepared splits: "csv", "parquet" or "arrow".
+            deduplicate (bool): Keep one representative per distinct sequence; see `prepare`.
+            pack_sequences (bool): Also save the sequences of each split as a 2-bit `PackedSequences` store.
         """
         self.fasta_path = fasta_path
         self.output_dir = output_dir
+        self.batch_size = batch_size
+        self.workers = workers
+        self.writer_class = get_prepared_writer(output_format)
+        self.deduplicate = deduplicate
+        self.duplicates_file = None
+        self.pack_sequences = pack_sequences
+        self.packed_files = None
+        self._compression = None
+        self._index = None
         os.makedirs(self.output_dir, exist_ok=True)
 
+    @property
+    def compression(self) -> str:
+        """Compression of the FASTA file, detected on first use so it need not exist yet."""
+        if self._compression is None:
+            self._compression = detect_compression(self.fasta_path)
+        return self._compression
+
+    @property
+    def index(self) -> FastaIndex:
+        """Byte-offset index of the FASTA file, loaded or built on first use."""
+        if self._index is None:
+            self._index = FastaIndex.open(self.fasta_path)
+        return self._index
+
+    def fetch_records(self, record_ids: list[str]) -> pd.DataFrame:
+        """
+        Fetch specific records through the FASTA index, without parsing the whole file.
+
+        Args:
+            record_ids (list[str]): IDs of the records to fetch.
+
+        Returns:
+            pd.DataFrame: DataFrame containing IDs, sequences, and taxonomy columns.
+        """
+        record_ids = list(record_ids)
+        if self.compression != "none":
+            sequences = [record["Sequence"] for record in parse_fasta_custom(self.fasta_path, record_ids)]
+        else:
+            sequences = [self.index.fetch(record_id) for record_id in record_ids]
+        return self._records_to_dataframe(record_ids, sequences)
+
+    def fetch_range(self, start: int, stop: int) -> pd.DataFrame:
+        """
+        Fetch a contiguous range of records by position through the FASTA index.
+        Only supported for uncompressed FASTA files.
+
+        Args:
+            start (int): Position of the first record.
+            stop (int): One past the position of the last record.
+
+        Returns:
+            pd.DataFrame: DataFrame containing IDs, sequences, and taxonomy columns.
+        """
+        records = list(self.index.iter_rows(start, stop))
+        return self._records_to_dataframe([record_id for record_id, _ in records], [sequence for _, sequence in records])
+
+    def iter_batches(self) -> Iterator[pd.DataFrame]:
+        """
+        Stream the FASTA file as DataFrames of at most `batch_size` records.
+
+        Yields:
+            pd.DataFrame: DataFrame containing IDs, sequences, and taxonomy columns.
+        """
+        for ids, sequences in iter_fasta_batches(self.fasta_path, self.batch_size, self.workers):
+            yield self._records_to_dataframe(ids, sequences)
+
     def parse_fasta_to_dataframe(self) -> pd.DataFrame:
         """
         Parse a FASTA file into a Pandas DataFrame with split taxonomic levels.
 
         Returns:
-            pd.DataFrame: DataFrame containing IDs, sequences, and taxonomy columns.
+            pd.DataFrame: DataFrame containing IDs, sequences, and categorical taxonomy columns.
+        """
+        return concat_prepared(list(self.iter_batches()))
+
+    def _records_to_dataframe(self, ids: list[str], sequences: list[str]) -> pd.DataFrame:
+        """
+        Build a DataFrame with split taxonomic levels from a batch of records.
+
+        Args:
+            ids (list[str]): Record IDs.
+            sequences (list[str]): Record sequences.
+
+        Returns:
+            pd.DataFrame: DataFrame containing IDs, sequences, and categorical taxonomy columns.
         """
-        records = []
-        for record in SeqIO.parse(self.fasta_path, "fasta"):
-            # Extract ID and Sequence
-            record_id = record.id
-            sequence = str(record.seq)
-            
-            # Parse the taxonomy string from the ID
-            # Assuming the taxonomy string is delimited by `;` and starts with `k__`
-            parts = record_id.split('|')
-            taxonomy_string = parts[-1] if parts[-1].startswith('k__') else ''
-            taxonomic_levels = self._parse_taxonomy(taxonomy_string)
-
-            # Combine all parsed data into a single record
-            record_data = {
-                "ID": record_id,
-                "Sequence": sequence,
-                **taxonomic_levels  # Unpack the taxonomy columns
-            }
-            records.append(record_data)
-
-        return pd.DataFrame(records)
+        df = pd.DataFrame({"ID": pd.Series(ids, dtype=object), "Sequence": pd.Series(sequences, dtype=object)})
+        return pd.concat([df, self._parse_taxonomy_column(df["ID"])], axis=1)
+
+    def _parse_taxonomy_column(self, ids: pd.Series) -> pd.DataFrame:
+        """
+        Parse the taxonomy strings embedded in a column of record IDs, column-wise.
+
+        The taxonomy string is the last `|`-delimited field of the ID when it starts
+        with `k__`. Taxonomy strings are factorized first, so each distinct lineage is
+        parsed once with a vectorized regex per rank, and every rank is stored as a
+        categorical whose codes index the distinct names.
+
+        Args:
+            ids (pd.Series): Record IDs (e.g., "SH123|acc|k__Fungi;p__Basidiomycota;...").
+
+        Returns:
+            pd.DataFrame: One categorical column per taxonomic level, aligned with `ids`.
+        """
+        lineage_codes, lineages = pd.factorize(ids.str.rsplit("|", n=1).str[-1])
+        lineages = pd.Series(lineages, dtype=object)
+        lineages = lineages.where(lineages.str.startswith("k__"), "")
+
+        columns = {}
+        for rank, prefix in RANK_PREFIXES.items():
+            names = lineages.str.extract(f"(?:^|;){prefix}([^;]*)", expand=False)
+            name_codes, categories = pd.factorize(names)
+            columns[rank] = pd.Categorical.from_codes(name_codes[lineage_codes], categories=categories)
+        return pd.DataFrame(columns, index=ids.index)
 
     def _parse_taxonomy(self, taxonomy_string: str) -> dict:
         """
@@ -61,47 +226,29 @@ class SequenceDataPreparer:
         Returns:
             dict: A dictionary with taxonomic levels as keys (e.g., "Kingdom", "Phylum").
         """
-        taxonomic_levels = {
-            "Kingdom": None,
-            "Phylum": None,
-            "Class": None,
-            "Order": None,
-            "Family": None,
-            "Genus": None,
-            "Species": None,
-        }
+        taxonomic_levels = dict.fromkeys(TAXONOMIC_RANKS)
 
         if taxonomy_string:
             # Split the taxonomy string by `;` and parse each level
-            levels = taxonomy_string.split(';')
-            for level in levels:
-                if level.startswith('k__'):
-                    taxonomic_levels["Kingdom"] = level[3:]
-                elif level.startswith('p__'):
-                    taxonomic_levels["Phylum"] = level[3:]
-                elif level.startswith('c__'):
-                    taxonomic_levels["Class"] = level[3:]
-                elif level.startswith('o__'):
-                    taxonomic_levels["Order"] = level[3:]
-                elif level.startswith('f__'):
-                    taxonomic_levels["Family"] = level[3:]
-                elif level.startswith('g__'):
-                    taxonomic_levels["Genus"] = level[3:]
-                elif level.startswith('s__'):
-                    taxonomic_levels["Species"] = level[3:]
+            for level in taxonomy_string.split(';'):
+                for rank, prefix in RANK_PREFIXES.items():
+                    if level.startswith(prefix):
+                        taxonomic_levels[rank] = level[len(prefix):]
+                        break
 
         return taxonomic_levels
 
-    def save_dataframe_to_csv(self, df: pd.DataFrame, filename: str) -> None:
+    def save_dataframe_to_csv(self, df: pd.DataFrame, filename: str, append: bool = False) -> None:
         """
         Save a DataFrame to a CSV file in the output directory.
 
         Args:
             df (pd.DataFrame): DataFrame to save.
             filename (str): Name of the CSV file.
+            append (bool): Append rows to an existing file instead of overwriting it.
         """
         output_path = os.path.join(self.output_dir, filename)
-        df.to_csv(output_path, index=False)
+        df.to_csv(output_path, index=False, mode="a" if append else "w", header=not append)
 
     def split_data(self, df: pd.DataFrame, test_size: float = 0.2, random_state: int = 42) -> tuple:
         """
@@ -118,23 +265,318 @@ class SequenceDataPreparer:
         train_df, test_df = train_test_split(df, test_size=test_size, random_state=random_state)
         return train_df, test_df
 
-    def prepare(self, test_size, random_seed):
+    def random_test_mask(self, n_records: int, test_size: float = 0.2, random_state: int = 42) -> np.ndarray:
+        """
+        Draw the same train/test assignment `split_data` would make for `n_records` rows,
+        without needing the rows themselves.
+
+        Args:
+            n_records (int): Number of records in the dataset.
+            test_size (float): Proportion of the dataset to include in the test split.
+            random_state (int): Random seed.
+
+        Returns:
+            np.ndarray: Boolean mask, True for records assigned to the test split.
+        """
+        _, test_indices = train_test_split(np.arange(n_records), test_size=test_size, random_state=random_state)
+        is_test = np.zeros(n_records, dtype=bool)
+        is_test[test_indices] = True
+        return is_test
+
+    def hash_test_mask(self, ids: pd.Series, test_size: float = 0.2, random_state: int = 42) -> np.ndarray:
+        """
+        Assign records to the test split by a seeded hash of their ID.
+
+        Each record's assignment depends only on its ID and the seed, so it is the same in
+        every run and does not change when other records are added or removed.
+
+        Args:
+            ids (pd.Series): Record IDs.
+            test_size (float): Expected proportion of records in the test split, in (0, 1).
+            random_state (int): Seed mixed into the hash.
+
+        Returns:
+            np.ndarray: Boolean mask, True for records assigned to the test split.
+        """
+        if not 0 < test_size < 1:
+            raise ValueError(f"Hash-based splitting needs a fractional test_size, got {test_size}")
+        hash_key = hashlib.sha256(str(random_state).encode("utf-8")).hexdigest()[:16]
+        hashes = pd.util.hash_pandas_object(ids, index=False, hash_key=hash_key).to_numpy()
+        return hashes < np.uint64(int(test_size * 2**64))
+
+    def sequence_hashes(self) -> np.ndarray:
+        """
+        Hash every sequence in the file, in file order.
+
+        Returns:
+            np.ndarray: Uint64 hash per record.
+        """
+        chunks = [np.zeros(0, dtype=np.uint64)]
+        for batch_df in self.iter_batches():
+            chunks.append(pd.util.hash_pandas_object(batch_df["Sequence"], index=False).to_numpy())
+        return np.concatenate(chunks)
+
+    def find_duplicates(self, hashes: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Group records with identical sequence hashes.
+
+        The first record of each group is its representative. Hashes are 64-bit, so
+        distinct sequences colliding is negligible at the scale of reference databases.
+
+        Args:
+            hashes (np.ndarray): Sequence hash per record, as from `sequence_hashes`.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: Per record: whether it is a
+                representative, the row of its representative, and the size of its group.
+        """
+        _, first_rows, group_of_row, group_sizes = np.unique(
+            hashes, return_index=True, return_inverse=True, return_counts=True
+        )
+        is_representative = np.zeros(len(hashes), dtype=bool)
+        is_representative[first_rows] = True
+        return is_representative, first_rows[group_of_row], group_sizes[group_of_row]
+
+    def rank_labels(self, rank: str) -> np.ndarray:
+        """
+        Collect the label codes of one taxonomic rank for every record, in file order.
+
+        Only the FASTA headers are read. Codes are assigned in order of first appearance.
+
+        Args:
+            rank (str): Taxonomic rank, e.g. "Genus" or "Species".
+
+        Returns:
+            np.ndarray: Int64 label code per record, -1 where the rank is missing.
+        """
+        if rank not in RANK_PREFIXES:
+            raise ValueError(f"Unknown taxonomic rank: '{rank}'. Available ranks: {TAXONOMIC_RANKS}")
+
+        label_codes: dict[str, int] = {}
+        chunks = [np.zeros(0, dtype=np.int64)]
+        for ids in iter_fasta_id_batches(self.fasta_path, self.batch_size, self.workers):
+            column = self._parse_taxonomy_column(pd.Series(ids, dtype=object))[rank]
+            # Map this batch's categories onto the global codes; the trailing -1 serves missing labels
+            mapping = np.array(
+                [label_codes.setdefault(label, len(label_codes)) for label in column.cat.categories] + [-1],
+                dtype=np.int64,
+            )
+            chunks.append(mapping[column.cat.codes.to_numpy()])
+        return np.concatenate(chunks)
+
+    def stratified_test_mask(
+        self,
+        labels: np.ndarray,
+        test_size: float = 0.2,
+        random_state: int = 42,
+        min_class_size: int = 2,
+        rare_class_policy: str = "train",
+    ) -> np.ndarray:
+        """
+        Assign records to the test split so that every class is represented in proportion.
+
+        Rows are shuffled once and stably sorted by label, which gives each row its rank
+        within its class; the first `round(test_size * count)` rows of each class go to the
+        test split, clipped so that both splits get at least one row of every class. This
+        is a handful of array operations regardless of the number of classes.
+
+        Classes with fewer than `min_class_size` rows, and rows without a label, follow
+        `rare_class_policy`: "train" or "test" sends them all to that split, and "random"
+        assigns each of them to the test split with probability `test_size`.
+
+        Args:
+            labels (np.ndarray): Integer label code per record, -1 for missing.
+            test_size (float): Proportion of each class to include in the test split, in (0, 1).
+            random_state (int): Random seed.
+            min_class_size (int): Smallest class that is split rather than handled as rare.
+            rare_class_policy (str): One of "train", "test" or "random".
+
+        Returns:
+            np.ndarray: Boolean mask, True for records assigned to the test split.
+        """
+        if not 0 < test_size < 1:
+            raise ValueError(f"Stratified splitting needs a fractional test_size, got {test_size}")
+        if rare_class_policy not in RARE_CLASS_POLICIES:
+            raise ValueError(
+                f"Unsupported rare class policy: '{rare_class_policy}'. Available policies: {RARE_CLASS_POLICIES}"
+            )
+        min_class_size = max(min_class_size, 2)
+
+        rng = np.random.default_rng(random_state)
+        labels = np.asarray(labels, dtype=np.int64)
+        counts = np.bincount(labels[labels >= 0], minlength=1)
+        is_regular = (labels >= 0) & (counts[np.maximum(labels, 0)] >= min_class_size)
+
+        is_test = np.zeros(len(labels), dtype=bool)
+        if rare_class_policy == "test":
+            is_test[~is_regular] = True
+        elif rare_class_policy == "random":
+            is_test[~is_regular] = rng.random(np.count_nonzero(~is_regular)) < test_size
+
+        # Shuffle the regular rows, then group them by class keeping the shuffled order
+        rows = rng.permutation(np.flatnonzero(is_regular))
+        rows = rows[np.argsort(labels[rows], kind="stable")]
+        sorted_labels = labels[rows]
+        _, class_starts, class_of_row = np.unique(sorted_labels, return_index=True, return_inverse=True)
+        rank_in_class = np.arange(len(rows)) - class_starts[class_of_row]
+
+        class_counts = counts[sorted_labels[class_starts]]
+        test_counts = np.clip(np.rint(class_counts * test_size), 1, class_counts - 1)
+        is_test[rows] = rank_in_class < test_counts[class_of_row]
+        return is_test
+
+    def prepare(
+        self,
+        test_size,
+        random_seed,
+        split_mode: str = "random",
+        stratify_rank: str = "Species",
+        min_class_size: int = 2,
+        rare_class_policy: str = "train",
+    ):
         """
         Execute the full sequence data preparation pipeline.
 
+        The FASTA file is streamed in batches of `batch_size` records and each batch is
+        written straight to the train or test file, so peak memory is bounded by the
+        batch size rather than the size of the file.
+
+        Args:
+            test_size (float): Proportion of the dataset to include in the test split.
+            random_seed (int): Random seed.
+            split_mode (str): "random" reproduces `split_data` exactly, using one extra
+                pass (or the FASTA index) to count records; "hash" decides each record
+                by a seeded hash of its ID in a single pass; "stratified" reads the
+                headers once to split every class of `stratify_rank` in proportion.
+            stratify_rank (str): Taxonomic rank to stratify on in "stratified" mode.
+            min_class_size (int): Classes smaller than this are handled by `rare_class_policy`.
+            rare_class_policy (str): Where rare and unlabelled records go: "train", "test" or "random".
+
+        When the preparer deduplicates, an extra pass hashes every sequence first. Only
+        the first record of each distinct sequence is split and written, with a `Count`
+        column holding the number of records sharing its sequence, and every other record
+        is written to `duplicate_ids` (path in `self.duplicates_file`) with the ID of its
+        representative. `expand_duplicates` restores the full record set.
+
+        When the preparer packs sequences, the sequences of each split are also saved,
+        in file order, as `train_sequences.npz` and `test_sequences.npz` (paths in
+        `self.packed_files`); see `sequence_store.PackedSequences`.
+
         Returns:
-            tuple: Paths to training and testing CSV files.
+            tuple: Paths to training and testing files, in the configured output format.
         """
-        sequences_df = self.parse_fasta_to_dataframe()
-        train_df, test_df = self.split_data(sequences_df, test_size, random_seed)
+        if split_mode not in SPLIT_MODES:
+            raise ValueError(f"Unsupported split mode: '{split_mode}'. Available modes: {SPLIT_MODES}")
 
-        train_file = os.path.join(self.output_dir, "train_sequences.csv")
-        test_file = os.path.join(self.output_dir, "test_sequences.csv")
-        self.save_dataframe_to_csv(train_df, train_file)
-        self.save_dataframe_to_csv(test_df, test_file)
+        is_representative = None
+        if self.deduplicate:
+            is_representative, representative_rows, group_sizes = self.find_duplicates(self.sequence_hashes())
+
+        is_test = None
+        if split_mode == "random":
+            if is_representative is not None:
+                n_records = np.count_nonzero(is_representative)
+            elif self.compression == "none":
+                n_records = len(self.index)
+            else:
+                n_records = count_fasta_records(self.fasta_path, self.workers)
+            is_test = self.random_test_mask(n_records, test_size, random_seed)
+        elif split_mode == "stratified":
+            labels = self.rank_labels(stratify_rank)
+            if is_representative is not None:
+                labels = labels[is_representative]
+            is_test = self.stratified_test_mask(labels, test_size, random_seed, min_class_size, rare_class_policy)
+        if is_test is not None and is_representative is not None:
+            # Masks were drawn over representatives only; spread them over all records
+            is_test_all = np.zeros(len(is_representative), dtype=bool)
+            is_test_all[is_representative] = is_test
+            is_test = is_test_all
+
+        extension = self.writer_class.extension
+        train_file = os.path.join(self.output_dir, f"train_sequences{extension}")
+        test_file = os.path.join(self.output_dir, f"test_sequences{extension}")
+        template = self._records_to_dataframe([], [])
+        if self.deduplicate:
+            template = template.assign(Count=pd.Series([], dtype=np.int64))
+            self.duplicates_file = os.path.join(self.output_dir, f"duplicate_ids{extension}")
+            duplicates_writer = self.writer_class(self.duplicates_file, self._duplicates_frame(template))
+        train_writer = self.writer_class(train_file, template)
+        test_writer = self.writer_class(test_file, template)
+        if self.pack_sequences:
+            train_packer, test_packer = PackedSequenceBuilder(), PackedSequenceBuilder()
+
+        representative_ids: dict[int, str] = {}
+        offset = 0
+        for batch_df in self.iter_batches():
+            rows = np.arange(offset, offset + len(batch_df))
+            offset += len(batch_df)
+
+            if self.deduplicate:
+                batch_df = batch_df.assign(Count=group_sizes[rows])
+                batch_is_representative = is_representative[rows]
+                # Representatives always precede their duplicates; remember the ones that have any
+                has_duplicates = batch_is_representative & (group_sizes[rows] > 1)
+                representative_ids.update(zip(rows[has_duplicates].tolist(), batch_df["ID"][has_duplicates]))
+
+                duplicates_df = batch_df[~batch_is_representative]
+                duplicates_df = duplicates_df.assign(RepresentativeID=[
+                    representative_ids[row] for row in representative_rows[rows[~batch_is_representative]].tolist()
+                ])
+                duplicates_writer.write(self._duplicates_frame(duplicates_df))
+
+                rows = rows[batch_is_representative]
+                batch_df = batch_df[batch_is_representative]
+
+            if is_test is None:
+                batch_is_test = self.hash_test_mask(batch_df["ID"], test_size, random_seed)
+            else:
+                batch_is_test = is_test[rows]
+            train_writer.write(batch_df[~batch_is_test])
+            test_writer.write(batch_df[batch_is_test])
+            if self.pack_sequences:
+                train_packer.append(batch_df["Sequence"][~batch_is_test])
+                test_packer.append(batch_df["Sequence"][batch_is_test])
+        train_writer.close()
+        test_writer.close()
+        if self.deduplicate:
+            duplicates_writer.close()
+        if self.pack_sequences:
+            self.packed_files = (
+                os.path.join(self.output_dir, "train_sequences.npz"),
+                os.path.join(self.output_dir, "test_sequences.npz"),
+            )
+            train_packer.build().save(self.packed_files[0])
+            test_packer.build().save(self.packed_files[1])
 
         return train_file, test_file
 
+    def _duplicates_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Select the columns of the duplicates file from a batch with a `RepresentativeID` column."""
+        if "RepresentativeID" not in df.columns:
+            df = df.assign(RepresentativeID=pd.Series([], dtype=object))
+        return df[["ID", "RepresentativeID", *TAXONOMIC_RANKS]]
+
+
+def expand_duplicates(prepared_df: pd.DataFrame, duplicates_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Restore the records collapsed by deduplication.
+
+    Each duplicate gets the sequence of its representative and keeps its own ID and
+    taxonomy. Duplicates whose representative is not in `prepared_df` (e.g. it is in
+    the other split) are left out.
+
+    Args:
+        prepared_df (pd.DataFrame): Deduplicated split, with `ID` and `Sequence` columns.
+        duplicates_df (pd.DataFrame): Contents of the duplicates file.
+
+    Returns:
+        pd.DataFrame: The representatives followed by their duplicates.
+    """
+    sequences = prepared_df[["ID", "Sequence"]].rename(columns={"ID": "RepresentativeID"})
+    duplicates = duplicates_df.merge(sequences, on="RepresentativeID", how="inner")
+    columns = [column for column in prepared_df.columns if column in duplicates.columns]
+    return concat_prepared([prepared_df[columns], duplicates[columns]])
+
 
 def prepare_data(config, logger):
     """
@@ -2,4 +2,5 @@ from .preprocessor import Preprocessor
 from .augmentation import BaseStrategy, SequenceModifier
 from .tokenization import KmerStrategy
 from .padding import RandomStrategy
-from .truncation import SlidingwindowStrategy
\ No newline at end of file
+from .truncation import SlidingwindowStrategy
+from .collation import Collator
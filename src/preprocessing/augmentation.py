@@ -1,7 +1,33 @@
 import random
 import logging
+from typing import Optional
+
+import numpy as np
+
 from utils.logging_utils import with_logging
 
+OPERATIONS = ("insert", "replace", "delete", "swap")
+_INSERT, _REPLACE, _DELETE, _SWAP = range(len(OPERATIONS))
+# Visits that modify nothing, and the right-hand side of inserts and swaps
+_KEEP, _INSERT_AFTER, _SWAP_RIGHT = range(len(OPERATIONS), len(OPERATIONS) + 3)
+# Operation and side (0 before/left, 1 after/right) to visit kind
+_SIDED = np.array([
+    [_INSERT, _INSERT_AFTER], [_REPLACE, _REPLACE], [_DELETE, _DELETE], [_SWAP, _SWAP_RIGHT]
+], dtype=np.int64)
+_NO_BASE = object()
+_NEVER = np.iinfo(np.int64).max
+
+
+def _kind_mask(*kinds: int) -> np.ndarray:
+    mask = np.zeros(_SWAP_RIGHT + 1, dtype=bool)
+    mask[list(kinds)] = True
+    return mask
+
+
+_LEAVES_PENDING = _kind_mask(_INSERT, _INSERT_AFTER, _SWAP_RIGHT)  # The next visit takes a held base
+_TAKES_NEXT = _kind_mask(_DELETE, _SWAP_RIGHT)                      # Also emits the next input base
+_NEW_BASE = _kind_mask(_REPLACE, _INSERT)                           # Emits a new base
+
 class SequenceModifier():
     ''' Modifies a sequence at a specific position'''
     def __init__(self, alphabet: list[str]):
@@ -30,41 +56,359 @@ class SequenceModifier():
 
 class BaseStrategy():
     ''' Standard augmentation strategy'''
-    def __init__(self, modifier: SequenceModifier, alphabet: list[str], modification_probability: float = 0.05):
+    def __init__(
+        self,
+        modifier: SequenceModifier,
+        alphabet: list[str],
+        modification_probability: float = 0.05,
+        weights: Optional[list[float]] = None,
+    ):
         self.alphabet = alphabet
         self.modifier = modifier
         self.modification_probability = modification_probability
-        self.operation_map = {
-            'insert': self.modifier._insert,
-            'replace': self.modifier._replace,
-            'delete': self.modifier._delete,
-            'swap': self.modifier._swap
-        }
-        self.operations = list(self.operation_map.keys())
-        self.weights = [0.25, 0.25, 0.25, 0.25]
-    
+        self.operations = list(OPERATIONS)
+        self.weights = [0.25, 0.25, 0.25, 0.25] if weights is None else list(weights)
+        if len(self.weights) != len(self.operations) or min(self.weights) < 0 or sum(self.weights) <= 0:
+            raise ValueError(f"Expected {len(self.operations)} non-negative weights for {self.operations}, got {self.weights}")
+        self._operation_cdf = np.cumsum(self.weights) / sum(self.weights)
+        self._rng = np.random.default_rng()
+
+    def _draw(self, visits: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """
+        Draw the decisions of `visits` visits with one NumPy call, from `rng` if given.
+
+        A first uniform per visit decides whether it modifies the sequence and, rescaled,
+        which operation it applies; a second one gives the side and the new base.
+
+        Returns:
+            np.ndarray: Int64 array of shape (2, visits) with the kind of each visit
+                (`_KEEP`, an operation or its right-hand variant) and the alphabet index
+                of the base it inserts or substitutes.
+        """
+        uniforms = (rng or self._rng).random((2, visits))
+        sided = (uniforms[1] * (2 * len(self.modifier.alphabet))).astype(np.int64)
+        modified = np.flatnonzero(uniforms[0] < self.modification_probability)
+        operations = np.searchsorted(
+            self._operation_cdf * self.modification_probability, uniforms[0, modified], side="right"
+        )
+        draws = np.empty((2, visits), dtype=np.int64)
+        draws[0] = _KEEP
+        draws[0, modified] = _SIDED[np.minimum(operations, len(OPERATIONS) - 1), sided[modified] & 1]
+        draws[1] = sided >> 1
+        return draws
+
+    def _draw_modifications(
+        self, count: int, rng: Optional[np.random.Generator] = None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Draw `count` modifying visits, as the gaps between them and their decisions, from `rng` if given.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: Int64 number of visits up to and
+                including each modifying one, its kind and the alphabet index of its new base.
+        """
+        rng = rng or self._rng
+        gaps = rng.geometric(self.modification_probability, count)
+        uniforms = rng.random((2, count))
+        sided = (uniforms[1] * (2 * len(self.modifier.alphabet))).astype(np.int64)
+        operations = np.searchsorted(self._operation_cdf, uniforms[0], side="right")
+        return gaps, _SIDED[np.minimum(operations, len(OPERATIONS) - 1), sided & 1], sided >> 1
+
     @with_logging(level=9)
-    def execute(self, seq: list[str]) -> list[str]:
-        augmented_seq = seq[:]
-        for pos, _ in enumerate(augmented_seq):
-            
-            should_modify = random.random() < self.modification_probability
-            if should_modify:     
-                operation = random.choices(self.operations, weights=self.weights, k=1)[0]
-                self.operation_map[operation](augmented_seq, pos)
+    def execute_batch(
+        self, values: np.ndarray, offsets: np.ndarray, rngs: Optional[list[np.random.Generator]] = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Augment a ragged batch of sequences at once.
+
+        The walk of `execute` is applied to every sequence, but only the modifying visits
+        of the whole batch are drawn, as geometric gaps, and the walks are resolved with
+        array operations over them; the unmodified runs are then gathered in one pass.
+        Sequences whose walk outlasts the drawn visits get more and are resolved again.
+
+        Args:
+            values (np.ndarray): Uint8 ASCII bases of all sequences, concatenated.
+            offsets (np.ndarray): Int64 offsets of each sequence in `values`, of length
+                number of sequences + 1.
+            rngs (Optional[list[np.random.Generator]]): Generator per sequence (see
+                `utils.random_state.sequence_rng`), making each result independent of the
+                batch it is in; the strategy's own generator draws for the whole batch otherwise.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Augmented bases and their offsets.
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        lengths = np.diff(offsets)
+        if self.modification_probability <= 0 or not len(lengths):
+            return values, offsets
+
+        # Enough modifying visits for most walks, with slack for the visits inserted bases add
+        insert_rate = self.modification_probability * self.weights[_INSERT] / sum(self.weights)
+        visits = lengths + 2 * insert_rate * lengths + 8
+        expected = self.modification_probability * visits
+        counts = (expected + 5 * np.sqrt(expected)).astype(np.int64) + 4
+        gaps, kinds, bases = self._draw_batch(counts, rngs)
+        while True:
+            codes, out_lengths, finished = _walk_batch(
+                gaps, kinds, bases, counts, lengths, offsets[:-1], len(values)
+            )
+            if finished.all():
+                break
+            # Continue the draws of the unfinished walks after their last modification
+            unfinished = np.flatnonzero(~finished)
+            extra = counts[unfinished]
+            more = self._draw_batch(extra, None if rngs is None else [rngs[i] for i in unfinished])
+            at = np.repeat(np.cumsum(counts)[unfinished], extra)
+            gaps, kinds, bases = (np.insert(drawn, at, added) for drawn, added in zip((gaps, kinds, bases), more))
+            counts[unfinished] += extra
+
+        alphabet_values = np.frombuffer("".join(self.modifier.alphabet).encode("ascii"), dtype=np.uint8)
+        source = np.concatenate([values, alphabet_values.astype(values.dtype)])
+        return source[codes], np.concatenate([[0], np.cumsum(out_lengths)])
+
+    def _draw_batch(
+        self, counts: np.ndarray, rngs: Optional[list[np.random.Generator]]
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Draw `counts[i]` modifying visits for each sequence, from its own generator if given."""
+        if rngs is None:
+            return self._draw_modifications(int(counts.sum()))
+        draws = [self._draw_modifications(int(count), rng) for count, rng in zip(counts, rngs)]
+        return tuple(np.concatenate(parts) for parts in zip(*draws))
+
+    @with_logging(level=9)
+    def execute(self, seq: list[str], rng: Optional[np.random.Generator] = None) -> list[str]:
+        """
+        Apply random insertions, substitutions, deletions and swaps to a sequence.
+
+        The sequence is walked left to right; each visited position is modified with
+        probability `modification_probability` by an operation drawn with `weights`.
+        An inserted base or a base swapped to the right is visited next, and the base
+        following a deleted one is skipped. The visits are drawn up front with NumPy and
+        only the modifying ones are handled in Python, while the runs of unmodified bases
+        between them are copied as slices, so a sequence costs O(n).
+
+        Args:
+            seq (list[str]): Sequence to augment.
+            rng (Optional[np.random.Generator]): Generator to draw from, e.g. the sequence's
+                own (see `utils.random_state.sequence_rng`); the strategy's generator otherwise.
+
+        Returns:
+            list[str]: Augmented copy of the sequence.
+        """
+        n = len(seq)
+        if n == 0 or self.modification_probability <= 0:
+            return seq[:]
+        alphabet = self.modifier.alphabet
+        augmented_seq: list[str] = []
+        consumed = 0            # Bases of `seq` emitted or visited so far
+        pending = _NO_BASE      # Base to visit before resuming `seq`, after an insert or right swap
+        visit = 0               # Index of the next visit
+        drawn = 0               # Number of visits drawn so far
+        events: list[int] = []
+        event = 0
+
+        while True:
+            if visit == drawn:
+                # Enough visits for the rest of the sequence unless bases are inserted
+                block = n - consumed + 1
+                kinds, bases = self._draw(block, rng)
+                modified = np.flatnonzero(kinds != _KEEP)
+                events, kinds, bases = (modified + drawn).tolist(), kinds[modified].tolist(), bases[modified].tolist()
+                drawn += block
+                event = 0
+            # Unmodified visits up to the next modification, or to the end of the block
+            stop = events[event] if event < len(events) else drawn
+            gap = stop - visit
+            if pending is not _NO_BASE and gap > 0:
+                augmented_seq.append(pending)
+                pending = _NO_BASE
+                gap -= 1
+            augmented_seq.extend(seq[consumed:consumed + gap])
+            consumed = min(consumed + gap, n)
+            visit = stop
+            if pending is _NO_BASE and consumed == n:
+                break
+            if event == len(events):
+                continue
+
+            if pending is not _NO_BASE:
+                current, pending = pending, _NO_BASE
+            else:
+                current = seq[consumed]
+                consumed += 1
+            visit += 1
+            kind, base = kinds[event], bases[event]
+            event += 1
+
+            if kind == _REPLACE:
+                augmented_seq.append(alphabet[base])
+            elif kind == _INSERT:
+                augmented_seq.append(alphabet[base])
+                pending = current
+            elif kind == _INSERT_AFTER:
+                augmented_seq.append(current)
+                pending = alphabet[base]
+            elif kind == _DELETE:
+                if augmented_seq or consumed < n:
+                    # The next base moves into the deleted position, which was already visited
+                    augmented_seq.extend(seq[consumed:consumed + 1])
+                    consumed = min(consumed + 1, n)
+                else:
+                    augmented_seq.append(current)
+            elif kind == _SWAP and augmented_seq:
+                augmented_seq.append(augmented_seq[-1])
+                augmented_seq[-2] = current
+            elif kind == _SWAP_RIGHT and consumed < n:
+                augmented_seq.append(seq[consumed])
+                consumed += 1
+                pending = current
+            else:
+                # Swap with no neighbour on that side
+                augmented_seq.append(current)
         return augmented_seq
     
+def _segmented_exclusive_cumsum(values: np.ndarray, first: np.ndarray) -> np.ndarray:
+    """Sum of the preceding `values` within each segment, `first` giving the start of each element's segment."""
+    totals = np.cumsum(values) - values
+    return totals - totals[first]
+
+
+def _walk_batch(
+    gaps: np.ndarray,
+    kinds: np.ndarray,
+    bases: np.ndarray,
+    counts: np.ndarray,
+    lengths: np.ndarray,
+    starts: np.ndarray,
+    alphabet_start: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Resolve the walks of a batch of sequences from their modifying visits ("events").
+
+    Between events each visit takes the next input base, or first the base the previous
+    event left pending (after an insertion or a right swap), and emits it, so the input
+    bases consumed before each event follow from cumulative sums over the events. A walk
+    ends at the first visit with no base to take, or after a deletion or right swap with
+    no input base after it. The output of each walk is then, per event, the pending base,
+    the run of unmodified input bases and the event's own base, followed by the tail of
+    the input; a run of left swaps finally shifts its bases one slot left and moves the
+    base before it to its end.
+
+    Args:
+        gaps (np.ndarray): Visits up to and including each event, from the previous one.
+        kinds (np.ndarray): Kind of each event.
+        bases (np.ndarray): Alphabet index of the base each event inserts or substitutes.
+        counts (np.ndarray): Number of events drawn per sequence; the last one of each only
+            marks how far the visits are known and is not applied.
+        lengths (np.ndarray): Length of each sequence.
+        starts (np.ndarray): Offset of each sequence in the input values.
+        alphabet_start (int): Code of the first alphabet base, i.e. the number of input values.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Code of each output base (an input
+            offset, or `alphabet_start` + alphabet index), output length per sequence,
+            and whether each walk ended within its drawn events.
+    """
+    segment = np.repeat(np.arange(len(counts)), counts)
+    first = (np.cumsum(counts) - counts)[segment]
+    positions = _segmented_exclusive_cumsum(gaps, first) + gaps - 1  # Visit index within the walk
+    is_first = np.arange(len(segment)) == first
+    # The last event of each walk only bounds the known visits
+    marker = np.zeros(len(segment), dtype=bool)
+    marker[np.cumsum(counts) - 1] = True
+    n = lengths[segment]
+
+    kinds = np.where((positions == 0) & (kinds == _SWAP), _KEEP, kinds)  # Nothing to swap with yet
+    kinds[marker] = _KEEP
+    leaves_pending = _LEAVES_PENDING[kinds]
+    takes_next = _TAKES_NEXT[kinds]
+    previous = np.roll(np.arange(len(segment)), 1)
+    previous_pending = leaves_pending[previous] & ~is_first
+    previous_position = np.where(is_first, -1, positions[previous])
+    pending = previous_pending & (previous_position + 1 == positions)
+    orig = ~pending
+    consumed_before = (
+        positions
+        - _segmented_exclusive_cumsum(leaves_pending, first) + pending
+        + _segmented_exclusive_cumsum(takes_next, first)
+    )
+    consumed_after = np.minimum(consumed_before + orig + takes_next, n)
+    previous_consumed = np.where(is_first, 0, consumed_after[previous])
+
+    # Candidate ends: the visit after the unmodified run before an event runs out of
+    # bases, or the visit after an event that deletes or swaps right the last base
+    run_out = previous_position + 1 + previous_pending + n - previous_consumed
+    last_base = ~marker & takes_next & (consumed_before + orig >= n)
+    candidates = np.where(run_out <= positions, run_out, np.where(last_base, positions + 1, _NEVER))
+    ends = np.minimum.reduceat(candidates, np.cumsum(counts) - counts)
+    finished = ends != _NEVER
+
+    performed = ~marker & (positions < ends[segment])
+    boundary = performed & last_base
+    # The first event not performed holds the tail of its walk
+    tail = ~performed & (is_first | performed[previous])
+
+    # Base each event handles, carried forward from the event that left it pending
+    current = np.where(orig, starts[segment] + consumed_before, -1)
+    held_new = pending & (kinds[previous] == _INSERT_AFTER)
+    current = np.where(held_new, alphabet_start + bases[previous], current)
+    carry = np.where(current >= 0, np.arange(len(segment)), 0)
+    current = current[np.maximum.accumulate(carry)]
+    new_base = alphabet_start + bases
+    held = np.where(kinds == _INSERT_AFTER, new_base, current)
+
+    lone = (kinds == _DELETE) & (positions == 0) & (n == 1)
+    emitted = np.where(_NEW_BASE[kinds], new_base, current)
+    emitted = np.where(takes_next & ~boundary, starts[segment] + consumed_before + orig, emitted)
+    emits = ~(boundary & (kinds == _DELETE) & ~lone)
+
+    # Pieces of each row: pending base, unmodified run, own base
+    rows = np.flatnonzero(performed | tail)
+    gap = positions - previous_position - 1
+    held_before = np.where(is_first, 0, held[previous])
+    pending_before = previous_pending & ~(is_first | boundary[previous]) & np.where(tail, True, gap > 0)
+    run = np.where(tail, n - previous_consumed, gap - pending_before)
+    own = performed & emits
+    piece_lengths = np.stack([pending_before, run, own], axis=1)[rows].astype(np.int64).ravel()
+    piece_codes = np.stack([held_before, starts[segment] + previous_consumed, emitted], axis=1)[rows].ravel()
+    # Runs count up from their first code; the other pieces hold at most one base
+    piece_starts = np.cumsum(piece_lengths) - piece_lengths
+    codes = np.repeat(piece_codes - piece_starts, piece_lengths)
+    codes += np.arange(len(codes))
+
+    # Left swaps: each event's base moves one slot left, the base before a run of them to its end
+    own_slots = piece_starts.reshape(-1, 3)[:, 2]
+    left = performed[rows] & (kinds[rows] == _SWAP)
+    slots = own_slots[left]
+    if len(slots):
+        run_starts = np.concatenate([[True], slots[1:] != slots[:-1] + 1])
+        run_ends = np.concatenate([run_starts[1:], [True]])
+        moved = codes[slots[run_starts] - 1]
+        codes[slots - 1] = codes[slots]
+        codes[slots[run_ends]] = moved
+
+    out_lengths = np.bincount(segment[rows], weights=piece_lengths.reshape(-1, 3).sum(axis=1), minlength=len(counts))
+    return codes, out_lengths.astype(np.int64), finished
+
+
 class RandomStrategy(BaseStrategy):
     ''' Modify at every position augmentation'''
-    def __init__(self, alphabet, modifier: SequenceModifier):
-        super().__init__(modifier, alphabet, modification_probability=1)
+    def __init__(self, alphabet, modifier: SequenceModifier, weights: Optional[list[float]] = None):
+        super().__init__(modifier, alphabet, modification_probability=1, weights=weights)
 
 class IdentityStrategy(BaseStrategy):
     ''' Do-nothing augmentation'''
     @with_logging(level=9)
-    def execute(self, seq: list[str]) -> list[str]:
+    def execute(self, seq: list[str], rng: Optional[np.random.Generator] = None) -> list[str]:
 
         return seq[:]
+
+    @with_logging(level=9)
+    def execute_batch(
+        self, values: np.ndarray, offsets: np.ndarray, rngs: Optional[list[np.random.Generator]] = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # The batch is returned as is, without copying
+        return values, offsets
         
     
     
\ No newline at end of file
@@ -0,0 +1,197 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from preprocessing.padding import PAD_ID
+from utils.logging_utils import with_logging
+
+
+class Collator:
+    """
+    Fused padding and truncation of a batch of token-ID sentences into one matrix.
+
+    Each sentence is placed in a row of a `(batch, optimal_length)` int32 matrix at the
+    offsets its padding and truncation strategies choose, the same ones
+    `Preprocessor.process` would apply stage by stage: short sentences are padded,
+    long ones truncated, and every token is copied once. The row width is the truncation
+    length; a padding strategy with a different `optimal_length` pads to its own length
+    first, and the window is picked from the padded sentence, as in the staged pipeline.
+
+    With length buckets, sentences are grouped by their truncated length and each
+    group is padded only to its longest sentence instead of `optimal_length`.
+    """
+
+    def __init__(
+        self, padding_strategy, truncation_strategy, pad_id: int = PAD_ID, buckets: Optional[Sequence[int]] = None
+    ):
+        """
+        Initialize the Collator.
+
+        Args:
+            padding_strategy: Padding strategy providing `front_padding(length, rng, optimal_length)`.
+            truncation_strategy: Truncation strategy providing `window_start(length, rng)`.
+            pad_id (int): Vocabulary ID written to the padded positions.
+            buckets (Optional[Sequence[int]]): Upper length bounds of the buckets; a last
+                bucket up to `optimal_length` is always added.
+
+        Raises:
+            ValueError: If a bucket bound is not positive.
+        """
+        self.padding_strategy = padding_strategy
+        self.truncation_strategy = truncation_strategy
+        self.optimal_length = truncation_strategy.optimal_length
+        # A padding strategy without optimal_length pads to the truncation length
+        padding_length = getattr(padding_strategy, "optimal_length", None)
+        self.padding_length = self.optimal_length if padding_length is None else padding_length
+        self.pad_id = pad_id
+        self.buckets = None
+        if buckets is not None:
+            bounds = sorted(set(int(bound) for bound in buckets))
+            if bounds and bounds[0] < 1:
+                raise ValueError(f"Bucket bounds must be positive, got {bounds}.")
+            self.buckets = np.array(
+                [bound for bound in bounds if bound < self.optimal_length] + [self.optimal_length], dtype=np.int64
+            )
+
+    def bucket_of(self, lengths: np.ndarray) -> np.ndarray:
+        """
+        Return the bucket of each sentence.
+
+        Args:
+            lengths (np.ndarray): Number of tokens of each sentence, before truncation.
+
+        Returns:
+            np.ndarray: Index into `buckets` of the smallest bound holding each truncated sentence.
+        """
+        if self.buckets is None:
+            raise ValueError("Collator has no length buckets.")
+        return np.searchsorted(self.buckets, np.minimum(lengths, self.optimal_length), side="left")
+
+    @with_logging(level=8)
+    def collate(
+        self,
+        sentences: Sequence[np.ndarray],
+        rngs: Optional[Sequence[np.random.Generator]] = None,
+        out: Optional[np.ndarray] = None,
+        width: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Pad and truncate a batch of sentences into a matrix.
+
+        Args:
+            sentences (Sequence[np.ndarray]): Token IDs of each sentence, e.g. a `RaggedArray`.
+            rngs (Optional[Sequence[np.random.Generator]]): Generator of each sentence, drawn
+                from for padding first and truncation second, as in `Preprocessor.process`.
+            out (Optional[np.ndarray]): Preallocated `(batch, width)` int32 matrix to fill,
+                e.g. reused across batches.
+            width (Optional[int]): Row width, at most `optimal_length` (the default) and at
+                least the longest truncated sentence; narrower rows are padded to at most
+                `width`.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: The int32 ID matrix, its boolean
+            attention mask (True on tokens, False on padding) and the int32 number of
+            tokens in each row.
+        """
+        batch = len(sentences)
+        width = self.optimal_length if width is None else width
+        if width > self.optimal_length:
+            raise ValueError(f"Width {width} exceeds optimal_length {self.optimal_length}.")
+        if out is None:
+            out = np.empty((batch, width), dtype=np.int32)
+        elif out.shape != (batch, width):
+            raise ValueError(f"Output matrix has shape {out.shape}, expected {(batch, width)}.")
+        out.fill(self.pad_id)
+
+        target = self.padding_length if width == self.optimal_length else min(self.padding_length, width)
+        lengths = np.zeros(batch, dtype=np.int64)
+        fronts = np.zeros(batch, dtype=np.int64)
+        for row, sentence in enumerate(sentences):
+            sentence = np.asarray(sentence).reshape(-1)
+            length = len(sentence)
+            rng = None if rngs is None else rngs[row]
+            # Padding draws first, then truncation picks its window from the padded sentence
+            front = self.padding_strategy.front_padding(length, rng, target)
+            padded = max(length, target)
+            start = self.truncation_strategy.window_start(padded, rng)
+            if min(length, self.optimal_length) > width:
+                raise ValueError(f"Sentence of {min(length, self.optimal_length)} tokens does not fit width {width}.")
+            # Tokens of the kept window, in the coordinates of the padded sentence
+            first = max(front, start)
+            last = min(front + length, start + min(padded, self.optimal_length))
+            kept = max(0, last - first)
+            # One slice copy per row, straight from the sentence into its place
+            out[row, first - start:first - start + kept] = sentence[first - front:first - front + kept]
+            lengths[row] = kept
+            fronts[row] = first - start
+
+        columns = np.arange(width)
+        mask = (columns >= fronts[:, None]) & (columns < (fronts + lengths)[:, None])
+        return out, mask, lengths.astype(np.int32)
+
+    @with_logging(level=8)
+    def collate_buckets(
+        self,
+        sentences: Sequence[np.ndarray],
+        rngs: Optional[Sequence[np.random.Generator]] = None,
+    ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Pad and truncate sentences bucket by bucket, each bucket to its longest sentence.
+
+        Args:
+            sentences (Sequence[np.ndarray]): Token IDs of each sentence.
+            rngs (Optional[Sequence[np.random.Generator]]): Generator of each sentence.
+
+        Returns:
+            List[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]: For every non-empty
+            bucket, the indices of its sentences and their ID matrix, attention mask and
+            lengths as returned by `collate`.
+        """
+        lengths = np.fromiter((np.size(sentence) for sentence in sentences), dtype=np.int64, count=len(sentences))
+        bucket_ids = self.bucket_of(lengths)
+        collated = []
+        for bucket in np.unique(bucket_ids).tolist():
+            indices = np.flatnonzero(bucket_ids == bucket)
+            width = int(np.minimum(lengths[indices], self.optimal_length).max())
+            ids, mask, kept = self.collate(
+                [sentences[i] for i in indices.tolist()],
+                rngs=None if rngs is None else [rngs[i] for i in indices.tolist()],
+                width=width,
+            )
+            collated.append((indices, ids, mask, kept))
+        return collated
+
+    def bucket_stats(self, lengths: np.ndarray) -> Dict[str, Any]:
+        """
+        Summarize how sentences of the given lengths fall into the buckets.
+
+        Args:
+            lengths (np.ndarray): Number of tokens of each sentence, before truncation.
+
+        Returns:
+            Dict[str, Any]: Per bucket its upper bound, sentence count, width (longest
+            truncated sentence), tokens and padded positions; plus the totals and the
+            padded positions padding everything to `optimal_length` would take.
+        """
+        lengths = np.minimum(np.asarray(lengths, dtype=np.int64), self.optimal_length)
+        bucket_ids = self.bucket_of(lengths)
+        buckets = []
+        for bucket, bound in enumerate(self.buckets.tolist()):
+            bucket_lengths = lengths[bucket_ids == bucket]
+            width = int(bucket_lengths.max()) if len(bucket_lengths) else 0
+            tokens = int(bucket_lengths.sum())
+            buckets.append({
+                "bound": bound,
+                "count": len(bucket_lengths),
+                "width": width,
+                "tokens": tokens,
+                "padding": width * len(bucket_lengths) - tokens,
+            })
+        tokens = int(lengths.sum())
+        return {
+            "optimal_length": self.optimal_length,
+            "buckets": buckets,
+            "tokens": tokens,
+            "padding": sum(bucket["padding"] for bucket in buckets),
+            "padding_without_buckets": self.optimal_length * len(lengths) - tokens,
+        }
@@ -1,56 +1,144 @@
 
 import random
+from typing import Optional, Sequence
+
+import numpy as np
+
+from ragged import RaggedArray
 from utils.logging_utils import with_logging
 
+# ID of Vocabulary's PAD token, used when the sentence is already an array of IDs
+PAD_ID = 0
+
+def _pad(seq, front_padding_count: int, end_padding_count: int):
+    """Pad a token sentence with ['PAD'] entries, or an ID array with PAD_ID."""
+    if isinstance(seq, np.ndarray):
+        return np.concatenate([
+            np.full(front_padding_count, PAD_ID, dtype=seq.dtype),
+            seq,
+            np.full(end_padding_count, PAD_ID, dtype=seq.dtype),
+        ])
+    return [['PAD']] * front_padding_count + seq + [['PAD']] * end_padding_count
+
+def _pad_batch(
+    strategy, sentences: RaggedArray, rngs: Optional[Sequence[np.random.Generator]] = None
+) -> RaggedArray:
+    """Pad every row of a ragged batch at the offset `strategy.front_padding` picks, moving the IDs in one pass."""
+    lengths = sentences.lengths
+    fronts = np.array([
+        strategy.front_padding(length, None if rngs is None else rngs[row])
+        for row, length in enumerate(lengths.tolist())
+    ], dtype=np.int64)
+    offsets = np.zeros(len(sentences) + 1, dtype=np.int64)
+    np.cumsum(np.maximum(lengths, strategy.optimal_length), out=offsets[1:])
+    values = np.full(offsets[-1], PAD_ID, dtype=sentences.values.dtype)
+    # Destination of every ID: its row's new start plus the front padding, at the same position in the row
+    shift = np.repeat(offsets[:-1] + fronts - sentences.offsets[:-1], lengths)
+    values[np.arange(len(sentences.values)) + shift] = sentences.values
+    return RaggedArray(values, offsets)
+
 class EndStrategy:
    
     def __init__(self, optimal_length):
         self.optimal_length = optimal_length
 
+    def front_padding(
+        self, length: int, rng: Optional[np.random.Generator] = None, optimal_length: Optional[int] = None
+    ) -> int:
+        """Return how many PADs go before a sentence of `length` tokens padded to `optimal_length` (default the strategy's)."""
+        return 0
+
     @with_logging(level=8)
-    def execute(self, seq: list[list[str]]) -> list[list[str]]:
-        # Create a copy to avoid modifying the original sequence
-        padded_seq = seq[:]
-        
+    def execute(self, seq: list[list[str]], rng: Optional[np.random.Generator] = None) -> list[list[str]]:
         # Add ['PAD'] sub-lists until the length matches optimal_length
-        while len(padded_seq) < self.optimal_length:
-            padded_seq.append(['PAD'])
-        
-        # If seq is already longer than optimal_length, trim it
-        return padded_seq
+        padding_needed = max(0, self.optimal_length - len(seq))
+        return _pad(seq, 0, padding_needed)
+
+    @with_logging(level=8)
+    def execute_batch(
+        self, sentences: RaggedArray, rngs: Optional[Sequence[np.random.Generator]] = None
+    ) -> RaggedArray:
+        """Pad every row of a ragged batch to `optimal_length`."""
+        return _pad_batch(self, sentences, rngs)
    
 class FrontStrategy:
    
     def __init__(self, optimal_length):
         self.optimal_length = optimal_length
 
+    def front_padding(
+        self, length: int, rng: Optional[np.random.Generator] = None, optimal_length: Optional[int] = None
+    ) -> int:
+        """Return how many PADs go before a sentence of `length` tokens padded to `optimal_length` (default the strategy's)."""
+        optimal_length = self.optimal_length if optimal_length is None else optimal_length
+        return max(0, optimal_length - length)
+
     @with_logging(level=8)
-    def execute(self, seq: list[list[str]]) -> list[list[str]]:
+    def execute(self, seq: list[list[str]], rng: Optional[np.random.Generator] = None) -> list[list[str]]:
         # Calculate the number of padding elements needed
         padding_needed = max(0, self.optimal_length - len(seq))
         
         # Create padding and prepend to sequence
-        padded_seq = [['PAD']] * padding_needed + seq
-        
-        # Trim if padded sequence exceeds optimal length
-        return padded_seq
+        return _pad(seq, padding_needed, 0)
+
+    @with_logging(level=8)
+    def execute_batch(
+        self, sentences: RaggedArray, rngs: Optional[Sequence[np.random.Generator]] = None
+    ) -> RaggedArray:
+        """Pad every row of a ragged batch to `optimal_length`."""
+        return _pad_batch(self, sentences, rngs)
     
 class RandomStrategy:
     
     def __init__(self, optimal_length):
         self.optimal_length = optimal_length
 
+    def front_padding(
+        self, length: int, rng: Optional[np.random.Generator] = None, optimal_length: Optional[int] = None
+    ) -> int:
+        """Return how many PADs go before a sentence of `length` tokens padded to `optimal_length` (default the strategy's)."""
+        optimal_length = self.optimal_length if optimal_length is None else optimal_length
+        padding_needed = max(0, optimal_length - length)
+        # Randomly decide how much padding to put in front, from the sequence's generator if given
+        if rng is None:
+            return random.randint(0, padding_needed)
+        return int(rng.integers(0, padding_needed + 1))
+
     @with_logging(level=8)
-    def execute(self, seq: list[list[str]]) -> list[list[str]]:
+    def execute(self, seq: list[list[str]], rng: Optional[np.random.Generator] = None) -> list[list[str]]:
         # Calculate the total padding needed
         padding_needed = max(0, self.optimal_length - len(seq))
-        
-        # Randomly decide how much padding to put in front
-        front_padding_count = random.randint(0, padding_needed)
+        front_padding_count = self.front_padding(len(seq), rng)
         end_padding_count = padding_needed - front_padding_count
         
         # Create the padded sequence
-        padded_seq = [['PAD']] * front_padding_count + seq + [['PAD']] * end_padding_count
-        
-        # If seq is already longer than optimal_length, trim it
-        return padded_seq
\ No newline at end of file
+        return _pad(seq, front_padding_count, end_padding_count)
+
+    @with_logging(level=8)
+    def execute_batch(
+        self, sentences: RaggedArray, rngs: Optional[Sequence[np.random.Generator]] = None
+    ) -> RaggedArray:
+        """Pad every row of a ragged batch to `optimal_length`."""
+        return _pad_batch(self, sentences, rngs)
+
+class IdentityStrategy:
+    ''' Do-nothing padding, e.g. when a Collator pads batches later'''
+    def __init__(self, optimal_length=None):
+        self.optimal_length = optimal_length
+
+    def front_padding(
+        self, length: int, rng: Optional[np.random.Generator] = None, optimal_length: Optional[int] = None
+    ) -> int:
+        """Return how many PADs go before a sentence of `length` tokens padded to `optimal_length` (default the strategy's)."""
+        return 0
+
+    @with_logging(level=8)
+    def execute(self, seq: list[list[str]], rng: Optional[np.random.Generator] = None) -> list[list[str]]:
+        return seq[:]
+
+    @with_logging(level=8)
+    def execute_batch(
+        self, sentences: RaggedArray, rngs: Optional[Sequence[np.random.Generator]] = None
+    ) -> RaggedArray:
+        """Return the ragged batch unchanged."""
+        return sentences
@@ -1,14 +1,22 @@
-from typing import Protocol, List, Any
+from typing import Protocol, List, Any, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+
+from preprocessing.collation import Collator
+from ragged import RaggedArray
 from utils.logging_utils import with_logging
+from utils.random_state import sequence_rng
 from vocab import Vocabulary
 class Strategy(Protocol):
     '''Augments sequence by imitating sequencing errors'''
-    def execute(self, sequence: list[str]) -> list[str]:
+    def execute(self, sequence: list[str], rng: Optional[np.random.Generator] = None) -> list[str]:
         """
         Parameters
         ----------
         sequence : str
             DNA sequence
+        rng : np.random.Generator, optional
+            Generator of the sequence to draw random decisions from
 
         Returns
         ----------
@@ -16,6 +24,15 @@ class Strategy(Protocol):
             Augmented DNA sequence
         """
 
+class ProcessedBatch(NamedTuple):
+    """Output of `Preprocessor.process_batch`."""
+    ids: np.ndarray
+    """Int32 `(rows, optimal_length)` matrix of vocabulary IDs."""
+    mask: np.ndarray
+    """Boolean matrix, True on tokens and False on padding."""
+    parents: np.ndarray
+    """Int64 index of the sequence each row comes from; several rows per sequence with multi-window truncation."""
+
 class Preprocessor:
     def __init__(
         self,
@@ -24,7 +41,8 @@ class Preprocessor:
         padding_strategy: Strategy,
         truncation_strategy: Strategy,
         optimal_sentence_length: int = None,
-        vocab: Vocabulary = None
+        vocab: Vocabulary = None,
+        seed: Optional[Union[int, str]] = None
     ):
         self.augmentation_strategy = augmentation_strategy
         self.tokenization_strategy = tokenization_strategy
@@ -32,15 +50,175 @@ class Preprocessor:
         self.truncation_strategy = truncation_strategy
         self.optimal_sentence_length = optimal_sentence_length
         self.vocab = vocab
+        self.seed = seed
+        self._collator = None
+
+    @property
+    def multiple_windows(self) -> bool:
+        """Whether the truncation strategy splits a sequence into several windows."""
+        return getattr(self.truncation_strategy, "multiple_windows", False)
+
+    @property
+    def collator(self) -> Collator:
+        """Collator applying the padding and truncation strategies to batches."""
+        if self._collator is None:
+            self._collator = Collator(self.padding_strategy, self.truncation_strategy)
+        return self._collator
+
+    def _augment(
+        self, sequences: Sequence[str] | Sequence[np.ndarray], rngs: Optional[List[np.random.Generator]]
+    ) -> List[np.ndarray] | List[List[str]]:
+        """Augment a batch: as ASCII bytes in one `execute_batch` call when the alphabet allows it."""
+        strategy = self.augmentation_strategy
+        alphabet = getattr(getattr(strategy, "modifier", None), "alphabet", None) or []
+        if hasattr(strategy, "execute_batch") and all(len(base) == 1 and base.isascii() for base in alphabet):
+            lengths = [len(sequence) for sequence in sequences]
+            offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            if sequences and all(isinstance(sequence, np.ndarray) for sequence in sequences):
+                # ASCII arrays, e.g. unpacked from a PackedSequences store, need no str round trip
+                values = np.concatenate(sequences)
+            else:
+                values = np.frombuffer("".join(sequences).encode("ascii", errors="replace"), dtype=np.uint8)
+            values, offsets = strategy.execute_batch(values, offsets, rngs)
+            bounds = np.asarray(offsets).tolist()
+            return [values[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+        return [
+            strategy.execute(
+                list(sequence.tobytes().decode("ascii")) if isinstance(sequence, np.ndarray) else list(sequence),
+                rng=None if rngs is None else rngs[row],
+            )
+            for row, sequence in enumerate(sequences)
+        ]
+
+    def _tokenize(
+        self, augmented: List[np.ndarray] | List[List[str]], rngs: Optional[List[np.random.Generator]]
+    ) -> RaggedArray:
+        """Tokenize a batch into vocabulary IDs, in one `encode_batch` call when its IDs are the vocabulary's."""
+        strategy = self.tokenization_strategy
+        encodes_vocab_ids = (
+            getattr(strategy, "output", "tokens") == "ids" or getattr(strategy, "vocab", None) is self.vocab
+        )
+        if (
+            hasattr(strategy, "encode_batch") and encodes_vocab_ids
+            and getattr(strategy, "_code_table", None) is not None
+        ):
+            return strategy.encode_batch(augmented, rngs)
+
+        sentences = []
+        for row, sequence in enumerate(augmented):
+            if isinstance(sequence, np.ndarray):
+                sequence = list(sequence.tobytes().decode("ascii"))
+            sentences.append(strategy.execute(sequence, rng=None if rngs is None else rngs[row]))
+        if any(not isinstance(sentence, np.ndarray) for sentence in sentences):
+            # Tokenizers emitting tokens go through the vocabulary
+            return self.vocab.map_sentences(sentences)
+        return RaggedArray.from_arrays(sentences)
 
     @with_logging(level=10)
-    def process(self, sequence: str) -> List[List[str]]:
-        sequence = list(sequence)  # Convert string to list of characters
-        
-        augmented_sequence: List[str] = self.augmentation_strategy.execute(sequence)
-        tokenized_sentence: List[List[str]] = self.tokenization_strategy.execute(augmented_sequence) 
-        padded_sentence: List[List[str]] = self.padding_strategy.execute(tokenized_sentence)
-        processed_sentence: List[List[str]] = self.truncation_strategy.execute(padded_sentence)
-        mapped_sentence: List[List[int]] = self.vocab.map_sentence(processed_sentence)
-
-        return mapped_sentence
\ No newline at end of file
+    def process_batch(
+        self,
+        sequences: Sequence[str] | Sequence[np.ndarray],
+        sequence_ids: Optional[Sequence[Union[int, str]]] = None,
+        epoch: int = 0,
+    ) -> ProcessedBatch:
+        """
+        Augment, tokenize, pad and truncate a batch of sequences into an ID matrix.
+
+        Every stage runs once for the whole batch where it has a batch form: augmentation
+        on the concatenated bases, k-mer encoding into a `RaggedArray` of IDs, and padding
+        and truncation fused by the `Collator` into one `(rows, optimal_length)` matrix.
+        With a `seed` and `sequence_ids`, each sequence draws from its own generator, so a
+        sequence's row does not depend on the rest of the batch.
+
+        Args:
+            sequences (Sequence[str] | Sequence[np.ndarray]): DNA sequences, as `str` or as
+                arrays of ASCII bytes (e.g. from `PackedSequences.bases_batch`).
+            sequence_ids (Optional[Sequence[Union[int, str]]]): Stable ID of each sequence.
+            epoch (int): Epoch the sequences are processed for.
+
+        Returns:
+            ProcessedBatch: The ID matrix, its attention mask and the sequence of each row.
+        """
+        rngs = None
+        if self.seed is not None and sequence_ids is not None:
+            rngs = [sequence_rng(self.seed, sequence_id, epoch) for sequence_id in sequence_ids]
+
+        # Each sequence's generator is drawn from by the stages in this order
+        augmented = self._augment(sequences, rngs)
+        sentences = self._tokenize(augmented, rngs)
+        parents = np.arange(len(sentences), dtype=np.int64)
+        if self.multiple_windows:
+            # Windows stay views of their sentence until the collator copies them into their rows
+            parents, starts, lengths = self.truncation_strategy.windows(sentences)
+            sentences = sentences.slice_views(parents, starts, lengths)
+            rngs = None if rngs is None else [rngs[parent] for parent in parents.tolist()]
+        ids, mask, _ = self.collator.collate(sentences, rngs)
+        return ProcessedBatch(ids, mask, parents)
+
+    def to_ragged(self, batch: ProcessedBatch) -> RaggedArray:
+        """
+        Return the rows of a processed batch as a RaggedArray of sentences.
+
+        Without padding (e.g. when a bucketing collator pads later) the padding of the
+        matrix is dropped; otherwise rows are kept up to the padding length, whole when
+        padding and truncation share `optimal_length`.
+
+        Args:
+            batch (ProcessedBatch): Output of `process_batch`.
+
+        Returns:
+            RaggedArray: Int32 IDs, one row per matrix row.
+        """
+        rows, width = batch.ids.shape
+        padding_length = getattr(self.padding_strategy, "optimal_length", None)
+        if padding_length is not None and padding_length >= width:
+            return RaggedArray(batch.ids.reshape(-1), np.arange(rows + 1, dtype=np.int64) * width)
+        mask = batch.mask
+        if padding_length is not None:
+            # Padded to a shorter length than the truncation: the sentence fills the start of its row
+            lengths = np.maximum(mask.sum(axis=1), padding_length)
+            mask = np.arange(width) < lengths[:, None]
+        # The kept positions of a row are contiguous, so masking in row-major order concatenates them
+        offsets = np.zeros(rows + 1, dtype=np.int64)
+        np.cumsum(mask.sum(axis=1), out=offsets[1:])
+        return RaggedArray(batch.ids[mask], offsets)
+
+    def to_sentences(self, batch: ProcessedBatch) -> List[List[List[int]] | np.ndarray]:
+        """
+        Split a processed batch into one sentence per row, in the format `process` returns:
+        ID arrays when the tokenizer emits IDs and [[id], ...] lists otherwise.
+
+        Args:
+            batch (ProcessedBatch): Output of `process_batch`.
+
+        Returns:
+            List[List[List[int]] | np.ndarray]: The sentence of each row.
+        """
+        sentences = self.to_ragged(batch)
+        if getattr(self.tokenization_strategy, "output", "tokens") == "ids":
+            return list(sentences)
+        return sentences.to_sentences()
+
+    def process(
+        self, sequence: str, sequence_id: Optional[Union[int, str]] = None, epoch: int = 0
+    ) -> List[List[int]] | np.ndarray | List[List[List[int]] | np.ndarray]:
+        """
+        Augment, tokenize, pad and truncate a sequence and map it to vocabulary IDs.
+
+        A batch of one for `process_batch`. With a `seed` and a `sequence_id`, every random
+        decision is drawn from the sequence's own counter-based generator for the epoch, so
+        the result does not depend on which worker processes the sequence or in which order.
+
+        Args:
+            sequence (str): DNA sequence.
+            sequence_id (Optional[Union[int, str]]): Stable ID of the sequence.
+            epoch (int): Epoch the sequence is processed for.
+
+        Returns:
+            List[List[int]] | np.ndarray: Vocabulary IDs of the processed sentence, or a list
+            of them, one per window, if the truncation strategy emits multiple windows.
+        """
+        sequence_ids = None if sequence_id is None else [sequence_id]
+        sentences = self.to_sentences(self.process_batch([sequence], sequence_ids, epoch))
+        return sentences if self.multiple_windows else sentences[0]
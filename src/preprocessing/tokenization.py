@@ -1,39 +1,345 @@
+import heapq
 import random
 import logging
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+from ragged import RaggedArray
 from utils.logging_utils import with_logging
+from vocab import BpeVocabulary, KmerVocabulary, Vocabulary
 
 system_logger = logging.getLogger("system_logger")
+
+# IDs of the special tokens a Vocabulary starts with; k-mer IDs follow them
+UNK_ID = 1
+FIRST_KMER_ID = 2
+
+def window_values(codes: np.ndarray, k: int, base: int) -> np.ndarray:
+    """
+    Base-`base` value of every length-k window of a code array.
+
+    Windows of length 2^j are built from two windows of length 2^(j-1), and the binary
+    digits of k select which of them make up the result, so the cost is O(n log k)
+    array operations instead of one per window or per window position.
+
+    Args:
+        codes (np.ndarray): Int64 digit per position.
+        k (int): Window length.
+        base (int): Number base of the digits.
+
+    Returns:
+        np.ndarray: Int64 value of the window starting at every position, of length n - k + 1.
+    """
+    n = len(codes)
+    result, result_length = None, 0
+    window, window_length = codes, 1
+    while True:
+        if k & window_length:
+            if result is None:
+                result, result_length = window, window_length
+            else:
+                count = n - result_length - window_length + 1
+                result = result[:count] * base ** window_length + window[result_length:result_length + count]
+                result_length += window_length
+        if window_length * 2 > k:
+            return result
+        window = window[:-window_length] * base ** window_length + window[window_length:]
+        window_length *= 2
+
 class KmerStrategy:
-    def __init__(self, k: int, padding_alphabet: list[str] = ['A','C','G','T']):
+    def __init__(
+        self,
+        k: int,
+        padding_alphabet: list[str] = ['A','C','G','T'],
+        alphabet: list[str] = ['A','C','G','T'],
+        output: str = "tokens",
+        stride: Optional[int] = None,
+        vocab: Optional[Vocabulary] = None,
+    ):
+        """
+        Args:
+            k (int): Length of each k-mer.
+            padding_alphabet (list[str]): Characters used to pad the tail so the last k-mer is complete.
+            alphabet (list[str]): Alphabet of the k-mer vocabulary, used for `output="ids"`.
+            output (str): "tokens" returns [[kmer], ...] for `Vocabulary.map_sentence`;
+                "ids" returns an int32 array of vocabulary IDs, see `encode`.
+            stride (Optional[int]): Distance between the starts of consecutive k-mers;
+                defaults to k (non-overlapping), 1 gives fully overlapping k-mers.
+            vocab (Optional[Vocabulary]): Vocabulary the IDs refer to. Without it, or with the
+                matching `KmerVocabulary`, IDs are those of the exhaustive k-mer vocabulary;
+                otherwise they are translated to the vocabulary's IDs, see `_id_lookup`.
+        """
+        if output not in ("tokens", "ids"):
+            raise ValueError(f"Unsupported k-mer output: '{output}'. Available outputs: ['tokens', 'ids']")
+        if stride is not None and stride < 1:
+            raise ValueError(f"K-mer stride must be positive, got {stride}.")
         self.k = k
         self.padding_alphabet = padding_alphabet
-    
-    @with_logging(level=8)
-    def _make_divisible_by_k(self, input_seq: list[str]) -> list[str]:
-        """Pads seq if its length is not divisible by k, using random characters from the padding alphabet."""
-        seq = input_seq[:]
-        while len(seq) % self.k != 0:
-           seq.append(random.choice(self.padding_alphabet))
-        return seq
-    
-    @with_logging(level=9)
-    def execute(self, input_seq: list[str]) -> list[list[str]]:
-        """Tokenizes the seq into k-mers, adding padding if necessary."""
+        self.alphabet = alphabet
+        self.output = output
+        self.stride = stride
+        self.vocab = vocab
+        self._id_lookup_cache = None
+        self._code_table = self._build_code_table(alphabet)
+        self._place_values_cache = None
+
+    @staticmethod
+    def _build_code_table(alphabet: list[str]) -> Optional[np.ndarray]:
+        """Map each byte to its rank in the sorted alphabet, -1 if it is not in the alphabet."""
+        if not all(len(base) == 1 and base.isascii() for base in alphabet):
+            return None
+        table = np.full(256, -1, dtype=np.int64)
+        for rank, base in enumerate(sorted(set(alphabet))):
+            table[ord(base)] = rank
+        return table
 
-        seq = input_seq[:]
+    def _place_values(self) -> np.ndarray:
+        """Weight of each position of a k-mer in its base-|alphabet| value, cached per k."""
+        if self._place_values_cache is None or len(self._place_values_cache) != self.k:
+            self._place_values_cache = len(set(self.alphabet)) ** np.arange(self.k - 1, -1, -1, dtype=np.int64)
+        return self._place_values_cache
+
+    def _id_lookup(self) -> Optional[np.ndarray]:
+        """
+        Table from exhaustive k-mer IDs to the IDs of `self.vocab`, built once from the
+        vocabulary's `token_arrays` (k-mers it does not hold map to its UNK), or None when
+        the exhaustive IDs are the vocabulary's own.
+        """
+        vocab = self.vocab
+        if vocab is None:
+            return None
+        if isinstance(vocab, KmerVocabulary):
+            if vocab.k != self.k or vocab.alphabet != sorted(set(self.alphabet)):
+                raise ValueError(
+                    f"KmerVocabulary of {vocab.k}-mers over {vocab.alphabet} does not match "
+                    f"the tokenizer's {self.k}-mers over {sorted(set(self.alphabet))}"
+                )
+            return None
+
+        base = len(set(self.alphabet))
+        if self._id_lookup_cache is None or len(self._id_lookup_cache) != FIRST_KMER_ID + base ** self.k:
+            lookup = np.full(FIRST_KMER_ID + base ** self.k, vocab.unk_id, dtype=np.int32)
+            blob, offsets, ids = vocab.token_arrays()
+            # Only tokens of k single-byte bases can be k-mers; gather their bytes as a (tokens, k) matrix
+            of_length_k = np.diff(offsets) == self.k
+            codes = self._code_table[blob[offsets[:-1][of_length_k][:, None] + np.arange(self.k)]]
+            kmers = (codes >= 0).all(axis=1)
+            lookup[FIRST_KMER_ID + codes[kmers] @ self._place_values()] = ids[of_length_k][kmers]
+            self._id_lookup_cache = lookup
+        return self._id_lookup_cache
+
+    def _check_k(self) -> None:
         if self.k == 0:
             self.k = 1
             system_logger.warning(f"[PROCESSING.TOKENIZATION] 'KmerStrategy.execute':  k cant be {0}; set to {1}")
 
-        remainder = len(seq) % self.k
-        if remainder != 0:
-            seq = self._make_divisible_by_k(seq)
+    def _stride(self) -> int:
+        return self.k if self.stride is None else self.stride
+
+    def _tail_padding_length(self, length: int) -> int:
+        """Number of characters to append so the last k-mer of a sequence is complete."""
+        if length == 0:
+            return 0
+        if length < self.k:
+            return self.k - length
+        return -(length - self.k) % self._stride()
+
+    def _random_padding(self, length: int, rng: Optional[np.random.Generator] = None) -> list[str]:
+        """`length` random characters from the padding alphabet, drawn from `rng` if given."""
+        if rng is None:
+            return [random.choice(self.padding_alphabet) for _ in range(length)]
+        return [self.padding_alphabet[i] for i in rng.integers(0, len(self.padding_alphabet), length)]
+
+    @with_logging(level=8)
+    def _make_divisible_by_k(self, input_seq: list[str], rng: Optional[np.random.Generator] = None) -> list[str]:
+        """
+        Pads seq if its last k-mer is incomplete (for non-overlapping k-mers, if its length is
+        not divisible by k), using random characters from the padding alphabet.
+        """
+        return input_seq + self._random_padding(self._tail_padding_length(len(input_seq)), rng)
+
+    def _base_codes(self, input_seq: Union[str, list[str], np.ndarray]) -> np.ndarray:
+        """Alphabet rank of every base of a sequence given as str, list of characters, or ASCII bytes."""
+        if isinstance(input_seq, np.ndarray):
+            raw = input_seq.astype(np.uint8, copy=False)
+        else:
+            if not isinstance(input_seq, str):
+                input_seq = "".join(input_seq)
+            raw = np.frombuffer(input_seq.encode("ascii", errors="replace"), dtype=np.uint8)
+        return self._code_table[raw]
+
+    def encode(self, input_seq: Union[str, list[str], np.ndarray], rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """
+        Tokenizes the seq into k-mers, `stride` bases apart, and returns their vocabulary IDs.
+
+        Bases are mapped to their rank in the sorted alphabet and each k-mer's ID is
+        2 + its base-|alphabet| value, computed for non-overlapping k-mers with one
+        matrix product and for overlapping ones with `window_values`. This is the ID
+        `KmerVocabConstructor` assigns (2 + lexicographic rank among all k-mers), and
+        k-mers containing a base outside the alphabet map to UNK; IDs are translated
+        when `vocab` holds only some k-mers. The tail is padded with random characters
+        from the padding alphabet, as in `execute`.
+
+        Args:
+            input_seq (Union[str, list[str], np.ndarray]): Sequence as a string, a list of
+                characters, or an array of ASCII bytes (e.g. `PackedSequences.bases`).
+            rng (Optional[np.random.Generator]): Generator for the tail padding; the
+                `random` module otherwise.
+
+        Returns:
+            np.ndarray: Int32 vocabulary ID per k-mer.
+        """
+        if self._code_table is None:
+            raise ValueError(f"ID output needs an alphabet of single ASCII characters, got {self.alphabet}")
+        self._check_k()
+
+        codes = self._base_codes(input_seq)
+        padding_length = self._tail_padding_length(len(codes))
+        if padding_length:
+            codes = np.concatenate([codes, self._base_codes(self._random_padding(padding_length, rng))])
+        if len(codes) == 0:
+            return np.zeros(0, dtype=np.int32)
+
+        stride = self._stride()
+        if stride == self.k:
+            ids = codes.reshape(-1, self.k) @ self._place_values() + FIRST_KMER_ID
+        else:
+            ids = window_values(codes, self.k, len(set(self.alphabet)))[::stride] + FIRST_KMER_ID
+
+        unknown = codes < 0
+        if unknown.any():
+            # Unknown bases per k-mer from a running count, O(n) regardless of k
+            unknown_before = np.concatenate([[0], np.cumsum(unknown)])
+            starts = np.arange(len(ids)) * stride
+            ids[unknown_before[starts + self.k] > unknown_before[starts]] = UNK_ID
+
+        lookup = self._id_lookup()
+        if lookup is not None:
+            return lookup[ids]
+        return ids.astype(np.int32)
+
+    @with_logging(level=9)
+    def encode_batch(
+        self,
+        sequences: Sequence[Union[str, list[str], np.ndarray]],
+        rngs: Optional[Sequence[np.random.Generator]] = None,
+    ) -> RaggedArray:
+        """
+        Encode a batch of sequences into one ragged array of vocabulary IDs.
+
+        Args:
+            sequences (Sequence[Union[str, list[str], np.ndarray]]): Sequences, as for `encode`.
+            rngs (Optional[Sequence[np.random.Generator]]): Generator of each sequence.
+
+        Returns:
+            RaggedArray: Int32 vocabulary IDs, one row per sequence.
+        """
+        return RaggedArray.from_arrays(
+            self.encode(sequence, None if rngs is None else rngs[row]) for row, sequence in enumerate(sequences)
+        )
+
+    @with_logging(level=9)
+    def execute(
+        self, input_seq: list[str], rng: Optional[np.random.Generator] = None
+    ) -> Union[list[list[str]], np.ndarray]:
+        """Tokenizes the seq into k-mers, adding padding if necessary."""
+        if self.output == "ids":
+            return self.encode(input_seq, rng)
+
+        # The input is only read, so it is not copied; padding builds a new list
+        seq = input_seq
+        self._check_k()
+
+        if self._tail_padding_length(len(seq)) != 0:
+            seq = self._make_divisible_by_k(seq, rng)
 
         # Tokenize into k-mers
-        kmer_seq = [''.join(seq[i:i + self.k]) for i in range(0, len(seq), self.k)]
+        kmer_seq = [''.join(seq[i:i + self.k]) for i in range(0, len(seq) - self.k + 1, self._stride())]
         tokenized_sentence = [[kmer] for kmer in kmer_seq]
 
         return tokenized_sentence
-    
-    
-    
+
+
+class BpeStrategy:
+    def __init__(self, vocab: BpeVocabulary, output: str = "tokens"):
+        """
+        Args:
+            vocab (BpeVocabulary): Vocabulary holding the learned merges.
+            output (str): "tokens" returns [[token], ...] for `Vocabulary.map_sentence`;
+                "ids" returns an int32 array of vocabulary IDs.
+        """
+        if output not in ("tokens", "ids"):
+            raise ValueError(f"Unsupported BPE output: '{output}'. Available outputs: ['tokens', 'ids']")
+        if not isinstance(vocab, BpeVocabulary):
+            raise ValueError(f"BPE tokenization needs a BpeVocabulary, got {type(vocab).__name__}")
+        self.vocab = vocab
+        self.output = output
+        # (left ID, right ID) -> (rank, merged ID); the first merge of a pair wins
+        self.merge_ranks: dict[tuple[int, int], tuple[int, int]] = {}
+        for rank, (left, right) in enumerate(vocab.merges):
+            pair = (vocab.get_id(left), vocab.get_id(right))
+            self.merge_ranks.setdefault(pair, (rank, vocab.get_id(left + right)))
+
+    def encode(self, input_seq: Union[str, list[str]]) -> list[int]:
+        """
+        Applies the learned merges to the seq and returns the vocabulary IDs of its tokens.
+
+        Candidate merges of adjacent symbols sit in a heap ordered by merge rank (then
+        position), and the symbols in a linked list. Each merge only pushes the two new
+        pairs it creates, so a sequence of n bases is encoded in O(n log n), with the
+        same result as applying the merges one by one in training order.
+
+        Args:
+            input_seq (Union[str, list[str]]): Sequence as a string or a list of characters.
+
+        Returns:
+            list[int]: Vocabulary ID per token.
+        """
+        merge_ranks = self.merge_ranks
+        symbols = [self.vocab.get_id(base) for base in input_seq]
+        size = len(symbols)
+        next_position = list(range(1, size + 1))
+        next_position[-1:] = [-1]
+        previous_position = list(range(-1, size - 1))
+
+        heap = []
+        for i in range(size - 1):
+            merge = merge_ranks.get((symbols[i], symbols[i + 1]))
+            if merge is not None:
+                heap.append((merge[0], i))
+        heapq.heapify(heap)
+
+        while heap:
+            rank, i = heapq.heappop(heap)
+            j = next_position[i]
+            if symbols[i] is None or j == -1:
+                continue
+            merge = merge_ranks.get((symbols[i], symbols[j]))
+            if merge is None or merge[0] != rank:
+                continue  # Stale candidate: a neighbour was merged first
+            symbols[i], symbols[j] = merge[1], None
+            n = next_position[j]
+            next_position[i] = n
+            if n != -1:
+                previous_position[n] = i
+                merge = merge_ranks.get((symbols[i], symbols[n]))
+                if merge is not None:
+                    heapq.heappush(heap, (merge[0], i))
+            p = previous_position[i]
+            if p != -1:
+                merge = merge_ranks.get((symbols[p], symbols[i]))
+                if merge is not None:
+                    heapq.heappush(heap, (merge[0], p))
+
+        return [symbol for symbol in symbols if symbol is not None]
+
+    @with_logging(level=9)
+    def execute(
+        self, input_seq: list[str], rng: Optional[np.random.Generator] = None
+    ) -> Union[list[list[str]], np.ndarray]:
+        """Tokenizes the seq into learned BPE tokens. BPE is deterministic, `rng` is unused."""
+        ids = self.encode(input_seq)
+        if self.output == "ids":
+            return np.array(ids, dtype=np.int32)
+        return [[self.vocab.get_token(idx)] for idx in ids]
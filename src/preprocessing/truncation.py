@@ -1,42 +1,153 @@
 
 import random
+from typing import Optional, Sequence
+
+import numpy as np
+
+from ragged import RaggedArray
 from utils.logging_utils import with_logging
 
+def _truncate_batch(
+    strategy, sentences: RaggedArray, rngs: Optional[Sequence[np.random.Generator]] = None
+) -> tuple[RaggedArray, np.ndarray]:
+    """Keep the window `strategy.window_start` picks in every row, gathered in one pass."""
+    lengths = sentences.lengths
+    starts = [
+        strategy.window_start(length, None if rngs is None else rngs[row])
+        for row, length in enumerate(lengths.tolist())
+    ]
+    rows = np.arange(len(sentences))
+    return sentences.slice_rows(rows, starts, np.minimum(lengths, strategy.optimal_length)), rows
+
 class FrontStrategy:
    
     def __init__(self, optimal_length):
         self.optimal_length = optimal_length
 
+    def window_start(self, length: int, rng: Optional[np.random.Generator] = None) -> int:
+        """Return where the kept window of a sentence of `length` tokens starts."""
+        return max(0, length - self.optimal_length)
+
     @with_logging(level=8)
-    def execute(self, seq: list[list[str]]) -> list[list[str]]:
+    def execute(self, seq: list[list[str]], rng: Optional[np.random.Generator] = None) -> list[list[str]]:
         return seq[-self.optimal_length:]
+
+    @with_logging(level=8)
+    def execute_batch(
+        self, sentences: RaggedArray, rngs: Optional[Sequence[np.random.Generator]] = None
+    ) -> tuple[RaggedArray, np.ndarray]:
+        """Truncate every row of a ragged batch; returns the rows and the index of their sentences."""
+        return _truncate_batch(self, sentences, rngs)
     
 class EndStrategy:
    
     def __init__(self, optimal_length):
         self.optimal_length = optimal_length
 
+    def window_start(self, length: int, rng: Optional[np.random.Generator] = None) -> int:
+        """Return where the kept window of a sentence of `length` tokens starts."""
+        return 0
+
     @with_logging(level=8)
-    def execute(self, seq: list[list[str]]) -> list[list[str]]:
+    def execute(self, seq: list[list[str]], rng: Optional[np.random.Generator] = None) -> list[list[str]]:
         return seq[:self.optimal_length]
+
+    @with_logging(level=8)
+    def execute_batch(
+        self, sentences: RaggedArray, rngs: Optional[Sequence[np.random.Generator]] = None
+    ) -> tuple[RaggedArray, np.ndarray]:
+        """Truncate every row of a ragged batch; returns the rows and the index of their sentences."""
+        return _truncate_batch(self, sentences, rngs)
     
 class SlidingwindowStrategy:
    
     def __init__(self, optimal_length):
         self.optimal_length = optimal_length
 
+    def window_start(self, length: int, rng: Optional[np.random.Generator] = None) -> int:
+        """Return where the kept window of a sentence of `length` tokens starts."""
+        max_start_index = length - self.optimal_length
+        if max_start_index <= 0:
+            return 0
+        # Choose a random start index in the valid range, from the sequence's generator if given
+        if rng is None:
+            return random.randint(0, max_start_index)
+        return int(rng.integers(0, max_start_index + 1))
+
     @with_logging(level=8)
-    def execute(self, seq: list[list[str]]) -> list[list[str]]:
-        truncated_seq = seq[:]
+    def execute(self, seq: list[list[str]], rng: Optional[np.random.Generator] = None) -> list[list[str]]:
+        truncated_seq = seq
 
         # Return the whole sequence if it's already within optimal length
         if len(truncated_seq) <= self.optimal_length:
             return truncated_seq  
     
-        max_start_index = len(truncated_seq) - self.optimal_length
-        
-        # Choose a random start index in the valid range
-        start_index = random.randint(0, max_start_index)
+        start_index = self.window_start(len(truncated_seq), rng)
         
         # Extract the subarray of length optimal_length
-        return truncated_seq[start_index:start_index + self.optimal_length]
\ No newline at end of file
+        return truncated_seq[start_index:start_index + self.optimal_length]
+
+    @with_logging(level=8)
+    def execute_batch(
+        self, sentences: RaggedArray, rngs: Optional[Sequence[np.random.Generator]] = None
+    ) -> tuple[RaggedArray, np.ndarray]:
+        """Truncate every row of a ragged batch; returns the rows and the index of their sentences."""
+        return _truncate_batch(self, sentences, rngs)
+class MultiwindowStrategy:
+    """
+    Split long sentences into several windows of `optimal_length` instead of dropping tokens.
+
+    Windows start every `stride` tokens (default `optimal_length`, i.e. no overlap) and
+    the last one is aligned to the sentence end, so every token is in some window.
+    Windows of an ID array are views of the sentence; in a batch they are described by
+    `windows` and only copied when the Collator writes them into the ID matrix.
+    """
+    multiple_windows = True
+
+    def __init__(self, optimal_length, stride: Optional[int] = None):
+        self.optimal_length = optimal_length
+        self.stride = optimal_length if stride is None else stride
+        if self.stride < 1:
+            raise ValueError(f"Window stride must be positive, got {self.stride}.")
+
+    def window_starts(self, length: int) -> np.ndarray:
+        """Return the start of every window of a sentence of `length` tokens."""
+        if length <= self.optimal_length:
+            return np.zeros(1, dtype=np.int64)
+        last_start = length - self.optimal_length
+        starts = np.arange(0, last_start, self.stride, dtype=np.int64)
+        return np.append(starts, last_start)
+
+    def window_start(self, length: int, rng: Optional[np.random.Generator] = None) -> int:
+        """Return where the first window of a sentence of `length` tokens starts."""
+        return 0
+
+    @with_logging(level=8)
+    def execute(self, seq: list[list[str]], rng: Optional[np.random.Generator] = None) -> list[list[list[str]]]:
+        return [seq[start:start + self.optimal_length] for start in self.window_starts(len(seq)).tolist()]
+
+    def windows(self, sentences: RaggedArray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Describe the windows of every row of a ragged batch without copying any IDs.
+
+        Args:
+            sentences (RaggedArray): Token IDs of each sentence.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: The int64 index of the sentence of
+            each window, its start within the sentence and its length.
+        """
+        lengths = sentences.lengths
+        starts = [self.window_starts(length) for length in lengths.tolist()]
+        counts = np.array([len(row_starts) for row_starts in starts], dtype=np.int64)
+        rows = np.repeat(np.arange(len(sentences)), counts)
+        all_starts = np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+        return rows, all_starts, np.minimum(lengths, self.optimal_length)[rows]
+
+    @with_logging(level=8)
+    def execute_batch(
+        self, sentences: RaggedArray, rngs: Optional[Sequence[np.random.Generator]] = None
+    ) -> tuple[RaggedArray, np.ndarray]:
+        """Split every row of a ragged batch into windows, copied into a new RaggedArray; returns them and the index of their sentences."""
+        rows, starts, lengths = self.windows(sentences)
+        return sentences.slice_rows(rows, starts, lengths), rows
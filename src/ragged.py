@@ -0,0 +1,137 @@
+from typing import Iterable, Iterator, List, Sequence, Union
+
+import numpy as np
+
+VALUES_DTYPE = np.int32
+OFFSETS_DTYPE = np.int64
+
+
+class RaggedArray:
+    """
+    Variable-length rows of token IDs in two contiguous arrays.
+
+    Row i is `values[offsets[i]:offsets[i + 1]]`, so a whole dataset of sentences takes
+    one int32 buffer and one int64 offset array instead of a Python list per sentence
+    and per token. Rows are returned as views of the values.
+
+    The list API of the preprocessing stages, a sentence as [[id], ...], is supported
+    through `from_sentences` and `to_sentences`.
+    """
+
+    def __init__(self, values: np.ndarray, offsets: np.ndarray):
+        """
+        Initialize the RaggedArray.
+
+        Args:
+            values (np.ndarray): Concatenated rows, cast to int32 if needed.
+            offsets (np.ndarray): Start of every row plus the end of the last, cast to int64 if needed.
+
+        Raises:
+            ValueError: If the offsets do not start at 0, decrease, or do not end at `len(values)`.
+        """
+        values = np.asarray(values)
+        if values.dtype != VALUES_DTYPE:
+            values = values.astype(VALUES_DTYPE)
+        offsets = np.asarray(offsets, dtype=OFFSETS_DTYPE)
+        if offsets.ndim != 1 or len(offsets) == 0 or offsets[0] != 0 or offsets[-1] != len(values):
+            raise ValueError(f"Offsets must run from 0 to {len(values)}.")
+        if (np.diff(offsets) < 0).any():
+            raise ValueError("Offsets must not decrease.")
+        self.values = values
+        self.offsets = offsets
+
+    @classmethod
+    def from_arrays(cls, arrays: Iterable[np.ndarray]) -> "RaggedArray":
+        """
+        Build a RaggedArray from one array per row.
+
+        Args:
+            arrays (Iterable[np.ndarray]): Rows of token IDs.
+
+        Returns:
+            RaggedArray: The rows, copied into one buffer.
+        """
+        arrays = [np.asarray(array).reshape(-1) for array in arrays]
+        offsets = np.zeros(len(arrays) + 1, dtype=OFFSETS_DTYPE)
+        np.cumsum([len(array) for array in arrays], out=offsets[1:])
+        values = np.concatenate(arrays).astype(VALUES_DTYPE, copy=False) if arrays else np.empty(0, dtype=VALUES_DTYPE)
+        return cls(values, offsets)
+
+    @classmethod
+    def from_sentences(cls, sentences: Iterable[Union[List[List[int]], np.ndarray]]) -> "RaggedArray":
+        """
+        Build a RaggedArray from sentences in the list API, [[id], ...], or ID arrays.
+
+        Args:
+            sentences (Iterable[Union[List[List[int]], np.ndarray]]): Sentences of token IDs.
+
+        Returns:
+            RaggedArray: One row per sentence.
+        """
+        return cls.from_arrays(
+            sentence if isinstance(sentence, np.ndarray)
+            else np.fromiter((token for token_list in sentence for token in token_list), dtype=VALUES_DTYPE)
+            for sentence in sentences
+        )
+
+    def to_sentences(self) -> List[List[List[int]]]:
+        """Return the rows in the list API, one [[id], ...] sentence per row."""
+        values = self.values.tolist()
+        offsets = self.offsets.tolist()
+        return [[[token] for token in values[start:end]] for start, end in zip(offsets[:-1], offsets[1:])]
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """Number of tokens in each row."""
+        return np.diff(self.offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Row {index} out of range for {len(self)} rows.")
+        return self.values[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            yield self.values[start:end]
+
+    def slice_views(self, rows: Sequence[int], starts: Sequence[int], lengths: Sequence[int]) -> List[np.ndarray]:
+        """
+        Return slices of the given rows as views of the values, e.g. overlapping windows.
+
+        Args:
+            rows (Sequence[int]): Row of each slice; a row may be sliced several times.
+            starts (Sequence[int]): Start of each slice within its row.
+            lengths (Sequence[int]): Length of each slice.
+
+        Returns:
+            List[np.ndarray]: Slice j is `self[rows[j]][starts[j]:starts[j] + lengths[j]]`, not a copy.
+        """
+        firsts = (self.offsets[np.asarray(rows, dtype=OFFSETS_DTYPE)] + np.asarray(starts, dtype=OFFSETS_DTYPE)).tolist()
+        return [self.values[first:first + length] for first, length in zip(firsts, np.asarray(lengths).tolist())]
+
+    def slice_rows(self, rows: Sequence[int], starts: Sequence[int], lengths: Sequence[int]) -> "RaggedArray":
+        """
+        Gather a slice of the given rows into a new RaggedArray, e.g. the windows kept by truncation.
+
+        Args:
+            rows (Sequence[int]): Row of each slice; a row may be sliced several times.
+            starts (Sequence[int]): Start of each slice within its row.
+            lengths (Sequence[int]): Length of each slice.
+
+        Returns:
+            RaggedArray: Row j is `self[rows[j]][starts[j]:starts[j] + lengths[j]]`.
+        """
+        rows = np.asarray(rows, dtype=OFFSETS_DTYPE)
+        starts = np.asarray(starts, dtype=OFFSETS_DTYPE)
+        lengths = np.asarray(lengths, dtype=OFFSETS_DTYPE)
+        offsets = np.zeros(len(lengths) + 1, dtype=OFFSETS_DTYPE)
+        np.cumsum(lengths, out=offsets[1:])
+        # Source index of every kept value: its slice's start in `values` plus its position in the slice
+        shift = np.repeat(self.offsets[rows] + starts - offsets[:-1], lengths)
+        return RaggedArray(self.values[np.arange(offsets[-1]) + shift], offsets)
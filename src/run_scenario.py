@@ -2,12 +2,20 @@ import argparse
 import json
 import os
 import pandas as pd
-from factory import create_preprocessor, create_vocabulary
+from factory import create_collator, create_preprocessor, create_vocabulary
 from errors import ConstructionError, PreprocessingError
 from utils.logging_utils import setup_logging
+from epoch_shards import materialize_epochs
 from preparer import SequenceDataPreparer
+from sequence_store import PackedSequences, iter_batches
+from utils.data_cache import PreparedDataCache
+from utils.prepared_io import read_prepared
+from vocab import VOCAB_EXTENSIONS, load_vocabulary, save_vocabulary
 from tqdm import tqdm  # Ensure tqdm is imported
 
+# Sequences preprocessed per Preprocessor.process_batch call
+PROCESSING_BATCH_SIZE = 1024
+
 
 def load_configs(scenario_folder):
     """Load all configuration files from the scenario folder."""
@@ -28,45 +36,154 @@ def load_configs(scenario_folder):
     return general_config, pretraining_config, finetuning_config
 
 
-def prepare_data(fasta_file, output_dir, test_size, random_seed, logger, scenario_dir=None, force_reprocess=False):
-    """Prepare training and testing data."""
-    preparer = SequenceDataPreparer(fasta_file, output_dir)
-    train_file, test_file = preparer.prepare(test_size, random_seed)
+def prepare_data(config, logger):
+    """
+    Prepare training and testing data, reusing a cached preparation when possible.
+
+    Prepared splits are cached under `prepared_data_dir`, keyed by the FASTA content and
+    every option that affects the split. `force_reprocess: true` rebuilds the entry.
+    """
+    fasta_file = config["fasta_file"]
+    output_dir = os.path.abspath(config["prepared_data_dir"])
+    force_reprocess = config.get("force_reprocess", False)
+    params = {
+        "test_size": config["test_size"],
+        "random_seed": config["random_seed"],
+        "prepared_format": config.get("prepared_format", "csv"),
+        "split_mode": config.get("split_mode", "random"),
+        "deduplicate": config.get("deduplicate", False),
+        "pack_sequences": config.get("pack_sequences", False),
+    }
+    if params["split_mode"] == "stratified":
+        params["stratify_rank"] = config.get("stratify_rank", "Species")
+        params["min_class_size"] = config.get("min_class_size", 2)
+        params["rare_class_policy"] = config.get("rare_class_policy", "train")
+
+    cache = PreparedDataCache(output_dir)
+    key = cache.key(fasta_file, params)
+    if not force_reprocess:
+        cached = cache.lookup(key)
+        if cached is not None:
+            logger.info(f"Reusing prepared data {key[:16]}: Train file: {cached['train']}, Test file: {cached['test']}")
+            return cached["train"], cached["test"]
+
+    cache.invalidate(key)
+    preparer = SequenceDataPreparer(
+        fasta_file,
+        cache.entry_dir(key),
+        batch_size=config.get("batch_size", 10000),
+        workers=config.get("workers"),
+        output_format=params["prepared_format"],
+        deduplicate=params["deduplicate"],
+        pack_sequences=params["pack_sequences"],
+    )
+    split_options = {
+        option: params[option]
+        for option in ("stratify_rank", "min_class_size", "rare_class_policy")
+        if option in params
+    }
+    train_file, test_file = preparer.prepare(
+        params["test_size"], params["random_seed"], params["split_mode"], **split_options
+    )
+    files = {"train": train_file, "test": test_file}
+    if preparer.duplicates_file is not None:
+        files["duplicates"] = preparer.duplicates_file
+    if preparer.packed_files is not None:
+        files["train_packed"], files["test_packed"] = preparer.packed_files
+    cache.store(key, fasta_file, params, files)
     logger.info(f"Data prepared: Train file: {train_file}, Test file: {test_file}")
     return train_file, test_file
 
 
+def load_sequences(prepared_file):
+    """
+    Load the sequences of a prepared split and their record IDs, from its packed store when one was saved.
+
+    The store keeps the split in memory at about 2 bits per base, and `process_sequences`
+    and `materialize_epochs` unpack it batch by batch into ASCII arrays for augmentation.
+    The record IDs key each sequence's random generator, so its augmentation does not
+    depend on the split options or the order of the records.
+    """
+    packed_file = os.path.splitext(prepared_file)[0] + ".npz"
+    if os.path.exists(packed_file):
+        return PackedSequences.load(packed_file), read_prepared(prepared_file, columns=["ID"])["ID"].tolist()
+    prepared = read_prepared(prepared_file, columns=["ID", "Sequence"])
+    return prepared["Sequence"].tolist(), prepared["ID"].tolist()
+
+
+def process_sequences(preprocessor, sequences, sequence_ids=None, batch_size=PROCESSING_BATCH_SIZE, desc=None):
+    """
+    Process sequences into a frame of examples, `batch_size` sequences per `process_batch` call.
+
+    A `PackedSequences` store is fed to `process_batch` as ASCII arrays, without decoding
+    its sequences into `str`. Each sequence's generator is keyed by its ID in
+    `sequence_ids`, e.g. the record IDs from `load_sequences`, or by its index without
+    them. With a multi-window truncation strategy a sequence gives several examples, and
+    a `Parent` column holds the index of the sequence each one comes from. With `desc`,
+    progress is shown under that description.
+    """
+    examples, parents = [], []
+    progress = tqdm(total=len(sequences), desc=desc) if desc is not None else None
+    start = 0
+    for batch in iter_batches(sequences, batch_size):
+        batch_ids = range(start, start + len(batch)) if sequence_ids is None else sequence_ids[start:start + len(batch)]
+        processed = preprocessor.process_batch(batch, sequence_ids=batch_ids)
+        examples.extend(preprocessor.to_sentences(processed))
+        parents.extend((processed.parents + start).tolist())
+        start += len(batch)
+        if progress is not None:
+            progress.update(len(batch))
+    if progress is not None:
+        progress.close()
+    if preprocessor.multiple_windows:
+        return pd.DataFrame({"Sequence": examples, "Parent": parents})
+    return pd.DataFrame({"Sequence": examples})
+
+
 def run_pretraining(pretraining_config, scenario_dir, logger):
     """Run the pretraining process."""
     logger.info("Running pretraining...")
-    fasta_file = pretraining_config["fasta_file"]
-    output_dir = os.path.abspath(pretraining_config["prepared_data_dir"])
-    test_size = pretraining_config["test_size"]
-    random_seed = pretraining_config["random_seed"]
-    force_reprocess = pretraining_config.get("force_reprocess", False)
 
     # Step 1: Data Preparation
-    os.makedirs(output_dir, exist_ok=True)
-    train_file, _ = prepare_data(
-        fasta_file, output_dir, test_size, random_seed, logger, scenario_dir, force_reprocess
-    )
+    train_file, _ = prepare_data(pretraining_config, logger)
 
-    # Step 2: Create Vocabulary and Preprocessor
-    vocab = create_vocabulary(pretraining_config)
-    vocab.save(os.path.join(scenario_dir, "pretraining_vocab.json"))
+    # Step 2: Create Vocabulary (from the training split, if it is data-driven) and Preprocessor
+    train_sequences, train_ids = load_sequences(train_file)
+    vocab = create_vocabulary(pretraining_config, data=train_sequences)
+    vocab_format = pretraining_config.get("vocab_format", "binary")
+    save_vocabulary(vocab, os.path.join(scenario_dir, "pretraining_vocab" + VOCAB_EXTENSIONS[vocab_format]), vocab_format)
     preprocessor = create_preprocessor(pretraining_config, vocab)
 
     # Step 3: Load Dataset and Initialize DataLoader (Placeholder)
     logger.info("Initializing Dataset and DataLoader (Placeholder)")
-    train_df = pd.read_csv(train_file)
-    preprocessed_data = [
-        preprocessor.process(sequence) for sequence in tqdm(train_df["Sequence"].tolist(), desc="Processing sequences")
-    ]
+    augmentation_epochs = pretraining_config.get("augmentation_epochs", 0)
+    if augmentation_epochs:
+        # Pre-generate a differently augmented copy of the training split per epoch
+        epochs_dir = os.path.join(scenario_dir, "pretraining_epochs")
+        shards = materialize_epochs(
+            preprocessor, train_sequences, augmentation_epochs, epochs_dir,
+            workers=pretraining_config.get("workers"), sequence_ids=train_ids,
+        )
+        logger.info(f"Materialized {len(shards)} epochs of {shards.sequences} sequences to {epochs_dir}")
+        collator = create_collator(pretraining_config)
+        if collator.buckets is not None:
+            logger.info(f"Bucket statistics saved to {shards.write_bucket_stats(collator)}")
+        logger.info("Training logic to be implemented with Trainer class (Placeholder).")
+        return
+
+    preprocessed_data = process_sequences(preprocessor, train_sequences, train_ids, desc="Processing sequences")
 
     # Save preprocessed data for use in training
     preprocessed_file = os.path.join(scenario_dir, "pretraining_data.csv")
-    pd.DataFrame({"Sequence": preprocessed_data}).to_csv(preprocessed_file, index=False)
+    preprocessed_data.to_csv(preprocessed_file, index=False)
     logger.info(f"Pretraining data saved to {preprocessed_file}")
+    collator = create_collator(pretraining_config)
+    if collator.buckets is not None:
+        # Sentences were left unpadded; record how the collator will bucket them
+        stats_file = os.path.join(scenario_dir, "pretraining_bucket_stats.json")
+        with open(stats_file, "w") as f:
+            json.dump(collator.bucket_stats([len(sentence) for sentence in preprocessed_data["Sequence"]]), f, indent=4)
+        logger.info(f"Bucket statistics saved to {stats_file}")
 
     # Step 4: Call Trainer (Placeholder)
     logger.info("Training logic to be implemented with Trainer class (Placeholder).")
@@ -74,34 +191,24 @@ def run_pretraining(pretraining_config, scenario_dir, logger):
 def run_finetuning(finetuning_config, scenario_dir, logger):
     """Run the finetuning process."""
     logger.info("Running finetuning...")
-    fasta_file = finetuning_config["fasta_file"]
-    output_dir = os.path.abspath(finetuning_config["prepared_data_dir"])
-    test_size = finetuning_config["test_size"]
-    random_seed = finetuning_config["random_seed"]
-    force_reprocess = finetuning_config.get("force_reprocess", False)
 
     # Prepare data
-    os.makedirs(output_dir, exist_ok=True)  # Ensure directory exists
-    train_file, test_file = prepare_data(
-        fasta_file, output_dir, test_size, random_seed, logger, scenario_dir, force_reprocess
-    )
+    train_file, test_file = prepare_data(finetuning_config, logger)
 
-    # Load pretraining vocabulary
-    vocab_path = os.path.join(scenario_dir, "pretraining_vocab.json")
-    vocab = create_vocabulary(finetuning_config)
-    vocab.load(vocab_path)
+    # Load pretraining vocabulary, memory-mapped when it was saved in the binary format
+    vocab_path = os.path.join(scenario_dir, "pretraining_vocab" + VOCAB_EXTENSIONS["binary"])
+    if not os.path.exists(vocab_path):
+        vocab_path = os.path.join(scenario_dir, "pretraining_vocab" + VOCAB_EXTENSIONS["json"])
+    vocab = load_vocabulary(vocab_path)
 
     preprocessor = create_preprocessor(finetuning_config, vocab)
 
     # Process sequences
-    train_df = pd.read_csv(train_file)
-    preprocessed_data = [
-        preprocessor.process(sequence) for sequence in train_df["Sequence"].tolist()
-    ]
+    preprocessed_data = process_sequences(preprocessor, *load_sequences(train_file))
 
     # Save preprocessed data
     preprocessed_file = os.path.join(scenario_dir, "finetuning_data.csv")
-    pd.DataFrame({"Sequence": preprocessed_data}).to_csv(preprocessed_file, index=False)
+    preprocessed_data.to_csv(preprocessed_file, index=False)
     logger.info(f"Finetuning data saved to {preprocessed_file}")
 
 
@@ -0,0 +1,259 @@
+from itertools import islice
+from typing import Iterable, Iterator
+
+import numpy as np
+
+BASES = b"ACGT"
+EXCEPTION_CODE = 255
+
+# ASCII byte -> 2-bit code, EXCEPTION_CODE for anything outside ACGT (IUPAC codes, N, gaps, lowercase)
+_ENCODE = np.full(256, EXCEPTION_CODE, dtype=np.uint8)
+_ENCODE[np.frombuffer(BASES, dtype=np.uint8)] = np.arange(len(BASES), dtype=np.uint8)
+_DECODE = np.frombuffer(BASES, dtype=np.uint8)
+_SHIFTS = np.array([6, 4, 2, 0], dtype=np.uint8)
+
+
+def encode_bases(sequence: bytes) -> np.ndarray:
+    """
+    Map the ASCII bases of a sequence to 2-bit codes.
+
+    Args:
+        sequence (bytes): ASCII sequence.
+
+    Returns:
+        np.ndarray: Uint8 code per base, 0-3 for A, C, G, T and `EXCEPTION_CODE` otherwise.
+    """
+    return _ENCODE[np.frombuffer(sequence, dtype=np.uint8)]
+
+
+class PackedSequences:
+    """
+    Compact in-memory store for a collection of nucleotide sequences.
+
+    Bases are packed four to a byte in one uint8 buffer, and sequence `i` spans bases
+    `offsets[i]:offsets[i + 1]` of the concatenation. Bases outside ACGT are stored as A
+    in the packed buffer and recorded in a sparse exception list (global position and
+    original ASCII byte), so the store round-trips any sequence exactly while costing
+    about 2 bits per base for clean data.
+    """
+
+    def __init__(
+        self,
+        packed: np.ndarray,
+        offsets: np.ndarray,
+        exception_positions: np.ndarray,
+        exception_bases: np.ndarray,
+    ):
+        """
+        Initialize the PackedSequences.
+
+        Args:
+            packed (np.ndarray): Uint8 buffer with four 2-bit codes per byte, first base in the high bits.
+            offsets (np.ndarray): Int64 base offsets of each sequence, of length `len(self) + 1`.
+            exception_positions (np.ndarray): Sorted int64 global positions of non-ACGT bases.
+            exception_bases (np.ndarray): Uint8 ASCII bytes of the non-ACGT bases.
+        """
+        self.packed = packed
+        self.offsets = offsets
+        self.exception_positions = exception_positions
+        self.exception_bases = exception_bases
+
+    @classmethod
+    def from_sequences(cls, sequences: Iterable[str]) -> "PackedSequences":
+        """
+        Pack a collection of sequences.
+
+        Args:
+            sequences (Iterable[str]): ASCII sequences.
+
+        Returns:
+            PackedSequences: The packed store.
+        """
+        builder = PackedSequenceBuilder()
+        builder.append(sequences)
+        return builder.build()
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            array.nbytes for array in (self.packed, self.offsets, self.exception_positions, self.exception_bases)
+        )
+
+    def _unpack(self, start: int, end: int) -> np.ndarray:
+        """Unpack the 2-bit codes of global base positions [start, end)."""
+        packed = self.packed[start // 4:(end + 3) // 4]
+        codes = ((packed[:, None] >> _SHIFTS) & 3).reshape(-1)
+        return codes[start % 4:start % 4 + end - start]
+
+    def _exceptions(self, start: int, end: int) -> tuple[np.ndarray, np.ndarray]:
+        """Positions (relative to `start`) and ASCII bytes of the exceptions in [start, end)."""
+        first, last = np.searchsorted(self.exception_positions, [start, end])
+        return self.exception_positions[first:last] - start, self.exception_bases[first:last]
+
+    def bases(self, i: int) -> np.ndarray:
+        """
+        Return sequence `i` as an array of ASCII bytes.
+
+        Args:
+            i (int): Sequence index.
+
+        Returns:
+            np.ndarray: Uint8 ASCII byte per base.
+        """
+        return self.bases_batch(i, i + 1)[0]
+
+    def bases_batch(self, start: int, stop: int) -> list[np.ndarray]:
+        """
+        Return sequences `start` to `stop` as arrays of ASCII bytes, unpacked in one pass.
+
+        Args:
+            start (int): First sequence index.
+            stop (int): Index after the last sequence.
+
+        Returns:
+            list[np.ndarray]: Uint8 ASCII byte per base of each sequence, as views of one buffer.
+        """
+        first, last = int(self.offsets[start]), int(self.offsets[stop])
+        bases = _DECODE[self._unpack(first, last)]
+        positions, exception_bases = self._exceptions(first, last)
+        bases[positions] = exception_bases
+        bounds = (self.offsets[start:stop + 1] - first).tolist()
+        return [bases[begin:end] for begin, end in zip(bounds[:-1], bounds[1:])]
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"Sequence index {i} out of range for {len(self)} sequences")
+        return self.bases(i).tobytes().decode("ascii")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def save(self, path: str) -> None:
+        """
+        Save the store as an uncompressed `.npz` archive.
+
+        Args:
+            path (str): Output path.
+        """
+        np.savez(
+            path,
+            packed=self.packed,
+            offsets=self.offsets,
+            exception_positions=self.exception_positions,
+            exception_bases=self.exception_bases,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "PackedSequences":
+        """
+        Load a store saved with `save`.
+
+        Args:
+            path (str): Path to the `.npz` archive.
+
+        Returns:
+            PackedSequences: The packed store.
+        """
+        with np.load(path) as archive:
+            return cls(
+                archive["packed"],
+                archive["offsets"],
+                archive["exception_positions"],
+                archive["exception_bases"],
+            )
+
+
+def iter_batches(sequences: Iterable[str] | PackedSequences, batch_size: int) -> Iterator[list[str] | list[np.ndarray]]:
+    """
+    Split sequences into batches for `Preprocessor.process_batch`.
+
+    A `PackedSequences` store is unpacked one batch at a time into ASCII byte arrays,
+    without decoding its sequences into `str`; other iterables are batched as they are.
+
+    Args:
+        sequences (Iterable[str] | PackedSequences): Sequences to batch.
+        batch_size (int): Sequences per batch.
+
+    Yields:
+        list[str] | list[np.ndarray]: A batch of sequences.
+    """
+    if isinstance(sequences, PackedSequences):
+        for start in range(0, len(sequences), batch_size):
+            yield sequences.bases_batch(start, min(start + batch_size, len(sequences)))
+        return
+    iterator = iter(sequences)
+    yield from iter(lambda: list(islice(iterator, batch_size)), [])
+
+
+class PackedSequenceBuilder:
+    """
+    Incrementally builds a `PackedSequences` from batches of sequences.
+
+    Only the packed form of earlier batches is kept, plus fewer than four codes that
+    did not fill a byte yet, so batches can be streamed in from the preparer.
+    """
+
+    def __init__(self):
+        self._packed_chunks: list[np.ndarray] = []
+        self._length_chunks: list[np.ndarray] = [np.zeros(1, dtype=np.int64)]
+        self._exception_position_chunks: list[np.ndarray] = []
+        self._exception_base_chunks: list[np.ndarray] = []
+        self._carry = np.zeros(0, dtype=np.uint8)
+        self._total_bases = 0
+
+    def append(self, sequences: Iterable[str]) -> None:
+        """
+        Append a batch of sequences.
+
+        Args:
+            sequences (Iterable[str]): ASCII sequences.
+        """
+        encoded = [sequence.encode("ascii") for sequence in sequences]
+        if not encoded:
+            return
+        raw = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        codes = _ENCODE[raw]
+
+        exceptions = np.flatnonzero(codes == EXCEPTION_CODE)
+        self._exception_position_chunks.append(exceptions + self._total_bases)
+        self._exception_base_chunks.append(raw[exceptions])
+        codes[exceptions] = 0
+
+        self._length_chunks.append(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)))
+        self._total_bases += len(codes)
+
+        # Pack whole bytes and carry the remaining < 4 codes over to the next batch
+        codes = np.concatenate([self._carry, codes])
+        whole = len(codes) - len(codes) % 4
+        self._packed_chunks.append(self._pack(codes[:whole]))
+        self._carry = codes[whole:]
+
+    @staticmethod
+    def _pack(codes: np.ndarray) -> np.ndarray:
+        return (codes.reshape(-1, 4) << _SHIFTS).sum(axis=1, dtype=np.uint8)
+
+    def build(self) -> PackedSequences:
+        """
+        Finish the store.
+
+        Returns:
+            PackedSequences: The packed store.
+        """
+        tail = np.zeros(-len(self._carry) % 4, dtype=np.uint8)
+        packed_chunks = self._packed_chunks + [self._pack(np.concatenate([self._carry, tail]))]
+        return PackedSequences(
+            np.concatenate(packed_chunks),
+            np.cumsum(np.concatenate(self._length_chunks)),
+            np.concatenate([np.zeros(0, dtype=np.int64)] + self._exception_position_chunks).astype(np.int64),
+            np.concatenate([np.zeros(0, dtype=np.uint8)] + self._exception_base_chunks),
+        )
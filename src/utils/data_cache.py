@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Optional
+
+MANIFEST_FILENAME = "manifest.json"
+DIGESTS_FILENAME = "digests.json"
+DIGEST_CHUNK_SIZE = 1 << 20
+
+
+def file_digest(path: str) -> str:
+    """
+    Compute the SHA-256 digest of a file's content, reading it in chunks.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        str: Hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DIGEST_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PreparedDataCache:
+    """
+    Content-addressed cache of prepared train/test splits.
+
+    An entry is keyed by the SHA-256 of the FASTA content plus every parameter that
+    affects the prepared output, and lives in `<cache_dir>/<key[:16]>/` next to a
+    `manifest.json` describing it. The manifest is written last, so an interrupted
+    preparation never produces a reusable entry.
+
+    FASTA digests are memoized in `<cache_dir>/digests.json` by path, size and mtime,
+    so an unchanged file is only hashed once.
+    """
+
+    def __init__(self, cache_dir: str):
+        """
+        Initialize the PreparedDataCache.
+
+        Args:
+            cache_dir (str): Directory holding the cache entries.
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def fasta_digest(self, fasta_path: str) -> str:
+        """
+        Return the content digest of a FASTA file, reusing the memoized value if the
+        file's size and mtime are unchanged.
+
+        Args:
+            fasta_path (str): Path to the FASTA file.
+
+        Returns:
+            str: Hex digest.
+        """
+        digests_path = os.path.join(self.cache_dir, DIGESTS_FILENAME)
+        digests = {}
+        if os.path.exists(digests_path):
+            with open(digests_path, "r") as f:
+                digests = json.load(f)
+
+        fasta_path = os.path.abspath(fasta_path)
+        stat = os.stat(fasta_path)
+        memoized = digests.get(fasta_path)
+        if memoized and memoized["size"] == stat.st_size and memoized["mtime_ns"] == stat.st_mtime_ns:
+            return memoized["sha256"]
+
+        digest = file_digest(fasta_path)
+        digests[fasta_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+        with open(digests_path, "w") as f:
+            json.dump(digests, f, indent=4)
+        return digest
+
+    def key(self, fasta_path: str, params: dict[str, Any]) -> str:
+        """
+        Compute the cache key of a preparation.
+
+        Args:
+            fasta_path (str): Path to the FASTA file.
+            params (dict[str, Any]): JSON-serializable parameters that affect the output.
+
+        Returns:
+            str: Hex key.
+        """
+        payload = json.dumps({"fasta_sha256": self.fasta_digest(fasta_path), **params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def entry_dir(self, key: str) -> str:
+        """Directory holding the files of the entry with the given key."""
+        return os.path.join(self.cache_dir, key[:16])
+
+    def lookup(self, key: str) -> Optional[dict[str, str]]:
+        """
+        Look up a complete cache entry.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            Optional[dict[str, str]]: Absolute paths of the entry's files by name, or None
+                if there is no complete entry for the key.
+        """
+        manifest_path = os.path.join(self.entry_dir(key), MANIFEST_FILENAME)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("key") != key:
+            return None
+
+        files = {name: os.path.join(self.entry_dir(key), filename) for name, filename in manifest["files"].items()}
+        if not all(os.path.exists(path) for path in files.values()):
+            return None
+        return files
+
+    def invalidate(self, key: str) -> None:
+        """Drop the manifest of an entry, so it is not reused while being rebuilt."""
+        manifest_path = os.path.join(self.entry_dir(key), MANIFEST_FILENAME)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
+    def store(self, key: str, fasta_path: str, params: dict[str, Any], files: dict[str, str]) -> None:
+        """
+        Record a completed preparation by writing its manifest.
+
+        Args:
+            key (str): Cache key.
+            fasta_path (str): Path to the FASTA file the entry was prepared from.
+            params (dict[str, Any]): Parameters used for the key.
+            files (dict[str, str]): Paths of the prepared files by name, inside `entry_dir(key)`.
+        """
+        manifest = {
+            "key": key,
+            "fasta_file": os.path.abspath(fasta_path),
+            "fasta_sha256": self.fasta_digest(fasta_path),
+            "params": params,
+            "files": {name: os.path.basename(path) for name, path in files.items()},
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        with open(os.path.join(self.entry_dir(key), MANIFEST_FILENAME), "w") as f:
+            json.dump(manifest, f, indent=4)
@@ -0,0 +1,267 @@
+import mmap
+import os
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+# Not samtools' `.fai`: the format differs, and a samtools index next to the FASTA must be left intact
+INDEX_SUFFIX = ".fidx"
+INDEX_COLUMNS = ["ID", "Length", "Offset", "LineBases", "LineWidth"]
+
+
+class FastaIndex:
+    """
+    Byte-offset index over an uncompressed FASTA file, in the spirit of samtools' `.fai`.
+
+    Each record is described by its ID, sequence length, the byte offset of its first
+    base, and its line layout (bases per line and bytes per line including the newline).
+    Records are fetched through a memory map of the FASTA file, so looking up a record
+    or a subsequence costs O(1) seeks instead of a linear parse.
+
+    The index is persisted as `<fasta_path>.fidx`, next to any samtools `.fai`, which is
+    never read or written. Its first line stores the size and mtime of the FASTA file
+    it was built from, and a stale index is rebuilt on open.
+    """
+
+    def __init__(self, fasta_path: str, index_df: pd.DataFrame, fingerprint: tuple[int, int]):
+        """
+        Initialize the FastaIndex.
+
+        Args:
+            fasta_path (str): Path to the indexed FASTA file.
+            index_df (pd.DataFrame): One row per record with the `INDEX_COLUMNS` columns.
+            fingerprint (tuple[int, int]): Size and mtime (ns) of the FASTA file when indexed.
+        """
+        self.fasta_path = fasta_path
+        self.fingerprint = fingerprint
+        self.ids = pd.Index(index_df["ID"].astype(str))
+        self.lengths = index_df["Length"].to_numpy(dtype=np.int64)
+        self.offsets = index_df["Offset"].to_numpy(dtype=np.int64)
+        self.line_bases = index_df["LineBases"].to_numpy(dtype=np.int64)
+        self.line_widths = index_df["LineWidth"].to_numpy(dtype=np.int64)
+        self._file = None
+        self._mmap = None
+
+    @property
+    def index_path(self) -> str:
+        return self.fasta_path + INDEX_SUFFIX
+
+    @staticmethod
+    def _fingerprint(fasta_path: str) -> tuple[int, int]:
+        stat = os.stat(fasta_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    @classmethod
+    def build(cls, fasta_path: str) -> "FastaIndex":
+        """
+        Build the index with a single pass over the FASTA file.
+
+        Records whose lines are not all the same width (except the last) get a line
+        layout of 0, and are fetched by scanning to the next header instead.
+
+        Args:
+            fasta_path (str): Path to the FASTA file.
+
+        Returns:
+            FastaIndex: The index, not yet persisted.
+        """
+        with open(fasta_path, "rb") as file:
+            if file.read(2) == b"\x1f\x8b":
+                raise ValueError(f"Cannot index compressed FASTA file {fasta_path}; byte offsets need plain text")
+
+        fingerprint = cls._fingerprint(fasta_path)
+        rows = []
+        position = 0
+        record = None
+        with open(fasta_path, "rb") as file:
+            for line in file:
+                line_width = len(line)
+                if line.startswith(b">"):
+                    if record is not None:
+                        rows.append(cls._finish_record(record))
+                    header = line[1:].split(None, 1)
+                    record = {
+                        "ID": header[0].decode("utf-8") if header else "",
+                        "Length": 0,
+                        "Offset": position + line_width,
+                        "LineBases": None,
+                        "LineWidth": None,
+                        "ShortLineSeen": False,
+                        "Regular": True,
+                    }
+                elif record is not None:
+                    line_bases = len(line.rstrip(b"\r\n"))
+                    if record["LineBases"] is None:
+                        record["LineBases"], record["LineWidth"] = line_bases, line_width
+                    elif (
+                        record["ShortLineSeen"]
+                        or line_bases > record["LineBases"]
+                        or (line_bases == record["LineBases"] and line_width != record["LineWidth"])
+                    ):
+                        record["Regular"] = False
+                    if line_bases < record["LineBases"]:
+                        record["ShortLineSeen"] = True
+                    record["Length"] += line_bases
+                position += line_width
+        if record is not None:
+            rows.append(cls._finish_record(record))
+
+        index_df = pd.DataFrame(rows, columns=INDEX_COLUMNS)
+        return cls(fasta_path, index_df, fingerprint)
+
+    @staticmethod
+    def _finish_record(record: dict) -> list:
+        # Only whole-record fetches are supported for records with an irregular line layout
+        regular = record["Regular"] and bool(record["LineBases"])
+        return [
+            record["ID"],
+            record["Length"],
+            record["Offset"],
+            record["LineBases"] if regular else 0,
+            record["LineWidth"] if regular else 0,
+        ]
+
+    def save(self) -> None:
+        """Persist the index next to the FASTA file."""
+        with open(self.index_path, "w") as f:
+            f.write(f"#{self.fingerprint[0]}\t{self.fingerprint[1]}\n")
+            pd.DataFrame({
+                "ID": self.ids,
+                "Length": self.lengths,
+                "Offset": self.offsets,
+                "LineBases": self.line_bases,
+                "LineWidth": self.line_widths,
+            }).to_csv(f, sep="\t", header=False, index=False)
+
+    @classmethod
+    def load(cls, fasta_path: str) -> Optional["FastaIndex"]:
+        """
+        Load a persisted index, if one exists and still matches the FASTA file.
+
+        Args:
+            fasta_path (str): Path to the FASTA file.
+
+        Returns:
+            Optional[FastaIndex]: The index, or None if it is missing or stale.
+        """
+        index_path = fasta_path + INDEX_SUFFIX
+        if not os.path.exists(index_path):
+            return None
+        with open(index_path, "r") as f:
+            header = f.readline()
+            if not header.startswith("#"):
+                return None
+            size, mtime_ns = (int(value) for value in header[1:].split("\t"))
+            if (size, mtime_ns) != cls._fingerprint(fasta_path):
+                return None
+            index_df = pd.read_csv(
+                f, sep="\t", header=None, names=INDEX_COLUMNS,
+                dtype={"ID": str}, keep_default_na=False,
+            )
+        return cls(fasta_path, index_df, (size, mtime_ns))
+
+    @classmethod
+    def open(cls, fasta_path: str) -> "FastaIndex":
+        """
+        Load the persisted index, building and persisting it if it is missing or stale.
+
+        Args:
+            fasta_path (str): Path to the FASTA file.
+
+        Returns:
+            FastaIndex: An up-to-date index.
+        """
+        index = cls.load(fasta_path)
+        if index is None:
+            index = cls.build(fasta_path)
+            try:
+                index.save()
+            except OSError:
+                # Read-only data directory: keep the in-memory index
+                pass
+        return index
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, record_id: str) -> bool:
+        return record_id in self.ids
+
+    def _buffer(self):
+        if self._mmap is None:
+            self._file = open(self.fasta_path, "rb")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def close(self) -> None:
+        """Release the memory map of the FASTA file."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+            self._file = None
+
+    def _byte_position(self, row: int, base: int) -> int:
+        line_bases = self.line_bases[row]
+        return self.offsets[row] + (base // line_bases) * self.line_widths[row] + base % line_bases
+
+    def fetch_row(self, row: int, start: int = 0, end: Optional[int] = None) -> str:
+        """
+        Fetch the sequence (or the [start, end) slice of it) of the record at a row.
+
+        Args:
+            row (int): Position of the record in the file.
+            start (int): First base to fetch.
+            end (Optional[int]): One past the last base to fetch; defaults to the record length.
+
+        Returns:
+            str: The requested bases.
+        """
+        length = int(self.lengths[row])
+        end = length if end is None else min(end, length)
+        start = max(0, start)
+        if start >= end:
+            return ""
+
+        buffer = self._buffer()
+        if self.line_bases[row] > 0:
+            raw = buffer[self._byte_position(row, start):self._byte_position(row, end - 1) + 1]
+            return raw.translate(None, b"\r\n").decode("ascii")
+
+        record_end = buffer.find(b"\n>", self.offsets[row])
+        record_end = len(buffer) if record_end == -1 else record_end
+        sequence = buffer[self.offsets[row]:record_end].translate(None, b"\r\n").decode("ascii")
+        return sequence[start:end]
+
+    def fetch(self, record_id: str, start: int = 0, end: Optional[int] = None) -> str:
+        """
+        Fetch the sequence (or the [start, end) slice of it) of a record by ID.
+
+        Args:
+            record_id (str): ID of the record.
+            start (int): First base to fetch.
+            end (Optional[int]): One past the last base to fetch; defaults to the record length.
+
+        Returns:
+            str: The requested bases.
+        """
+        row = self.ids.get_loc(record_id)
+        if not isinstance(row, (int, np.integer)):
+            raise KeyError(f"Record ID '{record_id}' is not unique in {self.fasta_path}")
+        return self.fetch_row(row, start, end)
+
+    def iter_rows(self, start: int = 0, stop: Optional[int] = None) -> Iterator[tuple[str, str]]:
+        """
+        Iterate over (ID, Sequence) pairs for a contiguous range of records.
+
+        Args:
+            start (int): First record position.
+            stop (Optional[int]): One past the last record position; defaults to the end.
+
+        Yields:
+            tuple[str, str]: The record ID and its sequence.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        for row in range(start, stop):
+            yield self.ids[row], self.fetch_row(row)
@@ -16,6 +16,11 @@ pretraining_dataset = "data/pretraining_data.csv"
 finetuning_dataset = "data/finetuning_data.csv"
 test_size = 0.2
 random_seed = 42
+batch_size = 10000
+prepared_format = "csv"
+split_mode = "random"
+deduplicate = False
+pack_sequences = False
 
 # Output directory for scenarios
 output_dir = "scenarios"
@@ -36,9 +41,17 @@ base_pretraining_config = {
     "prepared_data_dir": prepared_data_dir,
     "dataset": pretraining_dataset,
     "force_reprocess": False,
+    "batch_size": batch_size,
+    "prepared_format": prepared_format,
+    "split_mode": split_mode,
+    "deduplicate": deduplicate,
+    "pack_sequences": pack_sequences,
     "test_size": test_size,
     "random_seed": random_seed,
+    "vocab_format": "binary",
+    "augmentation_epochs": 0,
     "vocab_options": {
+        "implicit": False,
         "min_frequency": 2,
         "max_tokens": 5000
     },
@@ -60,6 +73,11 @@ base_finetuning_config = {
     "prepared_data_dir": prepared_data_dir,
     "dataset": finetuning_dataset,
     "force_reprocess": False,
+    "batch_size": batch_size,
+    "prepared_format": prepared_format,
+    "split_mode": split_mode,
+    "deduplicate": deduplicate,
+    "pack_sequences": pack_sequences,
     "test_size": test_size,
     "random_seed": random_seed,
     "preprocessor_options": {
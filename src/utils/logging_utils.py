@@ -54,6 +54,9 @@ def with_logging(level: int) -> Callable[..., Any]:
     def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
         def wrapper(*args: Any, **kwargs: Any) -> Any:
             logger = logging.getLogger("system_logger")
+            if not logger.isEnabledFor(level):
+                # Skip binding and formatting the arguments, which dominates hot-path calls
+                return func(*args, **kwargs)
 
             # Identify the module and function name
             module_name = func.__module__.upper()
@@ -1,41 +1,272 @@
-def parse_fasta_custom(fasta_path):
+import gzip
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional
+
+from utils.fasta_index import FastaIndex
+
+GZIP_MAGIC = b"\x1f\x8b"
+BGZF_MAX_IN_FLIGHT_PER_WORKER = 4
+
+
+def detect_compression(fasta_path: str) -> str:
+    """
+    Detect whether a FASTA file is plain text, gzip, or BGZF (blocked gzip, as written by `bgzip`).
+
+    Args:
+        fasta_path (str): Path to the FASTA file.
+
+    Returns:
+        str: One of "none", "gzip" or "bgzf".
+    """
+    with open(fasta_path, "rb") as file:
+        header = file.read(16)
+    if not header.startswith(GZIP_MAGIC):
+        return "none"
+    # BGZF blocks set FEXTRA and carry a 'BC' subfield holding the block size
+    has_extra = len(header) >= 16 and header[3] & 4
+    if has_extra and header[12:14] == b"BC" and struct.unpack("<H", header[14:16])[0] == 2:
+        return "bgzf"
+    return "gzip"
+
+
+def _iter_bgzf_blocks(file) -> Iterator[bytes]:
+    """Yield the raw deflate payload of each BGZF block in a file."""
+    while True:
+        header = file.read(12)
+        if not header:
+            return
+        if len(header) < 12 or not header.startswith(GZIP_MAGIC):
+            raise ValueError("Corrupt BGZF block header")
+        extra_length = struct.unpack("<H", header[10:12])[0]
+        extra = file.read(extra_length)
+
+        block_size = None
+        position = 0
+        while position + 4 <= len(extra):
+            subfield_length = struct.unpack("<H", extra[position + 2:position + 4])[0]
+            if extra[position:position + 2] == b"BC":
+                block_size = struct.unpack("<H", extra[position + 4:position + 6])[0] + 1
+            position += 4 + subfield_length
+        if block_size is None:
+            raise ValueError("BGZF block without a 'BC' block size subfield")
+
+        # Remaining block: compressed payload followed by CRC32 and ISIZE
+        remainder = file.read(block_size - 12 - extra_length)
+        yield remainder[:-8]
+
+
+def _inflate_block(payload: bytes) -> bytes:
+    return zlib.decompress(payload, -zlib.MAX_WBITS)
+
+
+def iter_bgzf_chunks(fasta_path: str, workers: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Decompress a BGZF file block by block on a pool of worker threads.
+
+    BGZF blocks are independent deflate streams, so they can be inflated in parallel;
+    zlib releases the GIL while inflating, which lets threads use all cores. Only a
+    bounded number of blocks is in flight at a time and chunks are yielded in file order.
+
+    Args:
+        fasta_path (str): Path to the BGZF file.
+        workers (Optional[int]): Number of worker threads; defaults to the CPU count.
+
+    Yields:
+        bytes: Decompressed data of each block.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * BGZF_MAX_IN_FLIGHT_PER_WORKER
+    with open(fasta_path, "rb") as file, ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for payload in _iter_bgzf_blocks(file):
+            pending.append(pool.submit(_inflate_block, payload))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _iter_chunk_lines(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Re-split a stream of byte chunks into lines."""
+    remainder = b""
+    for chunk in chunks:
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        yield from lines
+    if remainder:
+        yield remainder
+
+
+def iter_fasta_lines(fasta_path: str, workers: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Stream the lines of a plain, gzip or BGZF compressed FASTA file as bytes.
+
+    Args:
+        fasta_path (str): Path to the FASTA file.
+        workers (Optional[int]): Number of threads used to decompress BGZF input.
+
+    Yields:
+        bytes: Each line of the decompressed file.
+    """
+    compression = detect_compression(fasta_path)
+    if compression == "bgzf":
+        yield from _iter_chunk_lines(iter_bgzf_chunks(fasta_path, workers))
+    elif compression == "gzip":
+        with gzip.open(fasta_path, "rb") as file:
+            yield from file
+    else:
+        with open(fasta_path, "rb") as file:
+            yield from file
+
+
+def iter_fasta_records(fasta_path: str, workers: Optional[int] = None) -> Iterator[tuple[str, str]]:
+    """
+    Stream (ID, Sequence) pairs from a FASTA file without building per-record objects.
+
+    The file is read in binary mode and only the current record is kept in memory.
+    The ID is the first whitespace-delimited word of the header, as in `Bio.SeqIO`.
+    Gzip and BGZF compressed files are decompressed on the fly.
+
+    Args:
+        fasta_path (str): Path to the FASTA file.
+        workers (Optional[int]): Number of threads used to decompress BGZF input.
+
+    Yields:
+        tuple[str, str]: The record ID and its sequence.
+    """
+    current_id = None
+    current_sequence = []
+    for line in iter_fasta_lines(fasta_path, workers):
+        if line.startswith(b">"):
+            # Emit the previous record
+            if current_id is not None:
+                yield current_id, b"".join(current_sequence).decode("ascii")
+            header = line[1:].split(None, 1)
+            current_id = header[0].decode("utf-8") if header else ""
+            current_sequence = []
+        elif current_id is not None:
+            current_sequence.append(line.strip())
+    # Emit the last record
+    if current_id is not None:
+        yield current_id, b"".join(current_sequence).decode("ascii")
+
+
+def iter_fasta_batches(
+    fasta_path: str, batch_size: int, workers: Optional[int] = None
+) -> Iterator[tuple[list[str], list[str]]]:
+    """
+    Stream a FASTA file as fixed-size batches of IDs and sequences.
+
+    Args:
+        fasta_path (str): Path to the FASTA file.
+        batch_size (int): Maximum number of records per batch.
+        workers (Optional[int]): Number of threads used to decompress BGZF input.
+
+    Yields:
+        tuple[list[str], list[str]]: IDs and sequences of at most `batch_size` records.
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be positive, got {batch_size}")
+
+    ids, sequences = [], []
+    for record_id, sequence in iter_fasta_records(fasta_path, workers):
+        ids.append(record_id)
+        sequences.append(sequence)
+        if len(ids) == batch_size:
+            yield ids, sequences
+            ids, sequences = [], []
+    if ids:
+        yield ids, sequences
+
+
+def iter_fasta_id_batches(
+    fasta_path: str, batch_size: int, workers: Optional[int] = None
+) -> Iterator[list[str]]:
+    """
+    Stream only the record IDs of a FASTA file, in batches, skipping sequence lines.
+
+    Args:
+        fasta_path (str): Path to the FASTA file.
+        batch_size (int): Maximum number of IDs per batch.
+        workers (Optional[int]): Number of threads used to decompress BGZF input.
+
+    Yields:
+        list[str]: IDs of at most `batch_size` records.
+    """
+    ids = []
+    for line in iter_fasta_lines(fasta_path, workers):
+        if line.startswith(b">"):
+            header = line[1:].split(None, 1)
+            ids.append(header[0].decode("utf-8") if header else "")
+            if len(ids) == batch_size:
+                yield ids
+                ids = []
+    if ids:
+        yield ids
+
+
+def count_fasta_records(fasta_path: str, workers: Optional[int] = None) -> int:
+    """
+    Count the records in a FASTA file by scanning for header lines.
+
+    Args:
+        fasta_path (str): Path to the FASTA file.
+        workers (Optional[int]): Number of threads used to decompress BGZF input.
+
+    Returns:
+        int: Number of records.
+    """
+    return sum(1 for line in iter_fasta_lines(fasta_path, workers) if line.startswith(b">"))
+
+
+def parse_fasta_custom(fasta_path, record_ids: Optional[list[str]] = None):
     """
     Custom parser for FASTA files.
 
     Args:
         fasta_path (str): Path to the FASTA file.
+        record_ids (Optional[list[str]]): Only return these records, fetched through the
+            FASTA index instead of parsing the whole file. Compressed files are scanned.
 
     Returns:
         list[dict]: A list of dictionaries with 'ID' and 'Sequence'.
     """
-    sequences = []
-    with open(fasta_path, "r") as file:
-        current_id = None
-        current_sequence = []
-        for line in file:
-            line = line.strip()
-            if line.startswith(">"):
-                # Save the previous sequence
-                if current_id:
-                    sequences.append({"ID": current_id, "Sequence": "".join(current_sequence)})
-                # Start a new sequence
-                current_id = line[1:].split()[0]  # Capture only the first part of the ID
-                current_sequence = []
-            else:
-                current_sequence.append(line)
-        # Add the last sequence
-        if current_id:
-            sequences.append({"ID": current_id, "Sequence": "".join(current_sequence)})
-    return sequences
-
-# Example usage
-fasta_file = "/Users/filipberntsson/Documents/Studies/Thesis/Programming/BarcodeClassifier/data/raw/raw.fasta"
-sequences = parse_fasta_custom(fasta_file)
-
-# Print in a neat format
-cnt = 0
-for seq in sequences:
-    cnt +=1
-    print(f"ID: {seq['ID']}, Sequence: {seq['Sequence']}")
-    if cnt>9:
-        break 
+    if record_ids is not None and detect_compression(fasta_path) != "none":
+        # Compressed files cannot be memory-mapped; filter while streaming instead
+        wanted = set(record_ids)
+        found = {
+            record_id: sequence
+            for record_id, sequence in iter_fasta_records(fasta_path)
+            if record_id in wanted
+        }
+        return [{"ID": record_id, "Sequence": found[record_id]} for record_id in record_ids]
+
+    if record_ids is not None:
+        index = FastaIndex.open(fasta_path)
+        try:
+            return [{"ID": record_id, "Sequence": index.fetch(record_id)} for record_id in record_ids]
+        finally:
+            index.close()
+
+    return [
+        {"ID": record_id, "Sequence": sequence}
+        for record_id, sequence in iter_fasta_records(fasta_path)
+    ]
+
+
+if __name__ == "__main__":
+    # Example usage
+    fasta_file = "/Users/filipberntsson/Documents/Studies/Thesis/Programming/BarcodeClassifier/data/raw/raw.fasta"
+    sequences = parse_fasta_custom(fasta_file)
+
+    # Print in a neat format
+    cnt = 0
+    for seq in sequences:
+        cnt +=1
+        print(f"ID: {seq['ID']}, Sequence: {seq['Sequence']}")
+        if cnt>9:
+            break
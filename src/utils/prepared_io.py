@@ -0,0 +1,173 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import pandas as pd
+
+
+def _import_pyarrow():
+    """Import pyarrow, which is only needed for the columnar formats."""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "Parquet and Arrow prepared data require pyarrow; install it with `pip install pyarrow`."
+        ) from e
+    return pyarrow
+
+
+class CsvWriter:
+    """Writes prepared data as CSV, one appended block per batch."""
+    extension = ".csv"
+
+    def __init__(self, path: str, template: pd.DataFrame):
+        """
+        Args:
+            path (str): Output file path.
+            template (pd.DataFrame): Empty DataFrame with the output columns and dtypes.
+        """
+        self.path = path
+        template.to_csv(self.path, index=False)
+
+    def write(self, df: pd.DataFrame) -> None:
+        df.to_csv(self.path, index=False, mode="a", header=False)
+
+    def close(self) -> None:
+        pass
+
+
+class _ArrowTableWriter(ABC):
+    """
+    Base for pyarrow-backed writers.
+
+    Categorical columns are written dictionary encoded. Their categories are accumulated
+    across batches, so each batch's dictionary extends the previous one and the codes
+    of a label stay the same for the whole file.
+    """
+    extension = ""
+
+    def __init__(self, path: str, template: pd.DataFrame):
+        """
+        Args:
+            path (str): Output file path.
+            template (pd.DataFrame): Empty DataFrame with the output columns and dtypes.
+        """
+        self.path = path
+        self.template = template
+        self._pa = _import_pyarrow()
+        self._categories: dict[str, pd.Index] = {}
+        self._schema = None
+        self._writer = None
+
+    def _harmonize(self, df: pd.DataFrame) -> pd.DataFrame:
+        df = df.copy()
+        for column in df.columns:
+            if isinstance(df[column].dtype, pd.CategoricalDtype):
+                known = self._categories.get(column, pd.Index([], dtype=object))
+                new = df[column].cat.categories.difference(known, sort=False)
+                self._categories[column] = known.append(new)
+                df[column] = df[column].cat.set_categories(self._categories[column])
+        return df
+
+    def _make_schema(self, df: pd.DataFrame):
+        pa = self._pa
+        fields = []
+        for field in pa.Schema.from_pandas(df, preserve_index=False):
+            if isinstance(df[field.name].dtype, pd.CategoricalDtype):
+                field = pa.field(field.name, pa.dictionary(pa.int32(), pa.string()))
+            elif df[field.name].dtype == object:
+                field = pa.field(field.name, pa.string())
+            fields.append(field)
+        return pa.schema(fields)
+
+    @abstractmethod
+    def _open(self, schema):
+        """Open the pyarrow writer of the file for the given schema."""
+        pass
+
+    def write(self, df: pd.DataFrame) -> None:
+        df = self._harmonize(df[self.template.columns])
+        if self._writer is None:
+            self._schema = self._make_schema(df)
+            self._writer = self._open(self._schema)
+        table = self._pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is None:
+            # Nothing was written: still produce a valid, empty file
+            self.write(self.template)
+        self._writer.close()
+
+
+class ParquetWriter(_ArrowTableWriter):
+    """Writes prepared data as Parquet, one row group per batch."""
+    extension = ".parquet"
+
+    def _open(self, schema):
+        return self._pa.parquet.ParquetWriter(self.path, schema)
+
+
+class ArrowWriter(_ArrowTableWriter):
+    """Writes prepared data as an Arrow IPC file, which can be memory-mapped when read."""
+    extension = ".arrow"
+
+    def _open(self, schema):
+        options = self._pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        return self._pa.ipc.new_file(self.path, schema, options=options)
+
+
+PREPARED_WRITERS = {
+    "csv": CsvWriter,
+    "parquet": ParquetWriter,
+    "arrow": ArrowWriter,
+}
+
+
+def get_prepared_writer(output_format: str):
+    """
+    Look up the writer class for a prepared data format.
+
+    Args:
+        output_format (str): One of the keys of `PREPARED_WRITERS`.
+
+    Returns:
+        type: The writer class.
+    """
+    try:
+        return PREPARED_WRITERS[output_format.lower()]
+    except KeyError:
+        raise ValueError(
+            f"Unsupported prepared data format: '{output_format}'. "
+            f"Available formats: {list(PREPARED_WRITERS.keys())}"
+        )
+
+
+def read_prepared(path: str, columns: Optional[list[str]] = None) -> pd.DataFrame:
+    """
+    Read prepared data written by any of the `PREPARED_WRITERS`, projecting only `columns`.
+
+    Parquet and Arrow files are memory-mapped and only the requested columns are decoded;
+    dictionary-encoded taxonomy columns come back as categoricals.
+
+    Args:
+        path (str): Path to a `.csv`, `.parquet` or `.arrow` file.
+        columns (Optional[list[str]]): Columns to load; defaults to all columns.
+
+    Returns:
+        pd.DataFrame: The prepared data.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ParquetWriter.extension:
+        _import_pyarrow()
+        return pd.read_parquet(path, columns=columns, memory_map=True)
+    if extension == ArrowWriter.extension:
+        pa = _import_pyarrow()
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+            if columns is not None:
+                table = table.select(columns)
+            return table.to_pandas()
+    return pd.read_csv(path, usecols=columns)
@@ -0,0 +1,34 @@
+import hashlib
+from typing import Union
+
+import numpy as np
+
+KEY_WORD_MASK = (1 << 64) - 1
+
+
+def _key_word(value: Union[int, str]) -> int:
+    """Map a seed or sequence ID to a 64-bit word; strings are hashed, so record IDs can be used."""
+    if isinstance(value, str):
+        return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+    return int(value) & KEY_WORD_MASK
+
+
+def sequence_rng(seed: Union[int, str], sequence_id: Union[int, str], epoch: int = 0) -> np.random.Generator:
+    """
+    Create the random generator of one sequence in one epoch.
+
+    The generator is counter-based (Philox): its key is (seed, sequence ID) and its
+    counter starts at the epoch in the highest word, so every (seed, sequence, epoch)
+    gets its own stream without any shared state. Draws for a sequence are therefore
+    the same whether it is processed alone, in any chunk, or on any worker or machine.
+
+    Args:
+        seed (Union[int, str]): Seed of the run.
+        sequence_id (Union[int, str]): Stable ID of the sequence, e.g. its index in the split or its record ID.
+        epoch (int): Epoch the sequence is processed for.
+
+    Returns:
+        np.random.Generator: Generator for this sequence and epoch.
+    """
+    bit_generator = np.random.Philox(key=[_key_word(seed), _key_word(sequence_id)], counter=[0, 0, 0, epoch])
+    return np.random.Generator(bit_generator)
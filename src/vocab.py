@@ -1,8 +1,20 @@
 # vocab.py
+import bisect
+import heapq
 import json
-from typing import Dict, List
+import mmap
+import os
+import struct
+from array import array
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
 from abc import ABC, abstractmethod
-from itertools import product
+from itertools import islice, product
+
+import numpy as np
+
+from ragged import RaggedArray
 from utils.logging_utils import with_logging
 
 class VocabConstructor(ABC):
@@ -46,6 +58,24 @@ class Vocabulary:
     
     def get_token(self, idx: int) -> str:
         return self.id_to_token.get(idx, self.unk_token)  # Default to UNK token
+
+    def __len__(self) -> int:
+        return len(self.token_to_id)
+
+    def token_arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return the tokens as arrays, for vectorized lookups without a Python string per token.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: Uint8 UTF-8 bytes of all tokens
+            concatenated, the int64 offsets delimiting each token in them, and the int32
+            ID of each token.
+        """
+        encoded = [token.encode("utf-8") for token in self.token_to_id]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(token) for token in encoded], out=offsets[1:])
+        ids = np.fromiter(self.token_to_id.values(), dtype=np.int32, count=len(encoded))
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets, ids
     
     @with_logging(level=9)
     def map_sentence(self, processed_sentence: List[List[str]]) -> List[List[int]]:
@@ -62,6 +92,23 @@ class Vocabulary:
             [self.get_id(token) for token in token_list]
             for token_list in processed_sentence
         ]
+
+    def map_sentences(self, processed_sentences: Iterable[List[List[str]]]) -> RaggedArray:
+        """
+        Maps processed sentences from tokens to IDs, straight into a ragged array.
+
+        Args:
+            processed_sentences (Iterable[List[List[str]]]): Preprocessed sentences as lists of token lists.
+
+        Returns:
+            RaggedArray: Int32 IDs, one row per sentence.
+        """
+        return RaggedArray.from_arrays(
+            np.fromiter(
+                (self.get_id(token) for token_list in sentence for token in token_list), dtype=np.int32
+            )
+            for sentence in processed_sentences
+        )
     
     
     def save(self, filepath: str):
@@ -126,3 +173,654 @@ class KmerVocabConstructor(VocabConstructor):
         # Add all k-mers to the Vocabulary
         for kmer in sorted(all_kmers):
             vocab.add_token(kmer)
+
+def _count_kmer_chunk(sequences: List[str], k: int, alphabet: List[str], stride: int) -> tuple:
+    """
+    Count the k-mers of a chunk of sequences, as `KmerStrategy` would tokenize them.
+
+    The chunk is concatenated, the start of every complete k-mer on the stride is
+    computed per sequence, and the k-mer values are computed for all of them at once;
+    k-mers containing a base outside the alphabet are dropped. Incomplete tail k-mers
+    are not counted, since the tokenizer completes them with random padding.
+
+    Returns:
+        tuple: Sorted k-mer values seen in the chunk and their counts.
+    """
+    # Imported here: the preprocessing package imports this module
+    from preprocessing.tokenization import KmerStrategy, window_values
+
+    base = len(set(alphabet))
+    encoded = [sequence.encode("ascii", errors="replace") for sequence in sequences]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    codes = KmerStrategy._build_code_table(alphabet)[np.frombuffer(b"".join(encoded), dtype=np.uint8)]
+    if len(codes) < k:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # Start of every complete k-mer on the stride, per sequence
+    kmers_per_sequence = np.where(lengths >= k, (lengths - k) // stride + 1, 0)
+    first_kmer = np.cumsum(kmers_per_sequence) - kmers_per_sequence
+    kmer_in_sequence = np.arange(kmers_per_sequence.sum()) - np.repeat(first_kmer, kmers_per_sequence)
+    starts = np.repeat(np.cumsum(lengths) - lengths, kmers_per_sequence) + kmer_in_sequence * stride
+
+    if stride < k:
+        # Overlapping k-mers share work through the values of all windows
+        values = window_values(codes, k, base)[starts]
+    else:
+        values = np.zeros(len(starts), dtype=np.int64)
+        for offset in range(k):
+            values = values * base + codes[starts + offset]
+
+    unknown_before = np.concatenate([[0], np.cumsum(codes < 0)])
+    values = values[unknown_before[starts + k] == unknown_before[starts]]
+
+    # A dense bincount is cheapest unless the k-mer space dwarfs the chunk
+    if base ** k <= 8 * len(values):
+        counts = np.bincount(values, minlength=base ** k)
+        seen = np.flatnonzero(counts)
+        return seen, counts[seen]
+    return np.unique(values, return_counts=True)
+
+
+class FrequencyKmerVocabConstructor(VocabConstructor):
+    """
+    Vocabulary constructor that keeps the k-mers frequent in the training data.
+
+    K-mers are counted over the sequences in chunks on a process pool (a NumPy bincount
+    of integer k-mer values per chunk), and the partial counts are merged at the end.
+    K-mers seen fewer than `min_frequency` times are dropped, the `max_tokens` most
+    frequent are kept, and they are added in lexicographic order after PAD and UNK.
+    """
+    def __init__(
+        self,
+        k: int,
+        alphabet: List[str],
+        min_frequency: int = 1,
+        max_tokens: Optional[int] = None,
+        stride: Optional[int] = None,
+        workers: Optional[int] = None,
+        chunk_size: int = 2000,
+    ):
+        """
+        Initialize the frequency-based k-mer constructor.
+
+        Args:
+            k (int): Length of each k-mer.
+            alphabet (List[str]): Single characters the k-mers are made of.
+            min_frequency (int): Minimum number of occurrences of a kept k-mer.
+            max_tokens (Optional[int]): Maximum vocabulary size, including PAD and UNK.
+            stride (Optional[int]): Tokenizer stride the k-mers are counted with; defaults to k.
+            workers (Optional[int]): Number of counting processes; defaults to the CPU count,
+                and 1 counts in this process.
+            chunk_size (int): Number of sequences per counting task.
+        """
+        self.k = k
+        self.alphabet = alphabet
+        self.min_frequency = min_frequency
+        self.max_tokens = max_tokens
+        self.stride = stride
+        self.workers = workers
+        self.chunk_size = chunk_size
+
+    def count_kmers(self, data: Iterable[str]) -> np.ndarray:
+        """
+        Count the k-mers of the sequences.
+
+        Args:
+            data (Iterable[str]): Raw sequences.
+
+        Returns:
+            np.ndarray: Int64 count of each k-mer, indexed by its base-|alphabet| value.
+        """
+        base = len(set(self.alphabet))
+        stride = self.k if self.stride is None else self.stride
+        counts = np.zeros(base ** self.k, dtype=np.int64)
+        sequences = iter(data)
+        chunks = iter(lambda: list(islice(sequences, self.chunk_size)), [])
+
+        workers = self.workers or os.cpu_count() or 1
+        if workers == 1:
+            for chunk in chunks:
+                seen, chunk_counts = _count_kmer_chunk(chunk, self.k, self.alphabet, stride)
+                counts[seen] += chunk_counts
+            return counts
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Keep a bounded number of chunks in flight, so the data is streamed
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(executor.submit(_count_kmer_chunk, chunk, self.k, self.alphabet, stride))
+                if len(in_flight) >= 2 * workers:
+                    seen, chunk_counts = in_flight.popleft().result()
+                    counts[seen] += chunk_counts
+            while in_flight:
+                seen, chunk_counts = in_flight.popleft().result()
+                counts[seen] += chunk_counts
+        return counts
+
+    def build_vocab(self, data: Iterable[str], vocab: 'Vocabulary') -> None:
+        """
+        Build the vocabulary from the k-mer counts of the data.
+
+        Args:
+            data (Iterable[str]): Raw sequences, e.g. the training split.
+            vocab (Vocabulary): Vocabulary instance to populate.
+        """
+        counts = self.count_kmers(data)
+        candidates = np.flatnonzero(counts >= max(self.min_frequency, 1))
+        if self.max_tokens is not None:
+            # Most frequent first, ties broken lexicographically
+            order = np.lexsort((candidates, -counts[candidates]))
+            candidates = np.sort(candidates[order[:max(self.max_tokens - len(vocab), 0)]])
+
+        alphabet = np.array(sorted(set(self.alphabet)))
+        place_values = len(alphabet) ** np.arange(self.k - 1, -1, -1, dtype=np.int64)
+        digits = (candidates[:, None] // place_values) % len(alphabet)
+        for bases in alphabet[digits].tolist():
+            vocab.add_token("".join(bases))
+
+class KmerVocabulary(Vocabulary):
+    """
+    Implicit vocabulary of every k-mer over an alphabet.
+
+    Holds the same token-ID mapping `KmerVocabConstructor` builds (PAD, UNK, then all
+    k-mers in lexicographic order) without materializing it: a k-mer's ID is 2 + its
+    value as a base-|alphabet| number, so `get_id` and `get_token` are computed
+    arithmetically in O(k) time and the vocabulary takes O(1) memory for any k.
+    It is saved as a small JSON descriptor instead of the full table.
+    """
+    def __init__(self, k: int, alphabet: List[str]):
+        """
+        Initialize the implicit k-mer vocabulary.
+
+        Args:
+            k (int): Length of each k-mer.
+            alphabet (List[str]): Single characters the k-mers are made of.
+        """
+        self.token_to_id: Dict[str, int] = {}
+        self.id_to_token: Dict[int, str] = {}
+        self.pad_token = 'PAD'
+        self.unk_token = 'UNK'
+        self.pad_id = 0
+        self.unk_id = 1
+        self._set_kmer_space(k, alphabet)
+
+    def _set_kmer_space(self, k: int, alphabet: List[str]) -> None:
+        if not all(len(base) == 1 for base in alphabet):
+            raise ValueError(f"Implicit k-mer vocabularies need single-character alphabets, got {alphabet}")
+        self.k = k
+        self.alphabet = sorted(set(alphabet))
+        if len(self.alphabet) > 36:
+            raise ValueError(f"Implicit k-mer vocabularies support at most 36 characters, got {len(self.alphabet)}")
+        self.first_kmer_id = 2
+        # Rewrites a k-mer as the digits of its base-|alphabet| value, for int(..., base)
+        digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+        self._to_digits = str.maketrans({base: digits[rank] for rank, base in enumerate(self.alphabet)})
+        self._valid = set(self.alphabet)
+
+    def __len__(self) -> int:
+        return self.first_kmer_id + len(self.alphabet) ** self.k
+
+    def add_token(self, token: str):
+        raise TypeError("KmerVocabulary is implicit and holds exactly the k-mers of its alphabet")
+
+    def get_id(self, token: str) -> int:
+        if len(token) != self.k or not self._valid.issuperset(token):
+            if token == self.pad_token:
+                return self.pad_id
+            return self.unk_id  # Default to UNK ID
+        return self.first_kmer_id + int(token.translate(self._to_digits), len(self.alphabet))
+
+    def get_token(self, idx: int) -> str:
+        if idx == self.pad_id:
+            return self.pad_token
+        value = idx - self.first_kmer_id
+        if not 0 <= value < len(self.alphabet) ** self.k:
+            return self.unk_token  # Default to UNK token
+        bases = []
+        for _ in range(self.k):
+            value, rank = divmod(value, len(self.alphabet))
+            bases.append(self.alphabet[rank])
+        return "".join(reversed(bases))
+
+    def save(self, filepath: str):
+        """
+        Save the vocabulary descriptor to a JSON file.
+
+        Args:
+            filepath (str): Path to the JSON file.
+        """
+        with open(filepath, 'w') as f:
+            json.dump({
+                "type": "kmer",
+                "k": self.k,
+                "alphabet": self.alphabet,
+                "pad_token": self.pad_token,
+                "unk_token": self.unk_token,
+            }, f, indent=4)
+
+    def load(self, filepath: str):
+        """
+        Load the vocabulary from a JSON descriptor written by `save`.
+
+        Args:
+            filepath (str): Path to the JSON file.
+        """
+        with open(filepath, 'r') as f:
+            descriptor = json.load(f)
+        if descriptor.get("type") != "kmer":
+            raise ValueError(f"{filepath} is not an implicit k-mer vocabulary; load it with Vocabulary")
+        self.pad_token = descriptor["pad_token"]
+        self.unk_token = descriptor["unk_token"]
+        self._set_kmer_space(descriptor["k"], descriptor["alphabet"])
+
+class BpeVocabulary(Vocabulary):
+    """
+    Vocabulary of byte-pair-encoding tokens: PAD, UNK, the alphabet, then one token per
+    learned merge. The merges are kept in the order they were learned, which is the
+    order `BpeStrategy` applies them in.
+    """
+    def __init__(self):
+        super().__init__()
+        self.merges: List[tuple[str, str]] = []
+
+    def save(self, filepath: str):
+        """
+        Save the tokens and merges to a JSON file.
+
+        Args:
+            filepath (str): Path to the JSON file.
+        """
+        with open(filepath, 'w') as f:
+            json.dump({
+                "type": "bpe",
+                "token_to_id": self.token_to_id,
+                "merges": [list(merge) for merge in self.merges],
+            }, f, indent=4)
+
+    def load(self, filepath: str):
+        """
+        Load the tokens and merges from a JSON file written by `save`.
+
+        Args:
+            filepath (str): Path to the JSON file.
+        """
+        with open(filepath, 'r') as f:
+            saved = json.load(f)
+        if saved.get("type") != "bpe":
+            raise ValueError(f"{filepath} is not a BPE vocabulary; load it with Vocabulary")
+        self.token_to_id = saved["token_to_id"]
+        self.id_to_token = {int(idx): token for token, idx in self.token_to_id.items()}
+        self.merges = [tuple(merge) for merge in saved["merges"]]
+
+
+class BpeVocabConstructor(VocabConstructor):
+    """
+    Vocabulary constructor that learns byte-pair-encoding merges from the data.
+
+    Identical sequences are collapsed into one weighted sequence, and the corpus is held
+    as a linked list of symbols over NumPy arrays. Pair counts live in a dict with a
+    max-heap on top (stale heap entries are skipped when popped), and every pair keeps
+    the positions it occurs at. A merge only visits the occurrences of its pair and
+    adjusts the counts of the pairs around them, so training never recounts the corpus.
+    """
+    def __init__(self, alphabet: List[str], max_tokens: int = 4096, min_frequency: int = 2):
+        """
+        Initialize the BPE constructor.
+
+        Args:
+            alphabet (List[str]): Single characters of the sequences; others become UNK.
+            max_tokens (int): Vocabulary size to learn merges up to, including PAD and UNK.
+            min_frequency (int): Stop when the most frequent pair occurs fewer times.
+        """
+        self.alphabet = alphabet
+        self.max_tokens = max_tokens
+        self.min_frequency = min_frequency
+
+    def build_vocab(self, data: Iterable[str], vocab: 'BpeVocabulary') -> None:
+        """
+        Learn merges from the data until the vocabulary holds `max_tokens` tokens.
+
+        Args:
+            data (Iterable[str]): Raw sequences, e.g. the training split.
+            vocab (BpeVocabulary): Vocabulary instance to populate.
+        """
+        for base in sorted(set(self.alphabet)):
+            vocab.add_token(base)
+        sequence_counts = Counter(data)
+        if not sequence_counts:
+            return
+
+        # Symbols of all distinct sequences, linked within each sequence
+        code_table = np.full(256, vocab.unk_id, dtype=np.int32)
+        for base in self.alphabet:
+            code_table[ord(base)] = vocab.get_id(base)
+        encoded = [sequence.encode("ascii", errors="replace") for sequence in sequence_counts]
+        self._symbols = code_table[np.frombuffer(b"".join(encoded), dtype=np.uint8)]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        self._weights = np.repeat(np.fromiter(sequence_counts.values(), dtype=np.int32, count=len(lengths)), lengths)
+        sequence_ends = np.cumsum(lengths)[lengths > 0]
+        sequence_starts = sequence_ends - lengths[lengths > 0]
+        # About 16 bytes per base of the distinct sequences
+        position_dtype = np.int32 if len(self._symbols) < np.iinfo(np.int32).max else np.int64
+        self._next = np.arange(1, len(self._symbols) + 1, dtype=position_dtype)
+        self._next[sequence_ends - 1] = -1
+        self._previous = np.arange(-1, len(self._symbols) - 1, dtype=position_dtype)
+        self._previous[sequence_starts] = -1
+        self._unk_id = vocab.unk_id
+        # Pairs are keyed by a * key_base + b
+        self._key_base = max(self.max_tokens, len(vocab)) + 1
+
+        self._pair_counts: Dict[int, int] = {}
+        self._pair_positions: Dict[int, List[np.ndarray]] = {}
+        self._heap: List[tuple[int, int]] = []
+        self._add_pairs(np.arange(len(self._symbols), dtype=position_dtype), sign=1)
+
+        while self._heap and len(vocab) < self.max_tokens:
+            negative_count, key = heapq.heappop(self._heap)
+            if -negative_count != self._pair_counts.get(key, 0):
+                continue  # Stale entry; the pair's current count has its own entry
+            if -negative_count < self.min_frequency:
+                break
+
+            a, b = divmod(key, self._key_base)
+            merge = (vocab.get_token(a), vocab.get_token(b))
+            vocab.add_token(merge[0] + merge[1])
+            vocab.merges.append(merge)
+            self._merge(key, a, b, vocab.get_id(merge[0] + merge[1]))
+
+    def _pair_keys(self, starts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Keys of the pairs starting at `starts`, dropping merged-away symbols, ends of sequences and pairs with UNK."""
+        starts = starts[(self._symbols[starts] != -1) & (self._next[starts] != -1)]
+        left, right = self._symbols[starts], self._symbols[self._next[starts]]
+        starts = starts[(left != self._unk_id) & (right != self._unk_id)]
+        return starts, self._symbols[starts].astype(np.int64) * self._key_base + self._symbols[self._next[starts]]
+
+    def _add_pairs(self, starts: np.ndarray, sign: int) -> None:
+        """Add (sign 1) or remove (sign -1) the weighted pairs starting at `starts`."""
+        starts, keys = self._pair_keys(starts)
+        order = np.argsort(keys, kind="stable")
+        starts, keys = starts[order], keys[order]
+        if len(keys) == 0:
+            return
+        unique_keys, group_starts = np.unique(keys, return_index=True)
+        deltas = np.add.reduceat(self._weights[starts], group_starts, dtype=np.int64)
+        group_bounds = np.append(group_starts, len(starts)).tolist()
+
+        for key, delta, start, end in zip(unique_keys.tolist(), deltas.tolist(), group_bounds[:-1], group_bounds[1:]):
+            count = self._pair_counts.get(key, 0) + sign * delta
+            if count > 0:
+                self._pair_counts[key] = count
+                heapq.heappush(self._heap, (-count, key))
+                if sign > 0:
+                    self._pair_positions.setdefault(key, []).append(starts[start:end])
+            else:
+                self._pair_counts.pop(key, None)
+                self._pair_positions.pop(key, None)
+
+    def _merge(self, key: int, a: int, b: int, c: int) -> None:
+        """Replace every occurrence of the pair (a, b) by c, updating the surrounding pairs."""
+        candidates = np.unique(np.concatenate(self._pair_positions.pop(key, [np.zeros(0, dtype=np.int64)])))
+        following = self._next[candidates]
+        candidates = candidates[
+            (self._symbols[candidates] == a) & (following != -1) & (self._symbols[np.maximum(following, 0)] == b)
+        ]
+        if a == b and len(candidates):
+            # In runs like "AAAA" occurrences overlap; merge them left to right, every other one
+            run_breaks = np.concatenate([[True], self._next[candidates[:-1]] != candidates[1:]])
+            run_ids = np.cumsum(run_breaks) - 1
+            run_starts = np.flatnonzero(run_breaks)
+            candidates = candidates[(np.arange(len(candidates)) - run_starts[run_ids]) % 2 == 0]
+
+        i, j = candidates, self._next[candidates]
+        p, n = self._previous[i], self._next[j]
+        # Pairs starting at p, i and j change; j's symbol disappears
+        affected = np.unique(np.concatenate([p[p != -1], i, j]))
+        self._add_pairs(affected, sign=-1)
+
+        self._symbols[i] = c
+        self._symbols[j] = -1
+        self._next[i] = n
+        self._previous[n[n != -1]] = i[n != -1]
+
+        self._pair_counts.pop(key, None)
+        self._pair_positions.pop(key, None)
+        self._add_pairs(np.unique(np.concatenate([p[p != -1], i])), sign=1)
+
+
+VOCAB_MAGIC = b"DNAVOCAB"
+VOCAB_FORMAT_VERSION = 1
+VOCAB_EXTENSIONS = {"binary": ".bin", "json": ".json"}
+_ALIGNMENT = 8
+
+
+class _SortedTokens:
+    """Sequence view of the sorted token blob, for `bisect`."""
+    def __init__(self, buffer: mmap.mmap, blob_start: int, offsets: np.ndarray):
+        self.buffer = buffer
+        self.blob_start = blob_start
+        # Indexing a memoryview gives Python ints, much faster than numpy scalars in a search
+        self.offsets = memoryview(offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> bytes:
+        # Slicing the map copies only the token's bytes
+        return self.buffer[self.blob_start + self.offsets[index]:self.blob_start + self.offsets[index + 1]]
+
+
+class MappedVocabulary(Vocabulary):
+    """
+    Read-only vocabulary served from a memory-mapped binary vocabulary file.
+
+    The file holds the UTF-8 tokens sorted bytewise in one blob with an offsets array,
+    the ID of each sorted token, and the sorted position of each ID. Opening it only
+    parses a small header, the arrays are paged in on demand, and processes mapping the
+    same file share its pages. `get_id` is a binary search over the blob and
+    `get_token` a direct lookup; `token_to_id`/`id_to_token` decode every token into a
+    per-process dict and are only built when exported explicitly.
+    """
+    def __init__(self, filepath: str):
+        """
+        Map a binary vocabulary file written by `save_vocabulary`.
+
+        Args:
+            filepath (str): Path to the binary vocabulary file.
+        """
+        header, data_start = _read_binary_header(filepath)
+        if "offsets" not in header["arrays"]:
+            raise ValueError(f"{filepath} holds a {header['type']} vocabulary; load it with load_vocabulary")
+        self.filepath = filepath
+        self.pad_token = header["pad_token"]
+        self.unk_token = header["unk_token"]
+        self.pad_id = header["pad_id"]
+        self.unk_id = header["unk_id"]
+
+        self._file = open(filepath, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        arrays = {
+            name: np.frombuffer(self._mmap, dtype=dtype, count=count, offset=data_start + offset)
+            for name, (dtype, offset, count) in header["arrays"].items()
+        }
+        self._offsets = arrays["offsets"]
+        self._sorted_ids = arrays["sorted_ids"]
+        self._position_of_id = arrays["position_of_id"]
+        self._blob = arrays["blob"]
+        self._tokens = _SortedTokens(self._mmap, data_start + header["arrays"]["blob"][1], self._offsets)
+        self._token_to_id = None
+        self._id_to_token = None
+
+    def __len__(self) -> int:
+        return len(self._sorted_ids)
+
+    def add_token(self, token: str):
+        raise TypeError("MappedVocabulary is read-only")
+
+    def get_id(self, token: str) -> int:
+        encoded = token.encode("utf-8")
+        position = bisect.bisect_left(self._tokens, encoded)
+        if position < len(self._tokens) and self._tokens[position] == encoded:
+            return int(self._sorted_ids[position])
+        return self.unk_id  # Default to UNK ID
+
+    def get_token(self, idx: int) -> str:
+        if not 0 <= idx < len(self._position_of_id) or self._position_of_id[idx] < 0:
+            return self.unk_token  # Default to UNK token
+        return self._tokens[self._position_of_id[idx]].decode("utf-8")
+
+    def token_arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the memory-mapped token blob, its offsets and the sorted IDs, see `Vocabulary.token_arrays`."""
+        return self._blob, self._offsets.astype(np.int64), self._sorted_ids
+
+    @property
+    def token_to_id(self) -> Dict[str, int]:
+        if self._token_to_id is None:
+            self._token_to_id = {
+                self._tokens[position].decode("utf-8"): int(idx) for position, idx in enumerate(self._sorted_ids)
+            }
+        return self._token_to_id
+
+    @property
+    def id_to_token(self) -> Dict[int, str]:
+        if self._id_to_token is None:
+            self._id_to_token = {idx: token for token, idx in self.token_to_id.items()}
+        return self._id_to_token
+
+    def load(self, filepath: str):
+        raise TypeError("MappedVocabulary is read-only; use load_vocabulary")
+
+    def close(self) -> None:
+        """Release the memory map. The vocabulary cannot be used afterwards."""
+        self._tokens = self._blob = self._offsets = self._sorted_ids = self._position_of_id = None
+        self._mmap.close()
+        self._file.close()
+
+
+def _read_binary_header(filepath: str) -> tuple[dict, int]:
+    """Parse the header of a binary vocabulary file; returns it and the start of the arrays."""
+    with open(filepath, "rb") as f:
+        prefix = f.read(len(VOCAB_MAGIC) + 8)
+        if prefix[:len(VOCAB_MAGIC)] != VOCAB_MAGIC:
+            raise ValueError(f"{filepath} is not a binary vocabulary file")
+        version, header_length = struct.unpack_from("<II", prefix, len(VOCAB_MAGIC))
+        if version != VOCAB_FORMAT_VERSION:
+            raise ValueError(f"Unsupported binary vocabulary version {version} in {filepath}")
+        header = json.loads(f.read(header_length).decode("utf-8"))
+    return header, _aligned(len(prefix) + header_length)
+
+
+def _aligned(position: int) -> int:
+    return -(-position // _ALIGNMENT) * _ALIGNMENT
+
+
+def _save_binary(vocab: Vocabulary, filepath: str) -> None:
+    """
+    Write a vocabulary in the binary format: magic, version and header length, a JSON
+    header, then 8-byte aligned arrays at the offsets the header gives relative to the
+    first aligned position after it.
+    """
+    header = {
+        "pad_token": vocab.pad_token,
+        "unk_token": vocab.unk_token,
+        "pad_id": vocab.pad_id,
+        "unk_id": vocab.unk_id,
+    }
+    arrays = {}
+    if isinstance(vocab, KmerVocabulary):
+        # Implicit: the descriptor is the whole vocabulary
+        header.update({"type": "kmer", "k": vocab.k, "alphabet": vocab.alphabet})
+    else:
+        header["type"] = "bpe" if isinstance(vocab, BpeVocabulary) else "explicit"
+        if isinstance(vocab, BpeVocabulary):
+            header["merges"] = [list(merge) for merge in vocab.merges]
+        encoded = [token.encode("utf-8") for token in vocab.token_to_id]
+        ids = np.fromiter(vocab.token_to_id.values(), dtype=np.int32, count=len(encoded))
+        order = np.array(sorted(range(len(encoded)), key=encoded.__getitem__), dtype=np.int64)
+        lengths = np.fromiter((len(encoded[i]) for i in order), dtype=np.int64, count=len(order))
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        position_of_id = np.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype=np.int32)
+        position_of_id[ids[order]] = np.arange(len(order))
+        arrays = {
+            "offsets": offsets.astype(np.uint32 if offsets[-1] <= np.iinfo(np.uint32).max else np.int64),
+            "sorted_ids": ids[order],
+            "position_of_id": position_of_id,
+            "blob": np.frombuffer(b"".join(encoded[i] for i in order), dtype=np.uint8),
+        }
+
+    header["arrays"] = {}
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = [array.dtype.str, offset, len(array)]
+        offset = _aligned(offset + array.nbytes)
+    header_bytes = json.dumps(header).encode("utf-8")
+
+    with open(filepath, "wb") as f:
+        f.write(VOCAB_MAGIC)
+        f.write(struct.pack("<II", VOCAB_FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        data_start = f.tell() if not arrays else _aligned(f.tell())
+        for name, array in arrays.items():
+            f.write(b"\0" * (data_start + header["arrays"][name][1] - f.tell()))
+            f.write(array.tobytes())
+
+
+def save_vocabulary(vocab: Vocabulary, filepath: str, vocab_format: str = "binary") -> None:
+    """
+    Save a vocabulary as binary (memory-mappable) or JSON.
+
+    Args:
+        vocab (Vocabulary): Vocabulary to save.
+        filepath (str): Output path.
+        vocab_format (str): "binary" or "json", the latter being each vocabulary's own `save`.
+    """
+    if vocab_format not in VOCAB_EXTENSIONS:
+        raise ValueError(f"Unsupported vocabulary format: '{vocab_format}'. Available formats: {list(VOCAB_EXTENSIONS)}")
+    if vocab_format == "json":
+        vocab.save(filepath)
+    else:
+        _save_binary(vocab, filepath)
+
+
+def load_vocabulary(filepath: str) -> Vocabulary:
+    """
+    Load a vocabulary saved in any format, as the matching vocabulary type.
+
+    Binary files of plain vocabularies are memory-mapped as a `MappedVocabulary`;
+    k-mer descriptors and BPE vocabularies, which are small, are loaded into memory.
+
+    Args:
+        filepath (str): Path to a binary or JSON vocabulary file.
+
+    Returns:
+        Vocabulary: The loaded vocabulary.
+    """
+    with open(filepath, "rb") as f:
+        is_binary = f.read(len(VOCAB_MAGIC)) == VOCAB_MAGIC
+
+    if not is_binary:
+        with open(filepath, "r") as f:
+            saved = json.load(f)
+        if saved.get("type") == "kmer":
+            vocab = KmerVocabulary(k=saved["k"], alphabet=saved["alphabet"])
+        elif saved.get("type") == "bpe":
+            vocab = BpeVocabulary()
+        else:
+            vocab = Vocabulary()
+        vocab.load(filepath)
+        return vocab
+
+    header, _ = _read_binary_header(filepath)
+    if header["type"] == "explicit":
+        return MappedVocabulary(filepath)
+    if header["type"] == "kmer":
+        vocab = KmerVocabulary(k=header["k"], alphabet=header["alphabet"])
+    else:
+        mapped = MappedVocabulary(filepath)
+        vocab = BpeVocabulary()
+        vocab.token_to_id = dict(mapped.token_to_id)
+        vocab.id_to_token = {idx: token for token, idx in vocab.token_to_id.items()}
+        vocab.merges = [tuple(merge) for merge in header["merges"]]
+        mapped.close()
+    vocab.pad_token, vocab.unk_token = header["pad_token"], header["unk_token"]
+    vocab.pad_id, vocab.unk_id = header["pad_id"], header["unk_id"]
+    return vocab
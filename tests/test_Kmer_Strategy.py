@@ -1,4 +1,8 @@
+import numpy as np
+import pytest
+
 from preprocessing.tokenization import KmerStrategy
+from vocab import KmerVocabConstructor, Vocabulary
 
 def test_kmer_strategy():
     # Case 1: k=3, sequence length requires padding of 2 characters
@@ -79,3 +83,38 @@ def test_ensure_divisible_by_k()->None:
     output_sequence = k_strat._make_divisible_by_k(test_sequence)
     assert output_sequence == expected_output
 
+
+def test_kmer_ids_match_vocabulary():
+    vocab = Vocabulary()
+    vocab.build_from_constructor(KmerVocabConstructor(k=3, alphabet=['A', 'C', 'G', 'T']), data=[])
+    k_strat = KmerStrategy(k=3, padding_alphabet=['A'], output="ids")
+    test_sequence = "ACGTTGCANNAGGCTA"
+    output = k_strat.encode(test_sequence)
+    expected_output = [
+        token_ids[0] for token_ids in vocab.map_sentence(KmerStrategy(k=3, padding_alphabet=['A']).execute(list(test_sequence)))
+    ]
+    assert output.dtype == np.int32
+    assert output.tolist() == expected_output
+    assert output[3] == vocab.unk_id
+    assert k_strat.execute(list(test_sequence)).tolist() == expected_output
+
+def test_kmer_stride():
+    k_strat = KmerStrategy(k=3, padding_alphabet=['N'], stride=1)
+    assert k_strat.execute(list('012345')) == [['012'], ['123'], ['234'], ['345']]
+
+    k_strat = KmerStrategy(k=4, padding_alphabet=['N'], stride=2)
+    assert k_strat.execute(list('0123456')) == [['0123'], ['2345'], ['456N']]
+    assert k_strat.execute(list('01')) == [['01NN']]
+
+    for stride in [0, -1]:
+        with pytest.raises(ValueError):
+            KmerStrategy(k=3, stride=stride)
+
+def test_kmer_stride_ids():
+    vocab = Vocabulary()
+    vocab.build_from_constructor(KmerVocabConstructor(k=4, alphabet=['A', 'C', 'G', 'T']), data=[])
+    test_sequence = "ACGTTGCANNAGGCTAC"
+    for stride in [1, 2, 3]:
+        output = KmerStrategy(k=4, padding_alphabet=['A'], stride=stride, output="ids").encode(test_sequence)
+        tokens = KmerStrategy(k=4, padding_alphabet=['A'], stride=stride).execute(list(test_sequence))
+        assert output.tolist() == [token_ids[0] for token_ids in vocab.map_sentence(tokens)]
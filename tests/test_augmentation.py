@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from preprocessing.augmentation import BaseStrategy, IdentityStrategy, RandomStrategy, SequenceModifier, _KEEP, _walk_batch
+
+def replay(seq, alphabet, kinds, bases):
+    """The list-based walk of the original strategy, fed with the drawn decisions."""
+    seq, pos, visit = list(seq), 0, 0
+    while pos < len(seq):
+        kind, base = kinds[visit], bases[visit]
+        visit += 1
+        if kind in (0, 5):  # Insert before / after
+            seq.insert(pos + (kind == 5), alphabet[base])
+        elif kind == 1:
+            seq[pos] = alphabet[base]
+        elif kind == 2 and len(seq) > 1:
+            seq.pop(pos)
+        elif kind in (3, 6):  # Swap left / right
+            swap_pos = pos + (1 if kind == 6 else -1)
+            if 0 <= swap_pos < len(seq):
+                seq[pos], seq[swap_pos] = seq[swap_pos], seq[pos]
+        pos += 1
+    return seq
+
+def test_execute_matches_sequential_walk():
+    rng = np.random.default_rng(0)
+    alphabet = ['x', 'y', 'z']
+    for _ in range(2000):
+        strategy = BaseStrategy(
+            SequenceModifier(alphabet), alphabet,
+            modification_probability=float(rng.choice([0.1, 0.5, 1.0])),
+            weights=(rng.integers(0, 3, 4) + [0, 0, 0, 1]).tolist(),
+        )
+        draws = strategy._draw(1000)
+        drawn = [0]
+        def next_draws(visits, rng=None):
+            drawn[0] += visits
+            return draws[:, drawn[0] - visits:drawn[0]]
+        strategy._draw = next_draws
+
+        seq = [str(i) for i in range(rng.integers(0, 12))]
+        assert strategy.execute(seq) == replay(seq, alphabet, *draws.tolist())
+
+def test_execute_rates():
+    alphabet = ['A', 'C', 'G', 'T']
+    seq = list('ACGT' * 500)
+    assert BaseStrategy(SequenceModifier(alphabet), alphabet, modification_probability=0).execute(seq) == seq
+    assert IdentityStrategy(SequenceModifier(alphabet), alphabet).execute(seq) == seq
+
+    # Only insertions: the walk visits every base and about p / (1 - p) inserted ones per base
+    strategy = BaseStrategy(SequenceModifier(alphabet), alphabet, modification_probability=0.2, weights=[1, 0, 0, 0])
+    lengths = [len(strategy.execute(seq)) for _ in range(20)]
+    assert abs(np.mean(lengths) / len(seq) - 1.25) < 0.02
+
+    augmented = RandomStrategy(alphabet, SequenceModifier(alphabet), weights=[0, 1, 0, 0]).execute(seq)
+    assert len(augmented) == len(seq) and set(augmented) <= set(alphabet)
+
+def test_invalid_weights():
+    with pytest.raises(ValueError):
+        BaseStrategy(SequenceModifier(['A']), ['A'], weights=[1, 1])
+    with pytest.raises(ValueError):
+        BaseStrategy(SequenceModifier(['A']), ['A'], weights=[0, 0, 0, 0])
+
+def test_batch_walk_matches_sequential_walk():
+    rng = np.random.default_rng(1)
+    alphabet = ['x', 'y', 'z']
+    for _ in range(500):
+        strategy = BaseStrategy(
+            SequenceModifier(alphabet), alphabet,
+            modification_probability=float(rng.choice([0.1, 0.5, 1.0])),
+            weights=(rng.integers(0, 3, 4) + [0, 0, 0, 1]).tolist(),
+        )
+        lengths = rng.integers(0, 12, 4)
+        seqs = [[chr(ord('a') + i) for i in range(length)] for length in lengths]
+        # Events from per-visit draws; the last one drawn per sequence marks the known visits
+        draws = [strategy._draw(100) for _ in seqs]
+        events = [np.flatnonzero(kinds != _KEEP)[:rng.integers(1, 30)] for kinds, _ in draws]
+        gaps, kinds, bases = (
+            np.concatenate(parts) for parts in zip(*[
+                (np.diff(visits, prepend=-1), draw[0, visits], draw[1, visits]) for visits, draw in zip(events, draws)
+            ])
+        )
+        values = np.frombuffer("".join(map("".join, seqs)).encode(), dtype=np.uint8)
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        codes, out_lengths, finished = _walk_batch(
+            gaps, kinds, bases, np.array([len(visits) for visits in events]), lengths, offsets[:-1], len(values)
+        )
+        out = np.concatenate([values, np.frombuffer(b"xyz", dtype=np.uint8)])[codes].tobytes().decode()
+        out_offsets = np.concatenate([[0], np.cumsum(out_lengths)])
+
+        for i, (seq, visits, (kinds, bases)) in enumerate(zip(seqs, events, draws)):
+            try:
+                expected = "".join(replay(seq, alphabet, kinds[:visits[-1]].tolist(), bases.tolist()))
+            except IndexError:
+                # The walk needs visits past the last known one
+                assert not finished[i]
+                continue
+            assert finished[i]
+            assert out[out_offsets[i]:out_offsets[i + 1]] == expected
+
+def test_execute_batch():
+    alphabet = ['A', 'C', 'G', 'T']
+    seqs = ["ACGT" * 50, "", "A", "GATTACA" * 20]
+    values = np.frombuffer("".join(seqs).encode(), dtype=np.uint8)
+    offsets = np.concatenate([[0], np.cumsum([len(seq) for seq in seqs])])
+
+    identity = IdentityStrategy(SequenceModifier(alphabet), alphabet)
+    assert identity.execute_batch(values, offsets)[0] is values
+
+    # Insertions and substitutions at every visit: each input base is replaced once, and
+    # before that preceded or followed by a geometric number of inserted bases
+    strategy = RandomStrategy(alphabet, SequenceModifier(alphabet), weights=[1, 1, 0, 0])
+    augmented, augmented_offsets = strategy.execute_batch(values, offsets)
+    assert augmented.dtype == np.uint8 and len(augmented_offsets) == len(offsets)
+    for i, seq in enumerate(seqs):
+        out = augmented[augmented_offsets[i]:augmented_offsets[i + 1]].tobytes().decode()
+        assert len(out) >= len(seq)
+        assert set(out) <= set(alphabet)
+    assert abs(len(augmented) / len(values) - 2) < 0.4
@@ -0,0 +1,39 @@
+from factory import create_preprocessor, create_vocabulary
+from preprocessing.tokenization import BpeStrategy
+from vocab import BpeVocabConstructor, BpeVocabulary
+
+SEQUENCES = ["ACGTACGTAAAA", "ACGTTTACGT", "AAAANACGT", "ACGTACGTAAAA"]
+
+def test_bpe_training():
+    vocab = BpeVocabulary()
+    vocab.build_from_constructor(BpeVocabConstructor(alphabet=['A', 'C', 'G', 'T'], max_tokens=9), SEQUENCES)
+    # Pair counts (duplicates weighted, pairs with N skipped): AA 9, AC 7, CG 7, GT 7, ...
+    # Ties go to the pair of lower token IDs, so GT (7 after AA, AC) is merged before ACG
+    assert vocab.merges == [('A', 'A'), ('A', 'C'), ('G', 'T')]
+    assert list(vocab.token_to_id) == ['PAD', 'UNK', 'A', 'C', 'G', 'T', 'AA', 'AC', 'GT']
+
+def test_bpe_overlapping_merges():
+    vocab = BpeVocabulary()
+    vocab.build_from_constructor(BpeVocabConstructor(alphabet=['A', 'C'], max_tokens=6), ["AAAAA", "AAAC"])
+    assert vocab.merges == [('A', 'A'), ('AA', 'A')]
+    assert BpeStrategy(vocab).execute(list("AAAAAC")) == [['AA'], ['AAA'], ['C']]
+
+def test_bpe_strategy(tmp_path):
+    config = {
+        "preprocessor_options": {
+            "augmentation_strategy": {"strategy": "identity", "alphabet": ['A', 'C', 'G', 'T']},
+            "tokenization_strategy": {"strategy": "bpe"},
+            "padding_strategy": {"strategy": "end", "optimal_length": 6},
+            "truncation_strategy": {"strategy": "end", "optimal_length": 6},
+        },
+        "vocab_options": {"max_tokens": 9},
+    }
+    vocab = create_vocabulary(config, data=SEQUENCES)
+    vocab.save(str(tmp_path / "vocab.json"))
+    loaded_vocab = create_vocabulary(config)
+    loaded_vocab.load(str(tmp_path / "vocab.json"))
+    assert loaded_vocab.merges == vocab.merges
+
+    preprocessor = create_preprocessor(config, loaded_vocab)
+    # AC GT A N AC G, truncated to 6 tokens
+    assert preprocessor.process("ACGTANACG") == [[7], [8], [2], [1], [7], [4]]
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from preprocessing import padding, truncation
+from preprocessing.collation import Collator
+from utils.random_state import sequence_rng
+
+def test_collate_matches_staged_padding_and_truncation():
+    rng = np.random.default_rng(0)
+    sentences = [rng.integers(2, 66, size=n).astype(np.int32) for n in [0, 1, 5, 8, 9, 20, 8, 3]]
+    for pad_class in [padding.EndStrategy, padding.FrontStrategy, padding.RandomStrategy]:
+        for trunc_class in [truncation.EndStrategy, truncation.FrontStrategy, truncation.SlidingwindowStrategy]:
+            pad, trunc = pad_class(8), trunc_class(8)
+            ids, mask, lengths = Collator(pad, trunc).collate(sentences, rngs=[sequence_rng(1, i) for i in range(8)])
+            for i, sentence in enumerate(sentences):
+                rng_i = sequence_rng(1, i)
+                expected = trunc.execute(pad.execute(sentence, rng=rng_i), rng=rng_i)
+                assert ids.dtype == np.int32 and ids[i].tolist() == expected.tolist()
+                assert mask[i].sum() == lengths[i] == min(len(sentence), 8)
+                assert (ids[i][~mask[i]] == padding.PAD_ID).all()
+
+def test_collate_into_preallocated_matrix():
+    collator = Collator(padding.FrontStrategy(4), truncation.EndStrategy(4))
+    out = np.full((2, 4), -1, dtype=np.int32)
+    ids, mask, lengths = collator.collate([np.array([5, 6]), np.array([7, 8, 9, 10, 11])], out=out)
+    assert ids is out
+    assert out.tolist() == [[0, 0, 5, 6], [7, 8, 9, 10]]
+    assert mask.tolist() == [[False, False, True, True], [True] * 4]
+    assert lengths.tolist() == [2, 4]
+    with pytest.raises(ValueError):
+        collator.collate([np.array([5])], out=out)
+
+def test_collate_pads_and_truncates_to_different_lengths():
+    rng = np.random.default_rng(0)
+    sentences = [rng.integers(2, 66, size=n).astype(np.int32) for n in [0, 1, 5, 8, 9, 20, 8, 3]]
+    for padding_length in [5, 12]:
+        for pad_class in [padding.EndStrategy, padding.FrontStrategy, padding.RandomStrategy]:
+            for trunc_class in [truncation.EndStrategy, truncation.FrontStrategy, truncation.SlidingwindowStrategy]:
+                pad, trunc = pad_class(padding_length), trunc_class(8)
+                ids, mask, lengths = Collator(pad, trunc).collate(sentences, rngs=[sequence_rng(1, i) for i in range(8)])
+                assert ids.shape == (8, 8)
+                for i, sentence in enumerate(sentences):
+                    rng_i = sequence_rng(1, i)
+                    expected = trunc.execute(pad.execute(sentence, rng=rng_i), rng=rng_i)
+                    assert ids[i, :len(expected)].tolist() == expected.tolist()
+                    assert (ids[i, len(expected):] == padding.PAD_ID).all()
+                    assert mask[i].sum() == lengths[i] == (expected != padding.PAD_ID).sum()
+
+def test_collate_buckets():
+    collator = Collator(padding.EndStrategy(10), truncation.EndStrategy(10), buckets=[3, 6, 20])
+    assert collator.buckets.tolist() == [3, 6, 10]
+    sentences = [np.arange(2, 2 + n, dtype=np.int32) for n in [1, 5, 12, 3, 4, 0]]
+    collated = collator.collate_buckets(sentences)
+    assert [indices.tolist() for indices, *_ in collated] == [[0, 3, 5], [1, 4], [2]]
+    assert [ids.shape for _, ids, _, _ in collated] == [(3, 3), (2, 5), (1, 10)]
+    indices, ids, mask, lengths = collated[1]
+    assert ids.tolist() == [[2, 3, 4, 5, 6], [2, 3, 4, 5, 0]]
+    assert lengths.tolist() == [5, 4] and mask.sum() == 9
+
+    stats = collator.bucket_stats([1, 5, 12, 3, 4, 0])
+    assert [bucket["count"] for bucket in stats["buckets"]] == [3, 2, 1]
+    assert stats["padding"] == (9 - 4) + (10 - 9) + 0
+    assert stats["padding_without_buckets"] == 60 - 23
@@ -0,0 +1,44 @@
+import logging
+import os
+
+from run_scenario import prepare_data
+
+FASTA = ">a\nACGT\n>b\nTTTT\n>c\nGGGG\n>d\nCCCC\n>e\nAAAA\n"
+
+def make_config(tmp_path, **overrides):
+    fasta_path = tmp_path / "raw.fasta"
+    if not fasta_path.exists():
+        fasta_path.write_text(FASTA)
+    config = {
+        "fasta_file": str(fasta_path),
+        "prepared_data_dir": str(tmp_path / "prepared"),
+        "test_size": 0.4,
+        "random_seed": 42,
+    }
+    config.update(overrides)
+    return config
+
+def test_prepare_data_reuses_cache(tmp_path):
+    logger = logging.getLogger("test_data_cache")
+    train_file, test_file = prepare_data(make_config(tmp_path), logger)
+    mtime = os.stat(train_file).st_mtime_ns
+
+    # Same FASTA content and split parameters: the cached entry is reused
+    assert prepare_data(make_config(tmp_path), logger) == (train_file, test_file)
+    assert os.stat(train_file).st_mtime_ns == mtime
+
+    # Different split parameters get their own entry
+    other_train_file, _ = prepare_data(make_config(tmp_path, random_seed=0), logger)
+    assert other_train_file != train_file
+
+    # force_reprocess rebuilds the entry in place
+    assert prepare_data(make_config(tmp_path, force_reprocess=True), logger) == (train_file, test_file)
+    assert os.stat(train_file).st_mtime_ns != mtime
+
+def test_prepare_data_invalidates_on_content_change(tmp_path):
+    logger = logging.getLogger("test_data_cache")
+    train_file, _ = prepare_data(make_config(tmp_path), logger)
+
+    (tmp_path / "raw.fasta").write_text(FASTA + ">f\nACGA\n")
+    new_train_file, _ = prepare_data(make_config(tmp_path), logger)
+    assert new_train_file != train_file
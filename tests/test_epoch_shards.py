@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+import pytest
+
+from epoch_shards import EpochShards, materialize_epochs
+from errors import PreprocessingError
+from preprocessing.augmentation import BaseStrategy, SequenceModifier
+from preprocessing.collation import Collator
+from preprocessing.padding import RandomStrategy as RandomPadding
+from preprocessing.preprocessor import Preprocessor
+from preprocessing.tokenization import KmerStrategy
+from preprocessing.truncation import MultiwindowStrategy, SlidingwindowStrategy
+from sequence_store import PackedSequences
+from vocab import KmerVocabulary
+
+def make_preprocessor(seed=42):
+    alphabet = ['A', 'C', 'G', 'T']
+    return Preprocessor(
+        augmentation_strategy=BaseStrategy(SequenceModifier(alphabet), alphabet, modification_probability=0.2),
+        tokenization_strategy=KmerStrategy(k=3, padding_alphabet=alphabet),
+        padding_strategy=RandomPadding(optimal_length=12),
+        truncation_strategy=SlidingwindowStrategy(optimal_length=10),
+        vocab=KmerVocabulary(k=3, alphabet=alphabet),
+        seed=seed,
+    )
+
+def test_materialize_epochs(tmp_path):
+    sequences = ["ACGTTGCAAC" * (i % 5 + 1) for i in range(23)]
+    shards = materialize_epochs(make_preprocessor(), sequences, 3, str(tmp_path / "serial"), workers=1, chunk_size=4)
+    assert len(shards) == 3 and shards.sequences == 23
+
+    preprocessor = make_preprocessor()
+    for epoch in range(3):
+        expected = [np.ravel(preprocessor.process(s, sequence_id=i, epoch=epoch)) for i, s in enumerate(sequences)]
+        assert all(np.array_equal(a, b) for a, b in zip(shards.iter_epoch(epoch), expected))
+    ids, offsets = shards.arrays(0)
+    assert ids.dtype == np.int32 and offsets[-1] == len(ids)
+    assert not np.array_equal(shards.arrays(0)[0], shards.arrays(1)[0])
+
+    # The shards do not depend on the number of workers or the chunk size
+    parallel = materialize_epochs(make_preprocessor(), sequences, 3, str(tmp_path / "parallel"), workers=2, chunk_size=5)
+    for epoch in range(3):
+        assert np.array_equal(parallel.arrays(epoch)[0], shards.arrays(epoch)[0])
+        assert np.array_equal(parallel.arrays(epoch)[1], shards.arrays(epoch)[1])
+    assert len(list(EpochShards(str(tmp_path / "parallel")).iter_epoch(2))) == 23
+
+    store = PackedSequences.from_sequences(sequences)
+    packed = materialize_epochs(make_preprocessor(), store, 3, str(tmp_path / "packed"), workers=1, chunk_size=4)
+    for epoch in range(3):
+        assert np.array_equal(packed.arrays(epoch)[0], shards.arrays(epoch)[0])
+
+def test_materialize_epochs_keyed_by_sequence_ids(tmp_path):
+    sequences = ["ACGTTGCAAC" * (i % 5 + 1) for i in range(11)]
+    ids = [f"record_{i}" for i in range(11)]
+    forward = materialize_epochs(
+        make_preprocessor(), sequences, 2, str(tmp_path / "forward"), workers=1, chunk_size=3, sequence_ids=ids
+    )
+    backward = materialize_epochs(
+        make_preprocessor(), sequences[::-1], 2, str(tmp_path / "backward"), workers=1, chunk_size=4, sequence_ids=ids[::-1]
+    )
+    for epoch in range(2):
+        assert [row.tolist() for row in forward.iter_epoch(epoch)] == [row.tolist() for row in backward.iter_epoch(epoch)][::-1]
+
+def test_write_bucket_stats(tmp_path):
+    shards = materialize_epochs(make_preprocessor(), ["ACGTTGCAAC" * 3, "ACGT"], 2, str(tmp_path), workers=1)
+    collator = Collator(RandomPadding(optimal_length=12), SlidingwindowStrategy(optimal_length=12), buckets=[4])
+    with open(shards.write_bucket_stats(collator)) as f:
+        stats = json.load(f)
+    assert stats["bounds"] == [4, 12]
+    assert [sum(b["count"] for b in epoch["buckets"]) for epoch in stats["epochs"]] == [2, 2]
+
+def test_materialize_epochs_requires_seed(tmp_path):
+    with pytest.raises(PreprocessingError):
+        materialize_epochs(make_preprocessor(seed=None), ["ACGT"], 2, str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        EpochShards(str(tmp_path))
+
+def test_materialize_windows(tmp_path):
+    alphabet = ['A', 'C', 'G', 'T']
+    preprocessor = Preprocessor(
+        augmentation_strategy=BaseStrategy(SequenceModifier(alphabet), alphabet, modification_probability=0),
+        tokenization_strategy=KmerStrategy(k=3, padding_alphabet=alphabet),
+        padding_strategy=RandomPadding(optimal_length=4),
+        truncation_strategy=MultiwindowStrategy(optimal_length=4, stride=2),
+        vocab=KmerVocabulary(k=3, alphabet=alphabet),
+        seed=1,
+    )
+    shards = materialize_epochs(preprocessor, ["ACG" * 4, "ACG" * 9], 1, str(tmp_path), workers=1)
+    assert shards.parents(0).tolist() == [0] + [1] * 4
+    assert np.diff(shards.arrays(0)[1]).tolist() == [4] * 5
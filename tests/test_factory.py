@@ -0,0 +1,33 @@
+import copy
+import importlib
+
+import pytest
+
+from errors import ConstructionError
+from factory import create_vocabulary
+from vocab import KmerVocabulary
+
+SEQUENCES = ["ACGACGACGTTT", "ACGACGGGG", "ACGTTTTTT"]
+
+def test_generated_config_builds_frequency_vocabulary(tmp_path, monkeypatch):
+    # The generator writes its scenarios into the working directory when imported
+    monkeypatch.chdir(tmp_path)
+    generate_configs = importlib.import_module("utils.generate_configs")
+    config = copy.deepcopy(generate_configs.base_pretraining_config)
+    config["preprocessor_options"]["tokenization_strategy"]["k"] = 3
+    config["vocab_options"].update({"min_frequency": 2, "max_tokens": 4, "workers": 1})
+
+    vocab = create_vocabulary(config, data=SEQUENCES)
+    assert not isinstance(vocab, KmerVocabulary)
+    # PAD and UNK, then ACG and TTT, the only 3-mers seen twice
+    assert sorted(vocab.token_to_id) == ["ACG", "PAD", "TTT", "UNK"]
+
+def test_implicit_vocabulary_rejects_frequency_options():
+    config = {
+        "preprocessor_options": {"tokenization_strategy": {"strategy": "kmer", "k": 3}},
+        "vocab_options": {"implicit": True, "min_frequency": 2},
+    }
+    with pytest.raises(ConstructionError):
+        create_vocabulary(config, data=SEQUENCES)
+    config["vocab_options"] = {}
+    assert isinstance(create_vocabulary(config, data=SEQUENCES), KmerVocabulary)
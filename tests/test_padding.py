@@ -1,3 +1,5 @@
+import numpy as np
+
 from preprocessing.padding import EndStrategy, FrontStrategy, RandomStrategy
 
 
@@ -169,4 +171,11 @@ def test_ramdompad_strategy():
             for i in range(first_non_pad):
                 assert output_seq[i] == ['PAD'], f"Misplaced `['PAD']` token at index {i}"
             for i in range(last_non_pad + 1, len(output_seq)):
-                assert output_seq[i] == ['PAD'], f"Misplaced `['PAD']` token at index {i}"
\ No newline at end of file
+                assert output_seq[i] == ['PAD'], f"Misplaced `['PAD']` token at index {i}"
+def test_padding_id_arrays():
+    input_seq = np.array([5, 6, 7], dtype=np.int32)
+    assert EndStrategy(optimal_length=5).execute(input_seq).tolist() == [5, 6, 7, 0, 0]
+    assert FrontStrategy(optimal_length=5).execute(input_seq).tolist() == [0, 0, 5, 6, 7]
+    output_seq = RandomStrategy(optimal_length=6).execute(input_seq)
+    assert output_seq.dtype == np.int32
+    assert np.count_nonzero(output_seq == 0) == 3
@@ -0,0 +1,84 @@
+import gzip
+
+from Bio import bgzf
+
+from utils.fasta_index import FastaIndex
+from utils.parse_fasta import (
+    count_fasta_records, detect_compression, iter_fasta_batches, iter_fasta_records, parse_fasta_custom
+)
+
+FASTA = (
+    ">seq1|k__Fungi;p__Ascomycota description\n"
+    "ACGT\n"
+    "ACG\n"
+    ">seq2\n"
+    "TTTT\n"
+    ">seq3 other\n"
+    "GG\n"
+    "CC\n"
+)
+
+def write_fasta(tmp_path):
+    fasta_path = tmp_path / "test.fasta"
+    fasta_path.write_text(FASTA)
+    return str(fasta_path)
+
+def test_iter_fasta_records(tmp_path):
+    fasta_path = write_fasta(tmp_path)
+    records = list(iter_fasta_records(fasta_path))
+    expected_output = [
+        ("seq1|k__Fungi;p__Ascomycota", "ACGTACG"),
+        ("seq2", "TTTT"),
+        ("seq3", "GGCC"),
+    ]
+    assert records == expected_output
+    assert count_fasta_records(fasta_path) == 3
+
+def test_iter_fasta_batches(tmp_path):
+    fasta_path = write_fasta(tmp_path)
+    batches = list(iter_fasta_batches(fasta_path, batch_size=2))
+    assert [ids for ids, _ in batches] == [["seq1|k__Fungi;p__Ascomycota", "seq2"], ["seq3"]]
+    assert [sequences for _, sequences in batches] == [["ACGTACG", "TTTT"], ["GGCC"]]
+
+def test_fasta_index_fetch(tmp_path):
+    fasta_path = write_fasta(tmp_path)
+    index = FastaIndex.open(fasta_path)
+    assert len(index) == 3
+    assert index.fetch("seq1|k__Fungi;p__Ascomycota") == "ACGTACG"
+    assert index.fetch("seq1|k__Fungi;p__Ascomycota", 2, 6) == "GTAC"
+    assert index.fetch("seq3", 1) == "GCC"
+    assert parse_fasta_custom(fasta_path, ["seq3", "seq2"]) == [
+        {"ID": "seq3", "Sequence": "GGCC"},
+        {"ID": "seq2", "Sequence": "TTTT"},
+    ]
+    index.close()
+
+def test_fasta_index_invalidation(tmp_path):
+    fasta_path = write_fasta(tmp_path)
+    FastaIndex.open(fasta_path)
+    assert FastaIndex.load(fasta_path) is not None
+
+    (tmp_path / "test.fasta").write_text(FASTA + ">seq4\nA\n")
+    assert FastaIndex.load(fasta_path) is None
+    assert len(FastaIndex.open(fasta_path)) == 4
+
+def test_fasta_index_keeps_samtools_index(tmp_path):
+    fasta_path = write_fasta(tmp_path)
+    samtools_index = "seq2\t4\t40\t4\t5\n"
+    (tmp_path / "test.fasta.fai").write_text(samtools_index)
+    assert FastaIndex.open(fasta_path).fetch("seq2") == "TTTT"
+    assert (tmp_path / "test.fasta.fai").read_text() == samtools_index
+
+def test_compressed_fasta_records(tmp_path):
+    gzip_path = tmp_path / "test.fasta.gz"
+    with gzip.open(gzip_path, "wt") as f:
+        f.write(FASTA)
+    bgzf_path = tmp_path / "test.bgzf.fasta.gz"
+    with bgzf.BgzfWriter(str(bgzf_path), "wb") as f:
+        f.write(FASTA.encode())
+
+    expected_output = list(iter_fasta_records(write_fasta(tmp_path)))
+    assert detect_compression(str(gzip_path)) == "gzip"
+    assert detect_compression(str(bgzf_path)) == "bgzf"
+    assert list(iter_fasta_records(str(gzip_path))) == expected_output
+    assert list(iter_fasta_records(str(bgzf_path), workers=2)) == expected_output
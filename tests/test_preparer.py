@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preparer import SequenceDataPreparer, TAXONOMIC_RANKS, expand_duplicates, taxonomy_codes
+from sequence_store import PackedSequences
+from utils.prepared_io import read_prepared
+
+FASTA = (
+    ">SH1|acc1|k__Fungi;p__Ascomycota;c__Sordariomycetes;o__Hypocreales;f__Nectriaceae;g__Fusarium;s__Fusarium_solani\n"
+    "ACGTACGT\n"
+    ">SH2|acc2|k__Fungi;p__Basidiomycota;c__Agaricomycetes;o__Agaricales;f__Amanitaceae;g__Amanita;s__Amanita_muscaria\n"
+    "TTTTGGGG\n"
+    ">SH3|acc3|k__Fungi;p__Ascomycota;c__Sordariomycetes;o__Hypocreales;f__Nectriaceae;g__Fusarium;s__Fusarium_solani\n"
+    "ACGTACGA\n"
+    ">SH4|acc4|unclassified\n"
+    "CCCCAAAA\n"
+    ">SH5|acc5|k__Fungi;p__Ascomycota;g__Penicillium\n"
+    "GGGGCCCC\n"
+)
+
+def make_preparer(tmp_path, **kwargs):
+    tmp_path.mkdir(parents=True, exist_ok=True)
+    fasta_path = tmp_path / "raw.fasta"
+    fasta_path.write_text(FASTA)
+    return SequenceDataPreparer(str(fasta_path), str(tmp_path / "prepared"), **kwargs)
+
+def test_taxonomy_columns(tmp_path):
+    preparer = make_preparer(tmp_path, batch_size=2)
+    df = preparer.parse_fasta_to_dataframe()
+
+    assert list(df["ID"].str[:3]) == ["SH1", "SH2", "SH3", "SH4", "SH5"]
+    for rank in TAXONOMIC_RANKS:
+        assert isinstance(df[rank].dtype, pd.CategoricalDtype)
+
+    # Column-wise parsing agrees with the per-record parser
+    for record_id, (_, row) in zip(df["ID"], df.iterrows()):
+        expected = preparer._parse_taxonomy(record_id.split("|")[-1] if "k__" in record_id else "")
+        for rank in TAXONOMIC_RANKS:
+            assert (row[rank] if pd.notna(row[rank]) else None) == expected[rank]
+
+    codes, lookup = taxonomy_codes(df)
+    assert list(lookup["Genus"][codes["Genus"][[0, 1, 2, 4]]]) == ["Fusarium", "Amanita", "Fusarium", "Penicillium"]
+    assert codes.loc[3, "Genus"] == -1
+    assert codes.loc[4, "Class"] == -1
+
+def test_preparer_before_fasta_exists(tmp_path):
+    fasta_path = tmp_path / "raw.fasta"
+    preparer = SequenceDataPreparer(str(fasta_path), str(tmp_path / "prepared"))
+    fasta_path.write_text(FASTA)
+    assert preparer.compression == "none"
+    assert len(preparer.parse_fasta_to_dataframe()) == 5
+
+def test_prepare_writes_all_records(tmp_path):
+    preparer = make_preparer(tmp_path, batch_size=2)
+    train_file, test_file = preparer.prepare(test_size=0.4, random_seed=0)
+
+    train_df = pd.read_csv(train_file)
+    test_df = pd.read_csv(test_file)
+    assert len(train_df) == 3 and len(test_df) == 2
+    assert sorted(train_df["ID"].tolist() + test_df["ID"].tolist()) == sorted(preparer.parse_fasta_to_dataframe()["ID"])
+
+@pytest.mark.parametrize("output_format", ["parquet", "arrow"])
+def test_prepare_columnar_formats(tmp_path, output_format):
+    pytest.importorskip("pyarrow")
+    preparer = make_preparer(tmp_path, batch_size=2, output_format=output_format)
+    train_file, test_file = preparer.prepare(test_size=0.4, random_seed=0)
+    assert train_file.endswith(f".{output_format}")
+
+    train_df = read_prepared(train_file)
+    assert isinstance(train_df["Genus"].dtype, pd.CategoricalDtype)
+    csv_df = pd.read_csv(make_preparer(tmp_path / "csv", batch_size=2).prepare(test_size=0.4, random_seed=0)[0])
+    assert train_df["ID"].tolist() == csv_df["ID"].tolist()
+    assert train_df["Genus"].astype(object).fillna("").tolist() == csv_df["Genus"].fillna("").tolist()
+
+    sequences = read_prepared(test_file, columns=["Sequence"])
+    assert list(sequences.columns) == ["Sequence"]
+    assert len(sequences) == 2
+
+def test_hash_split_is_stable(tmp_path):
+    preparer = make_preparer(tmp_path / "a", batch_size=2)
+    _, test_file = preparer.prepare(test_size=0.5, random_seed=3, split_mode="hash")
+    test_ids = set(pd.read_csv(test_file)["ID"])
+
+    # Adding records and changing the batch size does not move existing records
+    extended_path = tmp_path / "b" / "raw.fasta"
+    extended_path.parent.mkdir()
+    extended_path.write_text(FASTA + "".join(f">SH{i}|acc{i}|unclassified\nACGT\n" for i in range(6, 50)))
+    extended = SequenceDataPreparer(str(extended_path), str(tmp_path / "b" / "prepared"), batch_size=7)
+    train_file, extended_test_file = extended.prepare(test_size=0.5, random_seed=3, split_mode="hash")
+    extended_test_ids = set(pd.read_csv(extended_test_file)["ID"])
+
+    original_ids = set(preparer.parse_fasta_to_dataframe()["ID"])
+    assert extended_test_ids & original_ids == test_ids
+    assert len(pd.read_csv(train_file)) + len(extended_test_ids) == 49
+
+def test_stratified_test_mask(tmp_path):
+    preparer = make_preparer(tmp_path)
+    labels = np.array([0] * 10 + [1] * 5 + [2] + [-1] * 2)
+
+    is_test = preparer.stratified_test_mask(labels, test_size=0.2, random_state=0)
+    assert is_test[labels == 0].sum() == 2
+    assert is_test[labels == 1].sum() == 1
+    assert not is_test[labels == 2].any()
+    assert not is_test[labels == -1].any()
+
+    is_test = preparer.stratified_test_mask(labels, test_size=0.2, random_state=0, min_class_size=6, rare_class_policy="test")
+    assert is_test[labels == 0].sum() == 2
+    assert is_test[labels == 1].all() and is_test[labels == 2].all() and is_test[labels == -1].all()
+
+def test_prepare_stratified(tmp_path):
+    preparer = make_preparer(tmp_path, batch_size=2)
+    labels = preparer.rank_labels("Genus")
+    assert labels.tolist() == [0, 1, 0, -1, 2]
+
+    train_file, test_file = preparer.prepare(test_size=0.5, random_seed=0, split_mode="stratified", stratify_rank="Genus")
+    test_df = pd.read_csv(test_file)
+    assert test_df["Genus"].tolist() == ["Fusarium"]
+    assert len(pd.read_csv(train_file)) == 4
+
+def test_prepare_deduplicate(tmp_path):
+    duplicated = FASTA + ">SH6|acc6|k__Fungi;g__Fusarium\nACGTACGT\n>SH7|acc7|unclassified\nACGTACGT\n"
+    fasta_path = tmp_path / "raw.fasta"
+    fasta_path.write_text(duplicated)
+    preparer = SequenceDataPreparer(str(fasta_path), str(tmp_path / "prepared"), batch_size=3, deduplicate=True)
+    train_file, test_file = preparer.prepare(test_size=0.4, random_seed=0)
+
+    prepared_df = pd.concat([pd.read_csv(train_file), pd.read_csv(test_file)])
+    assert sorted(prepared_df["ID"].str[:3]) == ["SH1", "SH2", "SH3", "SH4", "SH5"]
+    assert prepared_df.set_index(prepared_df["ID"].str[:3])["Count"].to_dict() == {
+        "SH1": 3, "SH2": 1, "SH3": 1, "SH4": 1, "SH5": 1
+    }
+
+    duplicates_df = pd.read_csv(preparer.duplicates_file)
+    assert duplicates_df["ID"].str[:3].tolist() == ["SH6", "SH7"]
+    assert (duplicates_df["RepresentativeID"].str[:3] == "SH1").all()
+
+    expanded_df = expand_duplicates(prepared_df, duplicates_df)
+    assert len(expanded_df) == 7
+    assert expanded_df.set_index("ID")["Sequence"]["SH7|acc7|unclassified"] == "ACGTACGT"
+
+def test_prepare_pack_sequences(tmp_path):
+    preparer = make_preparer(tmp_path, batch_size=2, pack_sequences=True)
+    train_file, test_file = preparer.prepare(test_size=0.4, random_seed=0)
+    for prepared_file, packed_file in zip((train_file, test_file), preparer.packed_files):
+        assert list(PackedSequences.load(packed_file)) == read_prepared(prepared_file)["Sequence"].tolist()
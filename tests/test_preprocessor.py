@@ -0,0 +1,69 @@
+import numpy as np
+
+from preprocessing.augmentation import BaseStrategy, SequenceModifier
+from preprocessing.padding import IdentityStrategy, RandomStrategy as RandomPadding
+from preprocessing.preprocessor import Preprocessor
+from preprocessing.tokenization import KmerStrategy
+from preprocessing.truncation import MultiwindowStrategy, SlidingwindowStrategy
+from run_scenario import process_sequences
+from vocab import KmerVocabulary
+
+ALPHABET = ['A', 'C', 'G', 'T']
+SEQUENCES = ["ACGTTGCAAC" * (i % 7 + 1) + "ACG"[:i % 3] for i in range(20)]
+
+def make_preprocessor(padding=None, truncation=None, output="tokens"):
+    vocab = KmerVocabulary(k=3, alphabet=ALPHABET)
+    return Preprocessor(
+        augmentation_strategy=BaseStrategy(SequenceModifier(ALPHABET), ALPHABET, modification_probability=0.1),
+        tokenization_strategy=KmerStrategy(k=3, padding_alphabet=ALPHABET, output=output, vocab=vocab),
+        padding_strategy=padding or RandomPadding(optimal_length=12),
+        truncation_strategy=truncation or SlidingwindowStrategy(optimal_length=12),
+        vocab=vocab,
+        seed=7,
+    )
+
+def test_process_batch():
+    preprocessor = make_preprocessor()
+    batch = preprocessor.process_batch(SEQUENCES, sequence_ids=range(20))
+    assert batch.ids.shape == batch.mask.shape == (20, 12) and batch.ids.dtype == np.int32
+    assert (batch.ids[~batch.mask] == 0).all() and batch.parents.tolist() == list(range(20))
+
+    # Each row depends only on its sequence, not on the batch it is in
+    for i, sequence in enumerate(SEQUENCES):
+        assert preprocessor.process(sequence, sequence_id=i) == [[token] for token in batch.ids[i].tolist()]
+    reversed_batch = preprocessor.process_batch(SEQUENCES[::-1], sequence_ids=range(19, -1, -1))
+    assert np.array_equal(reversed_batch.ids[::-1], batch.ids)
+
+    ids_output = make_preprocessor(output="ids").process_batch(SEQUENCES, sequence_ids=range(20))
+    assert np.array_equal(ids_output.ids, batch.ids)
+
+    # ASCII arrays, e.g. from a packed store, give the same rows as str
+    ascii_batch = preprocessor.process_batch(
+        [np.frombuffer(sequence.encode("ascii"), dtype=np.uint8) for sequence in SEQUENCES], sequence_ids=range(20)
+    )
+    assert np.array_equal(ascii_batch.ids, batch.ids)
+
+def test_process_batch_windows_and_unpadded():
+    preprocessor = make_preprocessor(IdentityStrategy(), MultiwindowStrategy(optimal_length=4))
+    batch = preprocessor.process_batch(SEQUENCES[:3], sequence_ids=range(3))
+    assert batch.ids.shape[1] == 4 and np.bincount(batch.parents).tolist() == [1, 2, 3]
+    windows = preprocessor.process(SEQUENCES[2], sequence_id=2)
+    assert [sum(window, []) for window in windows] == [row.tolist() for row in preprocessor.to_ragged(batch)][3:]
+
+def test_process_batch_pads_shorter_than_truncation():
+    preprocessor = make_preprocessor(RandomPadding(optimal_length=8))
+    batch = preprocessor.process_batch(SEQUENCES, sequence_ids=range(20))
+    assert batch.ids.shape == (20, 12)
+    tokens = batch.mask.sum(axis=1)
+    sentences = preprocessor.to_sentences(batch)
+    assert [len(sentence) for sentence in sentences] == np.clip(tokens, 8, 12).tolist()
+    assert len(sentences[0]) == 8 and len(sentences[-1]) == 12
+
+def test_process_sequences_keyed_by_record_ids():
+    preprocessor = make_preprocessor()
+    ids = [f"record_{i}" for i in range(20)]
+    frame = process_sequences(preprocessor, SEQUENCES, ids, batch_size=7)
+    # A record is processed the same way wherever it lands in the split
+    reordered = process_sequences(preprocessor, SEQUENCES[::-1], ids[::-1], batch_size=5)
+    assert frame["Sequence"].tolist() == reordered["Sequence"].tolist()[::-1]
+    assert frame["Sequence"].tolist() != process_sequences(preprocessor, SEQUENCES)["Sequence"].tolist()
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from preprocessing import padding, truncation
+from preprocessing.collation import Collator
+from preprocessing.padding import EndStrategy as EndPadding
+from preprocessing.tokenization import KmerStrategy
+from ragged import RaggedArray
+from utils.random_state import sequence_rng
+from vocab import KmerVocabulary
+
+def test_ragged_array():
+    ragged = RaggedArray.from_sentences([[[5], [6], [7]], np.array([8, 9]), []])
+    assert ragged.values.dtype == np.int32 and ragged.offsets.dtype == np.int64
+    assert ragged.lengths.tolist() == [3, 2, 0] and len(ragged) == 3
+    assert ragged[1].tolist() == [8, 9] and np.shares_memory(ragged[1], ragged.values)
+    assert [row.tolist() for row in ragged] == [[5, 6, 7], [8, 9], []]
+    assert ragged.to_sentences() == [[[5], [6], [7]], [[8], [9]], []]
+    assert ragged.slice_rows([0, 0, 1], [0, 1, 1], [2, 2, 1]).to_sentences() == [[[5], [6]], [[6], [7]], [[9]]]
+    with pytest.raises(ValueError):
+        RaggedArray(np.arange(3), [0, 2])
+
+def test_ragged_stages():
+    tokenizer = KmerStrategy(k=2, output="ids")
+    sequences = ["ACGTAC", "GG", "ACGTACGTAC"]
+    ids = tokenizer.encode_batch(sequences)
+    assert [row.tolist() for row in ids] == [tokenizer.encode(sequence).tolist() for sequence in sequences]
+
+    vocab = KmerVocabulary(k=2, alphabet=['A', 'C', 'G', 'T'])
+    tokens = [KmerStrategy(k=2).execute(list(sequence)) for sequence in sequences]
+    assert vocab.map_sentences(tokens).to_sentences() == [vocab.map_sentence(sentence) for sentence in tokens]
+
+    for strategy in [padding.EndStrategy(4), padding.FrontStrategy(4), padding.RandomStrategy(4)]:
+        padded = strategy.execute_batch(ids, rngs=[sequence_rng(3, i) for i in range(3)])
+        assert [row.tolist() for row in padded] == [
+            strategy.execute(sentence, rng=sequence_rng(3, i)).tolist() for i, sentence in enumerate(ids)
+        ]
+    assert padding.IdentityStrategy().execute_batch(ids) is ids
+
+    for strategy in [truncation.FrontStrategy(3), truncation.EndStrategy(3), truncation.SlidingwindowStrategy(3)]:
+        truncated, rows = strategy.execute_batch(ids)
+        assert rows.tolist() == [0, 1, 2]
+        assert all(len(row) == min(len(sentence), 3) for row, sentence in zip(truncated, ids))
+    windows, rows = truncation.MultiwindowStrategy(2).execute_batch(ids)
+    assert rows.tolist() == [0, 0, 1, 2, 2, 2]
+    assert [row.tolist() for row in windows] == [w.tolist() for row in ids for w in truncation.MultiwindowStrategy(2).execute(row)]
+
+    rows, starts, lengths = truncation.MultiwindowStrategy(3, stride=1).windows(ids)
+    views = ids.slice_views(rows, starts, lengths)
+    assert all(np.shares_memory(view, ids.values) for view in views)
+    assert [view.tolist() for view in views] == [row.tolist() for row in ids.slice_rows(rows, starts, lengths)]
+
+    matrix, mask, lengths = Collator(EndPadding(4), truncation.EndStrategy(4)).collate(ids)
+    assert lengths.tolist() == [3, 1, 4] and matrix[1].tolist() == [ids[1][0], 0, 0, 0]
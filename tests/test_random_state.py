@@ -0,0 +1,55 @@
+import numpy as np
+
+from preprocessing.augmentation import BaseStrategy, SequenceModifier
+from preprocessing.padding import RandomStrategy as RandomPadding
+from preprocessing.preprocessor import Preprocessor
+from preprocessing.tokenization import KmerStrategy
+from preprocessing.truncation import SlidingwindowStrategy
+from utils.random_state import sequence_rng
+from vocab import KmerVocabConstructor, Vocabulary
+
+def test_sequence_rng_streams():
+    draws = sequence_rng(42, 7).random(5)
+    assert np.array_equal(draws, sequence_rng(42, 7, epoch=0).random(5))
+    assert not np.array_equal(draws, sequence_rng(42, 8).random(5))
+    assert not np.array_equal(draws, sequence_rng(43, 7).random(5))
+    assert not np.array_equal(draws, sequence_rng(42, 7, epoch=1).random(5))
+    assert np.array_equal(sequence_rng(42, "seq_1").random(5), sequence_rng(42, "seq_1").random(5))
+
+def test_strategies_follow_rng():
+    alphabet = ['A', 'C', 'G', 'T']
+    seq = list("ACGTACGTTGCA" * 10)
+    augmentation = BaseStrategy(SequenceModifier(alphabet), alphabet, modification_probability=0.3)
+    assert augmentation.execute(seq, rng=sequence_rng(1, 2)) == augmentation.execute(seq, rng=sequence_rng(1, 2))
+
+    padding = RandomPadding(optimal_length=50)
+    truncation = SlidingwindowStrategy(optimal_length=10)
+    tokens = [[str(i)] for i in range(30)]
+    for epoch in range(5):
+        assert padding.execute(tokens, rng=sequence_rng(1, 2, epoch)) == padding.execute(tokens, rng=sequence_rng(1, 2, epoch))
+        assert truncation.execute(tokens, rng=sequence_rng(1, 2, epoch)) == truncation.execute(tokens, rng=sequence_rng(1, 2, epoch))
+
+    tokenizer = KmerStrategy(k=3, padding_alphabet=alphabet)
+    assert tokenizer.execute(list("ACGTA"), rng=sequence_rng(1, 2)) == tokenizer.execute(list("ACGTA"), rng=sequence_rng(1, 2))
+
+def test_preprocessor_reproducible():
+    alphabet = ['A', 'C', 'G', 'T']
+    vocab = Vocabulary()
+    vocab.build_from_constructor(KmerVocabConstructor(k=3, alphabet=alphabet), data=[])
+    def make_preprocessor(seed):
+        augmentation = BaseStrategy(SequenceModifier(alphabet), alphabet, modification_probability=0.2)
+        return Preprocessor(
+            augmentation_strategy=augmentation,
+            tokenization_strategy=KmerStrategy(k=3, padding_alphabet=alphabet),
+            padding_strategy=RandomPadding(optimal_length=40),
+            truncation_strategy=SlidingwindowStrategy(optimal_length=30),
+            vocab=vocab,
+            seed=seed,
+        )
+    sequences = ["ACGTTGCAAC" * (i + 1) for i in range(10)]
+    first = [make_preprocessor(42).process(s, sequence_id=i) for i, s in enumerate(sequences)]
+    # Processing order does not matter, only the sequence ID
+    second = {i: make_preprocessor(42).process(sequences[i], sequence_id=i) for i in reversed(range(10))}
+    assert all(np.array_equal(first[i], second[i]) for i in range(10))
+    epochs = [make_preprocessor(42).process(sequences[9], sequence_id=9, epoch=e) for e in range(3)]
+    assert not all(np.array_equal(epochs[0], e) for e in epochs[1:])
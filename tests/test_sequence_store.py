@@ -0,0 +1,30 @@
+from sequence_store import PackedSequenceBuilder, PackedSequences, iter_batches
+
+def test_packed_sequences_round_trip(tmp_path):
+    sequences = ["ACGTACGTA", "", "NNACGRT-a", "T", "GATTACA"]
+    builder = PackedSequenceBuilder()
+    builder.append(sequences[:2])
+    builder.append(sequences[2:])
+    store = builder.build()
+    assert len(store) == 5
+    assert list(store) == sequences
+    assert store[-1] == "GATTACA"
+    assert store.lengths.tolist() == [9, 0, 9, 1, 7]
+    assert store.bases(2).tobytes() == b"NNACGRT-a" and len(store.exception_positions) == 5
+
+    store.save(str(tmp_path / "sequences.npz"))
+    assert list(PackedSequences.load(str(tmp_path / "sequences.npz"))) == sequences
+
+def test_packed_sequences_footprint():
+    store = PackedSequences.from_sequences(["ACGT" * 250] * 100)
+    assert store.packed.nbytes == 100 * 1000 // 4
+    assert len(store.exception_positions) == 0
+
+def test_iter_batches():
+    sequences = ["ACGTACGTA", "", "NNACGRT-a", "T", "GATTACA"]
+    store = PackedSequences.from_sequences(sequences)
+    assert [sequence.tobytes().decode("ascii") for sequence in store.bases_batch(1, 4)] == sequences[1:4]
+    batches = list(iter_batches(store, 2))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [sequence.tobytes().decode("ascii") for batch in batches for sequence in batch] == sequences
+    assert list(iter_batches(iter(sequences), 2)) == [sequences[:2], sequences[2:4], sequences[4:]]
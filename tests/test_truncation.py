@@ -1,4 +1,7 @@
-from preprocessing.truncation import FrontStrategy, EndStrategy, SlidingwindowStrategy
+import numpy as np
+
+from preprocessing.truncation import FrontStrategy, EndStrategy, MultiwindowStrategy, SlidingwindowStrategy
+from ragged import RaggedArray
 def test_end_truncation_3():
     optimal_length = 3
     input_seq = [['PAD'], ['123'], ['456'], ['789']]
@@ -63,3 +66,15 @@ def test_slidingwindow_truncation_lengths():
         padded_seq = truncation_strategy.execute(input_seq)
         assert len(padded_seq)==expected_length
 
+
+def test_multiwindow_truncation():
+    truncator = MultiwindowStrategy(optimal_length=4, stride=3)
+    input_seq = np.arange(11, dtype=np.int32)
+    windows = truncator.execute(input_seq)
+    assert [window.tolist() for window in windows] == [[0, 1, 2, 3], [3, 4, 5, 6], [6, 7, 8, 9], [7, 8, 9, 10]]
+    assert all(np.shares_memory(window, input_seq) for window in windows)
+    assert truncator.execute([['A'], ['C']]) == [[['A'], ['C']]]
+
+    windows, parents = MultiwindowStrategy(optimal_length=4).execute_batch(RaggedArray.from_arrays([np.arange(3), np.arange(9)]))
+    assert windows.lengths.tolist() == [3, 4, 4, 4]
+    assert parents.tolist() == [0, 1, 1, 1]
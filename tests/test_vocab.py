@@ -0,0 +1,116 @@
+import os
+
+from preprocessing.tokenization import KmerStrategy
+from vocab import (
+    BpeVocabConstructor, BpeVocabulary, FrequencyKmerVocabConstructor, KmerVocabConstructor, KmerVocabulary,
+    MappedVocabulary, Vocabulary, load_vocabulary, save_vocabulary
+)
+
+def test_kmer_vocabulary_matches_materialized():
+    vocab = Vocabulary()
+    vocab.build_from_constructor(KmerVocabConstructor(k=3, alphabet=['A', 'C', 'G', 'T']), data=[])
+    implicit_vocab = KmerVocabulary(k=3, alphabet=['T', 'G', 'C', 'A'])
+
+    assert len(implicit_vocab) == len(vocab)
+    for token, idx in vocab.token_to_id.items():
+        assert implicit_vocab.get_id(token) == idx
+        assert implicit_vocab.get_token(idx) == token
+    for token in ['ACN', 'AC', 'ACGT', 'UNK', 'acg']:
+        assert implicit_vocab.get_id(token) == vocab.get_id(token) == vocab.unk_id
+    assert implicit_vocab.get_token(len(vocab)) == 'UNK'
+    assert implicit_vocab.map_sentence([['ACG'], ['PAD']]) == vocab.map_sentence([['ACG'], ['PAD']])
+
+def test_kmer_vocabulary_save_load(tmp_path):
+    vocab_path = str(tmp_path / "vocab.json")
+    KmerVocabulary(k=12, alphabet=['A', 'C', 'G', 'T']).save(vocab_path)
+    assert os.path.getsize(vocab_path) < 1000
+
+    vocab = KmerVocabulary(k=1, alphabet=['A'])
+    vocab.load(vocab_path)
+    assert len(vocab) == 2 + 4 ** 12
+    assert vocab.get_token(vocab.get_id('TTTTTTTTTTTA')) == 'TTTTTTTTTTTA'
+
+def test_frequency_vocabulary():
+    sequences = ["AAACCCAAAGG", "AAACCCNAATTT", "GGGAAA", "AC"]
+    for workers in [1, 2]:
+        vocab = Vocabulary()
+        constructor = FrequencyKmerVocabConstructor(
+            k=3, alphabet=['A', 'C', 'G', 'T'], min_frequency=2, workers=workers, chunk_size=2
+        )
+        vocab.build_from_constructor(constructor, sequences)
+        # AAA x4, CCC x2; CNA (unknown base), TTT x1 and the incomplete tails are dropped
+        assert vocab.token_to_id == {'PAD': 0, 'UNK': 1, 'AAA': 2, 'CCC': 3}
+
+    vocab = Vocabulary()
+    constructor = FrequencyKmerVocabConstructor(k=3, alphabet=['A', 'C', 'G', 'T'], max_tokens=3, workers=1)
+    vocab.build_from_constructor(constructor, sequences)
+    assert list(vocab.token_to_id) == ['PAD', 'UNK', 'AAA']
+
+    vocab = Vocabulary()
+    constructor = FrequencyKmerVocabConstructor(k=2, alphabet=['A', 'C', 'G', 'T'], stride=1, workers=1)
+    vocab.build_from_constructor(constructor, ["ACGT"])
+    assert list(vocab.token_to_id) == ['PAD', 'UNK', 'AC', 'CG', 'GT']
+
+def test_kmer_ids_with_frequency_vocabulary():
+    vocab = Vocabulary()
+    constructor = FrequencyKmerVocabConstructor(k=3, alphabet=['A', 'C', 'G', 'T'], min_frequency=2, workers=1)
+    vocab.build_from_constructor(constructor, ["AAACCCAAAGG", "AAACCCNAATTT"])
+    test_sequence = "CCCGGGAAANNN"
+    output = KmerStrategy(k=3, output="ids", vocab=vocab).encode(test_sequence)
+    assert output.tolist() == [3, vocab.unk_id, 2, vocab.unk_id]
+
+def test_binary_vocabulary_round_trip(tmp_path):
+    vocab = Vocabulary()
+    constructor = FrequencyKmerVocabConstructor(k=3, alphabet=['A', 'C', 'G', 'T'], workers=1)
+    vocab.build_from_constructor(constructor, ["TTTGGGACGAAA", "CCCTTT"])
+    vocab_path = str(tmp_path / "vocab.bin")
+    save_vocabulary(vocab, vocab_path)
+
+    mapped = load_vocabulary(vocab_path)
+    assert isinstance(mapped, MappedVocabulary)
+    assert len(mapped) == len(vocab)
+    for token, idx in vocab.token_to_id.items():
+        assert mapped.get_id(token) == idx
+        assert mapped.get_token(idx) == token
+    assert mapped.get_id('NNN') == vocab.unk_id
+    assert mapped.get_token(len(vocab)) == vocab.unk_token
+    assert mapped.token_to_id == vocab.token_to_id
+    assert mapped.map_sentence([['ACG'], ['CCA']]) == vocab.map_sentence([['ACG'], ['CCA']])
+
+    test_sequence = "TTTACGCCANNN"
+    assert (
+        KmerStrategy(k=3, output="ids", vocab=mapped).encode(test_sequence).tolist()
+        == KmerStrategy(k=3, output="ids", vocab=vocab).encode(test_sequence).tolist()
+    )
+    mapped.close()
+
+    # Lookups and tokenizer tables read the mapped arrays without decoding the tokens into a dict
+    mapped = load_vocabulary(vocab_path)
+    assert mapped.get_id('ACG') == vocab.get_id('ACG') and mapped.get_id('NNN') == vocab.unk_id
+    KmerStrategy(k=3, output="ids", vocab=mapped).encode(test_sequence)
+    assert mapped._token_to_id is None
+    mapped.close()
+
+def test_binary_vocabulary_formats(tmp_path):
+    kmer_vocab = KmerVocabulary(k=5, alphabet=['A', 'C', 'G', 'T'])
+    save_vocabulary(kmer_vocab, str(tmp_path / "kmer.bin"))
+    loaded = load_vocabulary(str(tmp_path / "kmer.bin"))
+    assert isinstance(loaded, KmerVocabulary)
+    assert loaded.get_id('ACGTA') == kmer_vocab.get_id('ACGTA')
+
+    bpe_vocab = BpeVocabulary()
+    bpe_vocab.build_from_constructor(BpeVocabConstructor(['A', 'C', 'G', 'T'], max_tokens=10), ["AACAACGT"] * 3)
+    for vocab_format in ["binary", "json"]:
+        save_vocabulary(bpe_vocab, str(tmp_path / "bpe"), vocab_format)
+        loaded = load_vocabulary(str(tmp_path / "bpe"))
+        assert isinstance(loaded, BpeVocabulary)
+        assert loaded.token_to_id == bpe_vocab.token_to_id
+        assert loaded.merges == bpe_vocab.merges
+
+    # The JSON export of a plain vocabulary is its own `save` output
+    vocab = Vocabulary()
+    vocab.build_from_constructor(KmerVocabConstructor(k=2, alphabet=['A', 'C', 'G', 'T']), data=[])
+    save_vocabulary(vocab, str(tmp_path / "vocab.json"), "json")
+    loaded = load_vocabulary(str(tmp_path / "vocab.json"))
+    assert type(loaded) is Vocabulary
+    assert loaded.token_to_id == vocab.token_to_id